@@ -0,0 +1,88 @@
+import re
+import threading
+import time
+
+# thumbnailLink 는 ...=s220 처럼 끝나는 크기 지정 URL → 필요한 크기로 바꿔서 요청
+THUMBNAIL_SIZE_SUFFIX = re.compile(r"=s\d+[^/=]*$")
+THUMBNAIL_METADATA_FIELDS = "modifiedTime,thumbnailLink"
+DEFAULT_METADATA_TTL = 300  # 메타데이터(수정 시각, 썸네일 주소) 재사용 시간(초)
+MAX_METADATA_ENTRIES = 10_000  # 넘으면 만료된 메타데이터부터 정리
+
+
+def sized_thumbnail_link(link, size):
+    if THUMBNAIL_SIZE_SUFFIX.search(link):
+        return THUMBNAIL_SIZE_SUFFIX.sub(f"=s{size}", link)
+    return f"{link}=s{size}"
+
+
+class DriveThumbnailFetcher:
+    """Drive 가 만들어 둔 썸네일(thumbnailLink)만 받고, 썸네일이 없거나 실패하면 원본을 받는다.
+
+    get_metadata(file_id) → {"thumbnailLink": ...} (없을 수 있음)
+    download_original(file_id) → 원본 바이트
+    http_get(url) → (상태 코드, 바이트)
+    세 함수는 사진 작업 스레드에서 불리므로 Streamlit 캐시 함수를 부르면 안 된다.
+    메타데이터는 metadata_ttl 초 동안 재사용한다.
+    """
+
+    def __init__(self, get_metadata, download_original, http_get, use_thumbnails=True,
+                 metadata_ttl=DEFAULT_METADATA_TTL):
+        self._get_metadata = get_metadata
+        self._download_original = download_original
+        self._http_get = http_get
+        self.use_thumbnails = use_thumbnails
+        self.metadata_ttl = metadata_ttl
+        self._lock = threading.Lock()
+        self._metadata = {}  # 파일 ID → (조회 시각, 메타데이터)
+        self.stats = {"thumbnail_fetches": 0, "thumbnail_bytes": 0,
+                      "original_fetches": 0, "original_bytes": 0, "fallbacks": 0,
+                      "metadata_fetches": 0, "metadata_hits": 0}
+
+    def _count(self, kind, data):
+        with self._lock:
+            self.stats[f"{kind}_fetches"] += 1
+            self.stats[f"{kind}_bytes"] += len(data)
+
+    def metadata(self, file_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._metadata.get(file_id)
+            if entry is not None and now - entry[0] < self.metadata_ttl:
+                self.stats["metadata_hits"] += 1
+                return entry[1]
+        metadata = self._get_metadata(file_id)
+        with self._lock:
+            if len(self._metadata) >= MAX_METADATA_ENTRIES:
+                self._metadata = {key: value for key, value in self._metadata.items()
+                                  if now - value[0] < self.metadata_ttl}
+            self._metadata[file_id] = (now, metadata)
+            self.stats["metadata_fetches"] += 1
+        return metadata
+
+    def expire_metadata(self, file_id=None):
+        """사진 교체/수동 새로고침 → 다음 조회 때 메타데이터를 다시 받음 (file_id 미지정 시 전체)"""
+        with self._lock:
+            if file_id is None:
+                self._metadata.clear()
+            else:
+                self._metadata.pop(file_id, None)
+
+    def fetch(self, file_id, size, metadata=None):
+        """size 이상으로 축소된 이미지 바이트 (썸네일 우선, 없으면 원본)"""
+        if self.use_thumbnails:
+            link = (metadata if metadata is not None else self.metadata(file_id)).get("thumbnailLink")
+            if link:
+                try:
+                    status, data = self._http_get(sized_thumbnail_link(link, size))
+                except Exception as e:
+                    status, data = None, b""
+                    print(f"⚠️ 썸네일 요청 실패 {file_id}: {e}")
+                if status == 200 and data:
+                    self._count("thumbnail", data)
+                    return data
+            with self._lock:
+                self.stats["fallbacks"] += 1
+
+        data = self._download_original(file_id)
+        self._count("original", data)
+        return data
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+DEFAULT_TTL = 6 * 3600  # 키는 거의 바뀌지 않으므로 길게 유지 (교체 시 invalidate 또는 복호화 실패 시 재조회)
+MIN_FAILURE_RELOAD_INTERVAL = 60  # 복호화 실패로 인한 재조회 최소 간격(초). 깨진 값 하나가 매번 시트를 읽지 않도록
+
+
+class FernetKeyRing:
+    """프로세스 공용 Fernet 키 묶음.
+
+    load_keys() → [현재 키, 이전 키, ...] 를 한 번 읽어 MultiFernet 으로 보관한다.
+    암호화는 항상 첫 번째(현재) 키, 복호화는 모든 키로 시도하므로 키를 교체해도 기존 비밀번호를 읽을 수 있다.
+    Fernet 키 형식이 아닌 이전 키는 건너뛰고(invalid_keys), 현재 키가 깨졌으면 ValueError 를 올린다.
+    ttl 이 지나거나 invalidate() 하면 다음 사용 때 다시 읽고, 복호화에 실패하면 한 번 다시 읽어 재시도한다
+    (다른 프로세스에서 키를 교체한 경우). 실패로 인한 재조회는 min_reload_interval 초에 한 번까지만 하고,
+    그 사이의 실패나 재조회 후에도 실패하면 InvalidToken 을 그대로 올린다.
+    """
+
+    def __init__(self, load_keys, ttl=DEFAULT_TTL, min_reload_interval=MIN_FAILURE_RELOAD_INTERVAL):
+        self._load_keys = load_keys
+        self.ttl = ttl
+        self.min_reload_interval = min_reload_interval
+        self._lock = threading.Lock()
+        self._fernet = None
+        self._loaded_at = 0.0
+        self._failure_reload_at = float("-inf")
+        self.stats = {"loads": 0, "hits": 0, "reloads_on_failure": 0, "failures": 0, "invalid_keys": 0}
+
+    def _current(self, force=False):
+        with self._lock:
+            if force or self._fernet is None or time.monotonic() - self._loaded_at > self.ttl:
+                keys = [key for key in self._load_keys() if key]
+                if not keys:
+                    raise ValueError("암호화 키가 없습니다.")
+                fernets = []
+                for pos, key in enumerate(keys):
+                    try:
+                        fernets.append(Fernet(key))
+                    except ValueError as e:
+                        if pos == 0:  # 현재 키가 깨졌으면 암호화/복호화 모두 불가
+                            raise ValueError(f"현재 암호화 키 형식이 올바르지 않습니다: {e}") from e
+                        print(f"⚠️ 이전 암호화 키 {pos}번 무시 (Fernet 키 형식 아님)")
+                        self.stats["invalid_keys"] += 1
+                self._fernet = MultiFernet(fernets)
+                self._loaded_at = time.monotonic()
+                self.stats["loads"] += 1
+            else:
+                self.stats["hits"] += 1
+            return self._fernet
+
+    def invalidate(self):
+        with self._lock:
+            self._fernet = None
+
+    def encrypt(self, text):
+        return self._current().encrypt(text.encode()).decode()
+
+    def decrypt(self, token):
+        try:
+            return self._current().decrypt(token.encode()).decode()
+        except InvalidToken:
+            with self._lock:
+                self.stats["failures"] += 1
+                now = time.monotonic()
+                reload = now - self._failure_reload_at >= self.min_reload_interval
+                if reload:  # 간격 안의 다른 실패는 재조회 없이 바로 실패
+                    self._failure_reload_at = now
+                    self.stats["reloads_on_failure"] += 1
+            if not reload:
+                raise
+        return self._current(force=True).decrypt(token.encode()).decode()
+
+    def rotate(self, token):
+        """이전 키로 암호화된 값을 현재 키로 다시 암호화"""
+        return self._current().rotate(token.encode()).decode()
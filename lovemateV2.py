@@ -8,13 +8,11 @@ import urllib
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from oauth2client.service_account import ServiceAccountCredentials
-from makeWatermarkToPdf import create_watermark, add_watermark_to_pdf
+from makeWatermarkToPdf import WatermarkStampCache, watermark_job
 from urllib.request import urlretrieve
-from cryptography.fernet import Fernet
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
 import io
-import base64
 import json
 from googleapiclient.http import MediaFileUpload
 import os
@@ -26,9 +24,28 @@ from oauth2client.service_account import ServiceAccountCredentials
 from PIL import Image
 import requests
 from makeProfileCard import create_pdf_from_data
+from thumbnailCache import ThumbnailDiskCache, StaticThumbnailStore
+from photoPrefetch import PhotoPrefetcher
+from sheetSync import SheetDeltaSync
+from snapshotStore import SheetSnapshotStore
+from sheetRowIndex import SheetRowIndex
+from keyRing import FernetKeyRing
+from sheetClientPool import SheetClientPool
+from sheetLogSink import SheetLogSink
+from profileCardBatch import ProfileCardBatch, fetch_card_photos, make_render_pool
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import ThreadPoolExecutor
+from driveThumbnails import DriveThumbnailFetcher, THUMBNAIL_METADATA_FIELDS
+from matchEngine import (
+    build_member_snapshot, build_profile_frame, patch_member_snapshot, patch_profile_frame,
+    MemberBitsetIndex, extract_drive_file_id,
+    min_col, max_col, set_col, SURVEY_TS_COL, PHOTO_IDS_COL,
+    stratified_sample_ids, face_grade_quotas, request_seed, UNSTRATIFIED_QUOTA,
+)
 import tempfile
 from datetime import datetime
-import inspect
+import threading
+import sys
 from streamlit_oauth import OAuth2Component
 import streamlit as st
 import google.auth.transport.requests
@@ -46,6 +63,8 @@ params = dict(st.query_params)
 trigger = params.get("trigger", [None])
 token = params.get("token", [None])
 sheet_name = params.get("sheet_name", [None])  # 기본값 설정
+match_mode = params.get("match_mode", "filter")  # run_multi_matching 매칭 방식 (filter / reciprocal)
+top_k_param = params.get("top_k", "")  # reciprocal 방식에서 K열에 남길 후보 수 (기본 RECIPROCAL_TOP_K)
 
 tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["회원 매칭", "발송 필요 회원", "사진 보기", "작업자 메모장", "회원 메모장", "프로필카드 생성"])
 
@@ -75,58 +94,56 @@ def js_console_log(message):
     )
 
 
+MEMBER_SHEET_URL = "https://docs.google.com/spreadsheets/d/1jnZqqmZB8zWau6CHqxm-L9fxlXDaWxOaJm6uDcE6WN0/edit"
+ADMIN_SHEET_URL = "https://docs.google.com/spreadsheets/d/1XwEk_TifWuCkOjjUuJ0kMFYy0dKxV46XvQ_rgts2kL8/edit"
+
+
+# ✅ 구글 시트 클라이언트 풀 (프로세스 전체에서 인증/핸들 공유)
+@st.cache_resource(show_spinner=False)
+def get_sheet_pool():
+    return SheetClientPool.from_service_account_info(load_google_service_account_key())
+
+
 # 🔒 암복호화용 키 로딩 (키정보 시트 B1)
 @st.cache_resource(show_spinner=False)
 @st.cache_resource(ttl=300, show_spinner=False)
-def load_sheet_with_ws(sheet_name):
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    key_dict = load_google_service_account_key()
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
-    client = gspread.authorize(creds)
-
+def load_sheet_with_ws(sheet_name, allow_stale=True):
     # ✅ 링크는 load_sheet와 동일한 두 번째 문서
-    sheet = client.open_by_url(
-        "https://docs.google.com/spreadsheets/d/1jnZqqmZB8zWau6CHqxm-L9fxlXDaWxOaJm6uDcE6WN0/edit")
-    worksheet = sheet.worksheet(sheet_name)
-    raw_values = worksheet.get_all_values()
-    header = raw_values[1]
-    data = raw_values[2:]
+    worksheet = get_sheet_pool().worksheet(MEMBER_SHEET_URL, sheet_name)
+    header, data = fetch_sheet_values(sheet_name, allow_stale)
     df = pd.DataFrame(data, columns=header)
     return df, worksheet
 
 
-def load_secret_key():
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(load_google_service_account_key(), scope)
-    client = gspread.authorize(creds)
+# B1: 현재 키, C1~E1: 교체 전 이전 키들 (복호화에만 사용). 옆 칸 메모가 키로 읽히지 않도록 범위 고정
+SECRET_KEY_RANGE = "B1:E1"
+
 
-    sheet = client.open_by_url(
-        "https://docs.google.com/spreadsheets/d/1XwEk_TifWuCkOjjUuJ0kMFYy0dKxV46XvQ_rgts2kL8/edit")
-    ws = sheet.worksheet("키정보")
-    key = ws.acell('B1').value
-    return key.encode()
+def load_secret_keys():
+    ws = get_sheet_pool().worksheet(ADMIN_SHEET_URL, "키정보")
+    values = ws.get_values(SECRET_KEY_RANGE)
+    return [value.strip().encode() for value in (values[0] if values else []) if value.strip()]
+
+
+# ✅ 프로세스 공용 키 묶음 (키 교체 시 get_key_ring().invalidate())
+@st.cache_resource(show_spinner=False)
+def get_key_ring():
+    return FernetKeyRing(load_secret_keys)
 
 
 # 🔒 비밀번호 암호화
 def encrypt_password(password):
-    fernet = Fernet(load_secret_key())
-    return fernet.encrypt(password.encode()).decode()
+    return get_key_ring().encrypt(password)
 
 
 # 🔓 비밀번호 복호화
 def decrypt_password(encrypted_password):
-    fernet = Fernet(load_secret_key())
-    return fernet.decrypt(encrypted_password.encode()).decode()
+    return get_key_ring().decrypt(encrypted_password)
 
 
 # ✅ 구글 관리자 스프레드시트 연결
 def connect_sheet(sheet_name):
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(load_google_service_account_key(), scope)
-    client = gspread.authorize(creds)
-    sheet = client.open_by_url(
-        "https://docs.google.com/spreadsheets/d/1XwEk_TifWuCkOjjUuJ0kMFYy0dKxV46XvQ_rgts2kL8/edit")
-    worksheet = sheet.worksheet(sheet_name)
+    worksheet = get_sheet_pool().worksheet(ADMIN_SHEET_URL, sheet_name)
 
     try:
         data = worksheet.get_all_records()
@@ -141,54 +158,53 @@ def connect_sheet(sheet_name):
     return df, worksheet
 
 
-import inspect
+# ✅ 로그 시트 비동기 기록기 (큐 + 백그라운드 일괄 전송)
+@st.cache_resource(show_spinner=False)
+def get_log_sink():
+    pool = get_sheet_pool()  # 전송 스레드에서는 캐시 함수를 부르지 않도록 여기서 받아 둠
+    return SheetLogSink(lambda: pool.worksheet(ADMIN_SHEET_URL, "로그"))
 
 
-def write_log(member_id: str = "", message: str = ""):
+def write_log(member_id: str = "", message: str = "", login_id=None, sink=None):
+    # login_id / sink: 작업 스레드에서는 메인 스레드에서 받아 둔 log_context() 값을 넘긴다 (세션/캐시 함수 호출 X)
     try:
         # ✅ LoginID: 로그인된 세션에서 가져오되 없으면 "AppsScript"
-        login_id = st.session_state.get("user_id", "")
+        if login_id is None:
+            login_id = st.session_state.get("user_id", "")
 
-        # ✅ Action: 호출한 함수명 자동 감지
-        frame = inspect.currentframe()
-        outer_frame = inspect.getouterframes(frame)[1]
-        action = outer_frame.function
+        # ✅ Action: 호출한 함수명 (바로 위 프레임만 확인)
+        action = sys._getframe(1).f_code.co_name
 
         # ✅ Timestamp
         kst = pytz.timezone("Asia/Seoul")
         now = datetime.now(kst).strftime("%Y-%m-%d %H:%M:%S")
 
-        # ✅ Google Sheet에 기록
-        _, ws = connect_sheet("로그")
+        # ✅ 백그라운드 기록기에 전달 (시트 전송은 비동기)
         row = [now, login_id, member_id, action, message]
-        ws.append_row(row)
+        (sink or get_log_sink()).put(row)
     except Exception as e:
         print(f"[로그 기록 실패] {e}")
 
 
-write_log("", f"📩 트리거 요청 감지 : trigger={trigger}, token={token}, sheet_name={sheet_name}")
+def log_context():
+    """작업 스레드의 write_log 에 넘길 {"login_id", "sink"}. 메인 스레드에서 호출"""
+    return {"login_id": st.session_state.get("user_id", ""), "sink": get_log_sink()}
 
 
-def create_account_sheet():
-    # 구글 인증 범위
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+write_log("", f"📩 트리거 요청 감지 : trigger={trigger}, token={token}, sheet_name={sheet_name}")
 
-    # 서비스 계정 키 로딩 (Streamlit에서는 st.secrets 사용)
-    key_dict = st.secrets["gcp"]  # 또는 JSON 파일에서 로딩: json.load(open("your-service-key.json"))
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
-    client = gspread.authorize(creds)
 
-    # 📌 스프레드시트 열기 (관리자용 시트 URL 사용)
-    sheet = client.open_by_url(
-        "https://docs.google.com/spreadsheets/d/1XwEk_TifWuCkOjjUuJ0kMFYy0dKxV46XvQ_rgts2kL8/edit")
+def create_account_sheet():
+    # 📌 관리자용 스프레드시트 (공유 클라이언트 풀 사용)
+    pool = get_sheet_pool()
 
     # ✅ 시트가 이미 존재하는지 확인하고 없으면 생성
     sheet_name = "계정정보"
     try:
-        worksheet = sheet.worksheet(sheet_name)
+        worksheet = pool.worksheet(ADMIN_SHEET_URL, sheet_name)
         print(f"✅ 시트 '{sheet_name}'이 이미 존재합니다.")
     except gspread.exceptions.WorksheetNotFound:
-        worksheet = sheet.add_worksheet(title=sheet_name, rows="100", cols="3")
+        worksheet = pool.spreadsheet(ADMIN_SHEET_URL).add_worksheet(title=sheet_name, rows="100", cols="3")
         worksheet.update("A1:C1", [["이메일", "PW", "마지막 로그인 시간"]])
         print(f"🆕 시트 '{sheet_name}'이 새로 생성되었습니다.")
 
@@ -288,27 +304,138 @@ if "user_id" not in st.session_state:
 # ✅ load_sheet 함수에 캐시 적용
 @st.cache_data(ttl=300, show_spinner=False)
 def load_sheet(sheet_name):
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    key_dict = load_google_service_account_key()
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
-    client = gspread.authorize(creds)
-    sheet = client.open_by_url(
-        "https://docs.google.com/spreadsheets/d/1jnZqqmZB8zWau6CHqxm-L9fxlXDaWxOaJm6uDcE6WN0/edit")
-    worksheet = sheet.worksheet(sheet_name)
-    raw_values = worksheet.get_all_values()
-    header = raw_values[1]
-    data = raw_values[2:]
+    header, data = fetch_sheet_values(sheet_name)
     df = pd.DataFrame(data, columns=header)
     return df
 
 
+def fetch_live_sheet_values(sheet_name):
+    pool = get_sheet_pool()
+    worksheet = pool.worksheet(MEMBER_SHEET_URL, sheet_name)
+    raw_values = worksheet.get_all_values()
+    pool.record("get_all_values")
+    return raw_values[1], raw_values[2:]  # 2행: 헤더, 3행부터: 데이터
+
+
+# ✅ 시트 값 저장본 (재시작 직후에는 디스크 저장본을 바로 쓰고 백그라운드에서 다시 읽음)
+SHEET_SNAPSHOT_DIR = os.environ.get("SHEET_SNAPSHOT_DIR",
+                                    os.path.join(tempfile.gettempdir(), "lovemate_sheets"))
+
+
+def on_sheet_revalidated(sheet_name):
+    # 백그라운드 갱신 완료 → 저장본으로 만든 캐시를 비워 다음 실행부터 최신 값 사용
+    print(f"🔄 {sheet_name} 시트 저장본 갱신 완료")
+    for cached in (load_sheet, load_sheet_with_ws, load_member_snapshot, load_profile_frame):
+        cached.clear()
+
+
+@st.cache_resource(show_spinner=False)
+def get_sheet_snapshots():
+    return SheetSnapshotStore(SHEET_SNAPSHOT_DIR, max_age=300, on_refresh=on_sheet_revalidated)
+
+
+def fetch_sheet_values(sheet_name, allow_stale=True):
+    """(헤더, 행). allow_stale=False 면 재시작 직후에도 저장본 대신 실제 시트를 읽음 (쓰기 전 조회용)"""
+    return get_sheet_snapshots().get(sheet_name, lambda: fetch_live_sheet_values(sheet_name), allow_stale)
+
+
+# ✅ 쓰기용 회원 ID → 행 번호 / 헤더 → 열 번호 색인 (쓰기 직전 헤더·키 칸만 읽어 확인)
+@st.cache_resource(show_spinner=False)
+def get_sheet_row_index(sheet_name):
+    def load(live):
+        return fetch_live_sheet_values(sheet_name) if live else fetch_sheet_values(sheet_name)
+    return SheetRowIndex(load)
+
+
+def sheet_age_caption(sheet_names):
+    """시트 데이터 기준 시각 안내 문구 (저장본 사용 중/갱신 중 표시)"""
+    parts = []
+    for name in sheet_names:
+        info = get_sheet_snapshots().describe(name)
+        if info is None:
+            continue
+        minutes = int(info["age"] // 60)
+        age = "방금" if minutes == 0 else f"{minutes}분 전"
+        note = " · 저장본, 최신 값 확인 중" if info["refreshing"] else (" · 저장본" if info["source"] == "disk" else "")
+        parts.append(f"{name} {age}{note}")
+    return "🕒 데이터 기준: " + ", ".join(parts) if parts else ""
+
+
+# ✅ 회원/프로필 시트 행 단위 동기화 상태 (프로세스 공용, 수동 새로고침에도 유지)
+#    직전 값과 행 해시를 비교해 바뀐/추가/삭제된 행만 타입 프레임에 반영
+@st.cache_resource(show_spinner=False)
+def get_sheet_sync(sheet_name):
+    if sheet_name == "회원":
+        return SheetDeltaSync(build_member_snapshot, patch_member_snapshot)
+    return SheetDeltaSync(build_profile_frame, patch_profile_frame)
+
+
+def log_sheet_changes(sheet_name, changes):
+    if changes["full"]:
+        print(f"📦 {sheet_name} 전체 생성")
+    elif changes["positions"].size or changes["deleted"]:
+        print(f"📦 {sheet_name} 변경 반영: 추가 {len(changes['inserted'])}, 수정 {len(changes['updated'])}, "
+              f"삭제 {len(changes['deleted'])}")
+
+
+# ✅ 회원 시트 타입 스냅샷 (읽기 전용으로 공유, 5분마다 변경분만 반영)
+@st.cache_resource(ttl=300, show_spinner=False)
+def load_member_snapshot():
+    sync = get_sheet_sync("회원")
+    previous = sync.frame
+    snapshot, stats, changes = sync.sync(*fetch_sheet_values("회원"))
+    log_sheet_changes("회원", changes)
+    register_member_index(snapshot, changes, previous)
+    before = f"{stats['memory_before']:,} → " if "memory_before" in stats else ""  # 변경분 반영 후에는 없음
+    print(f"📦 회원 스냅샷: {stats['rows']}명, 메모리 {before}{stats['memory_after']:,} bytes")
+    return snapshot, stats
+
+
+# ✅ 프로필 시트 + 파생 컬럼 (본인 사진 → Drive 파일 ID 목록)
+@st.cache_resource(ttl=300, show_spinner=False)
+def load_profile_frame():
+    frame, failures, changes = get_sheet_sync("프로필").sync(*fetch_sheet_values("프로필"))
+    log_sheet_changes("프로필", changes)
+    if any(failures.values()):
+        print(f"⚠️ 프로필 시트 파싱 실패: {failures}")
+    return frame, failures
+
+
 # ✅ Google Drive 연결 함수
-@st.cache_resource(ttl=3000, show_spinner=False)
-def get_drive_service():
+def build_drive_credentials():
     scope = ['https://www.googleapis.com/auth/drive']
     key_dict = load_google_service_account_key()
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
-    return build('drive', 'v3', credentials=creds)
+    return ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
+
+
+def build_drive_service(creds=None):
+    return build('drive', 'v3', credentials=creds or build_drive_credentials())
+
+
+@st.cache_resource(ttl=3000, show_spinner=False)
+def get_drive_service():
+    return build_drive_service()
+
+
+# ✅ 서비스 객체(httplib2)는 스레드 간 공유가 안전하지 않으므로 사진 다운로드 스레드마다 따로 생성
+@st.cache_resource(show_spinner=False)
+def get_drive_thread_local():
+    return threading.local()
+
+
+def get_thread_drive_service(local=None):
+    # local: 작업 스레드에서는 메인 스레드에서 미리 받아 둔 get_drive_thread_local() 을 넘긴다 (캐시 함수 호출 X)
+    local = local or get_drive_thread_local()
+    if getattr(local, "service", None) is None:
+        local.creds = build_drive_credentials()
+        local.service = build_drive_service(local.creds)
+    return local.service
+
+
+def get_thread_drive_token(local=None):
+    local = local or get_drive_thread_local()
+    get_thread_drive_service(local)
+    return local.creds.get_access_token().access_token  # 만료 시 자동 갱신
 
 
 # --- 업로드 함수 (캐시 없음) ---
@@ -381,39 +508,21 @@ def set_drive_public_permission(file_id):
 
 # --- 시트 업데이트 함수 ---
 def update_profile_photo_in_sheet(member_id, photo_index, new_url):
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    key_dict = load_google_service_account_key()
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
-    client = gspread.authorize(creds)
-    sheet = client.open_by_url(
-        "https://docs.google.com/spreadsheets/d/1jnZqqmZB8zWau6CHqxm-L9fxlXDaWxOaJm6uDcE6WN0/edit")
-    worksheet = sheet.worksheet("프로필")
-    all_values = worksheet.get_all_values()
-    headers = all_values[1]  # 2행: 헤더
-    data_rows = all_values[2:]  # 3행부터: 데이터
-
-    for idx, row in enumerate(data_rows):
-        record = dict(zip(headers, row))
-        if str(record.get("회원 ID", "")).strip() == str(member_id).strip():
-            current_photos = str(record.get("본인 사진", "")).split(",")
-            if len(current_photos) <= photo_index:
-                current_photos += [""] * (photo_index - len(current_photos) + 1)
-            current_photos[photo_index] = new_url
-            update_row = idx + 3  # 실제 시트 행 번호
-            update_col = headers.index("본인 사진") + 1  # 열 번호
-            worksheet.update_cell(update_row, update_col, ",".join(current_photos))
-            return True
-    return False
+    worksheet = get_sheet_pool().worksheet(MEMBER_SHEET_URL, "프로필")
+
+    def replace_photo(current):
+        current_photos = str(current).split(",")
+        if len(current_photos) <= photo_index:
+            current_photos += [""] * (photo_index - len(current_photos) + 1)
+        current_photos[photo_index] = new_url
+        return ",".join(current_photos)
+
+    # 현재 사진 칸은 쓰기 직전 검증 때 함께 읽은 값 사용
+    return get_sheet_row_index("프로필").update_cell(worksheet, member_id, "본인 사진", replace_photo)
 
 
 def get_latest_profile_photo(member_id):
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    key_dict = load_google_service_account_key()
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
-    client = gspread.authorize(creds)
-    sheet = client.open_by_url(
-        "https://docs.google.com/spreadsheets/d/1jnZqqmZB8zWau6CHqxm-L9fxlXDaWxOaJm6uDcE6WN0/edit")
-    worksheet = sheet.worksheet("프로필")
+    worksheet = get_sheet_pool().worksheet(MEMBER_SHEET_URL, "프로필")
 
     all_values = worksheet.get_all_values()
     headers = all_values[1]  # 두 번째 줄이 헤더
@@ -430,84 +539,177 @@ def get_latest_profile_photo(member_id):
     return []
 
 
-def image_to_base64(img):
-    buffered = io.BytesIO()
-    img.save(buffered, format="PNG")
-    img_b64 = base64.b64encode(buffered.getvalue()).decode()
-    return img_b64
+# ✅ 썸네일 디스크 캐시 (모든 세션/프로세스 공용, 재시작해도 유지)
+THUMBNAIL_CACHE_DIR = os.environ.get("THUMBNAIL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lovemate_thumbnails"))
+THUMBNAIL_CACHE_MAX_BYTES = 200 * 1024 * 1024
 
 
-@st.cache_data(ttl=300, show_spinner=False)
-def get_drive_image(file_id):
-    service = get_drive_service()
-    request = service.files().get_media(fileId=file_id)
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        _, done = downloader.next_chunk()
-    fh.seek(0)
-    image = Image.open(fh)
-    image.thumbnail((200, 200))  # 크기 축소
-    return image
+@st.cache_resource(show_spinner=False)
+def get_thumbnail_cache():
+    return ThumbnailDiskCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES)
 
 
-def get_drive_image_profilecard(file_id):
-    service = get_drive_service()
-    request = service.files().get_media(fileId=file_id)
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        _, done = downloader.next_chunk()
-    fh.seek(0)
-    return Image.open(fh)  # 👈 썸네일 처리 없이 원본 이미지 반환
+# ✅ 파일 메타데이터 (수정 시각 = 썸네일 캐시 버전 키, thumbnailLink = Drive 가 만든 썸네일 주소)
+#    메타데이터만 조회하므로 원본 다운로드보다 훨씬 가벼움 (5분 재사용은 DriveThumbnailFetcher.metadata)
+def fetch_drive_file_meta(file_id, service=None):
+    service = service or get_thread_drive_service()
+    return service.files().get(fileId=file_id, fields=THUMBNAIL_METADATA_FIELDS, supportsAllDrives=True).execute()
 
 
-@st.cache_data(ttl=300, show_spinner=False)
-def get_drive_image2(file_id):
-    service = get_drive_service()
+# ✅ Drive 요청 재시도 횟수 (429 / 사용량 제한 403 / 5xx 는 googleapiclient 가 지수 백오프로 재시도)
+DRIVE_NUM_RETRIES = 3
+
+
+def download_drive_file(file_id, service=None):
+    service = service or get_thread_drive_service()
     request = service.files().get_media(fileId=file_id)
     fh = io.BytesIO()
     downloader = MediaIoBaseDownload(fh, request)
     done = False
     while not done:
-        _, done = downloader.next_chunk()
-    fh.seek(0)
-    image = Image.open(fh)
-    image.thumbnail((300, 300))  # 크기 축소
-    return image
-
-
-# Google Drive 공유 URL에서 파일 ID 추출
-def extract_drive_file_id(url):
-    if "id=" in url:
-        return url.split("id=")[-1].split("&")[0]
-    elif "/file/d/" in url:
-        return url.split("/file/d/")[-1].split("/")[0]
-    return ""
+        _, done = downloader.next_chunk(num_retries=DRIVE_NUM_RETRIES)
+    return fh.getvalue()
 
 
-def upload_file_to_drive(file_path, filename, folder_id):
-    scopes = ['https://www.googleapis.com/auth/drive']
-    key_dict = load_google_service_account_key()
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scopes)
-    service = build('drive', 'v3', credentials=creds)
+def get_drive_thumbnail_link(url, drive_local=None):
+    response = requests.get(url, headers={"Authorization": f"Bearer {get_thread_drive_token(drive_local)}"},
+                            timeout=10)
+    return response.status_code, response.content
+
+
+# ✅ 썸네일 받는 방식: "thumbnail" = Drive 썸네일만 받기 (없으면 원본), "original" = 항상 원본
+DRIVE_THUMBNAIL_MODE = os.environ.get("DRIVE_THUMBNAIL_MODE", "thumbnail")
+
+
+@st.cache_resource(show_spinner=False)
+def get_drive_thumbnail_fetcher():
+    # 사진 작업 스레드에서 불리는 함수들 → 스레드 저장소는 여기(메인 스레드)서 받아 두고 캐시 함수는 부르지 않음
+    drive_local = get_drive_thread_local()
+    return DriveThumbnailFetcher(
+        lambda file_id: fetch_drive_file_meta(file_id, get_thread_drive_service(drive_local)),
+        lambda file_id: download_drive_file(file_id, get_thread_drive_service(drive_local)),
+        lambda url: get_drive_thumbnail_link(url, drive_local),
+        use_thumbnails=DRIVE_THUMBNAIL_MODE != "original")
+
+
+# ✅ size×size 안으로 축소한 JPEG 썸네일 바이트 (디스크 캐시 → 없으면 Drive 썸네일/원본 받아서 축소 후 저장)
+#    cache / fetcher: 작업 스레드에서는 메인 스레드에서 받아 둔 객체를 넘긴다
+def get_drive_thumbnail(file_id, size, cache=None, fetcher=None):
+    cache = cache or get_thumbnail_cache()
+    fetcher = fetcher or get_drive_thumbnail_fetcher()
+    meta = fetcher.metadata(file_id)
+    version = meta.get("modifiedTime", "")
+    data = cache.get(file_id, version, size)
+    if data is None:
+        image = Image.open(io.BytesIO(fetcher.fetch(file_id, size, meta)))
+        image.thumbnail((size, size))  # 크기 축소
+        buffered = io.BytesIO()
+        image.convert("RGB").save(buffered, format="JPEG", quality=85)
+        data = buffered.getvalue()
+        cache.put(file_id, version, size, data)
+    return data
+
+
+# ✅ 프로필카드 사진 원본 동시 다운로드 (메모리로만 받음, 카드 여러 장 생성 시에도 공용 풀 사용)
+CARD_PHOTO_WORKERS = 8
+
+
+@st.cache_resource(show_spinner=False)
+def get_card_photo_pool():
+    return ThreadPoolExecutor(max_workers=CARD_PHOTO_WORKERS, thread_name_prefix="card-photo")
+
+
+def fetch_profile_card_photos(member_id, photo_urls, photo_ids, photo_pool=None, drive_local=None, log=None):
+    """사진 원본 바이트 목록 (실패한 사진은 빠짐)
+
+    photo_pool / drive_local / log: 작업 스레드에서 부를 때는 메인 스레드에서 받아 둔
+    get_card_photo_pool(), get_drive_thread_local(), log_context() 를 넘긴다
+    """
+    photo_pool = photo_pool or get_card_photo_pool()
+    drive_local = drive_local or get_drive_thread_local()
+    log = log or {}
+    results = fetch_card_photos(photo_pool,
+                                lambda file_id: download_drive_file(file_id, get_thread_drive_service(drive_local)),
+                                photo_ids[:len(photo_urls)])
+    photos = []
+    for i, (url, (photo, error)) in enumerate(zip(photo_urls, results)):
+        if error is None:
+            photos.append(photo)
+            write_log(member_id, f"[디버그] ✅ 이미지 {i + 1} 받기 완료 ({len(photo):,} bytes)", **log)
+        else:
+            write_log(member_id, f"[⚠️사진 에러] {url} 처리 실패: {error}", **log)
+    return photos
+
+
+# ✅ 사진 병렬 미리 받기 (썸네일 다운로드 + 정적 URL 게시까지 작업 스레드에서 처리)
+PHOTO_PREFETCH_WORKERS = 6
+PHOTO_PREFETCH_TIMEOUT = 10.0
+
+
+# ✅ 갤러리 썸네일은 base64 PNG 대신 내용 해시 이름의 정적 JPEG URL 로 전달 (브라우저 캐시 가능)
+#    .streamlit/config.toml 의 server.enableStaticServing 필요, 앱 폴더의 static/ 이 ./app/static/ 으로 서비스됨
+STATIC_THUMBNAIL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "thumbs")
+STATIC_THUMBNAIL_URL = "./app/static/thumbs"
+STATIC_THUMBNAIL_MAX_BYTES = 200 * 1024 * 1024
 
+
+@st.cache_resource(show_spinner=False)
+def get_static_thumbnails():
+    return StaticThumbnailStore(STATIC_THUMBNAIL_DIR, STATIC_THUMBNAIL_URL, STATIC_THUMBNAIL_MAX_BYTES)
+
+
+def photo_handles():
+    """사진 작업 스레드에 넘길 (정적 썸네일, 디스크 캐시, Drive 썸네일) 객체. 메인 스레드에서 호출"""
+    return get_static_thumbnails(), get_thumbnail_cache(), get_drive_thumbnail_fetcher()
+
+
+def get_thumbnail_url(file_id, size, handles=None):
+    static_thumbnails, cache, fetcher = handles or photo_handles()
+    return static_thumbnails.publish(get_drive_thumbnail(file_id, size, cache, fetcher))
+
+
+@st.cache_resource(show_spinner=False)
+def get_photo_prefetcher():
+    # 작업 스레드에는 ScriptRunContext 가 없으므로 캐시 객체는 여기(메인 스레드)서 받아 넘긴다
+    handles = photo_handles()
+    return PhotoPrefetcher(lambda file_id, size: get_thumbnail_url(file_id, size, handles),
+                           max_workers=PHOTO_PREFETCH_WORKERS, timeout=PHOTO_PREFETCH_TIMEOUT)
+
+
+# ✅ 이번 실행에서 갤러리 사진 HTML 로 보낸 바이트 (재실행마다 0부터, 통계 expander 에 직전 실행 값 표시)
+GALLERY_PAYLOAD = {"tab1": 0, "tab3": 0}
+
+
+def photo_link_html(link, src, width, gallery):
+    html = (f'<a href="{link}" target="_blank">'
+            f'<img src="{src}" style="width:{width}px;border-radius:10px;"/>'
+            f'</a>')
+    GALLERY_PAYLOAD[gallery] += len(html.encode("utf-8"))
+    st.session_state["gallery_payload"] = dict(GALLERY_PAYLOAD)
+    return html
+
+
+def prefetch_photos(photo_id_lists, size=200):
+    try:
+        get_photo_prefetcher().prefetch([(file_id, size) for ids in photo_id_lists for file_id in ids if file_id])
+    except RuntimeError as e:  # 다른 세션의 새로고침으로 교체된 풀 → 미리 받기만 건너뜀 (result 에서 다시 요청)
+        print(f"⚠️ 사진 미리 받기 건너뜀: {e}")
+
+
+def upload_media_to_drive(service, media, filename, folder_id):
     # 🔍 Step 1: 기존 동일 파일명 검색
     query = f"'{folder_id}' in parents and name = '{filename}' and trashed = false"
-    response = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
+    response = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute(
+        num_retries=DRIVE_NUM_RETRIES)
     files = response.get('files', [])
 
-    media = MediaFileUpload(file_path, resumable=True)
-
     if files:
         file_id = files[0]['id']
         print(f"♻ 기존 파일 덮어쓰기: {filename}")
         updated = service.files().update(
             fileId=file_id,
             media_body=media
-        ).execute()
+        ).execute(num_retries=DRIVE_NUM_RETRIES)
         return updated['id']
     else:
         print(f"🆕 새 파일 업로드: {filename}")
@@ -516,57 +718,43 @@ def upload_file_to_drive(file_path, filename, folder_id):
             body=file_metadata,
             media_body=media,
             fields='id'
-        ).execute()
+        ).execute(num_retries=DRIVE_NUM_RETRIES)
         return uploaded['id']
 
-def download_pdf_from_drive(file_id, output_path):
-    scopes = ['https://www.googleapis.com/auth/drive.readonly']
+
+def upload_file_to_drive(file_path, filename, folder_id):
+    scopes = ['https://www.googleapis.com/auth/drive']
     key_dict = load_google_service_account_key()
     creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scopes)
     service = build('drive', 'v3', credentials=creds)
+    return upload_media_to_drive(service, MediaFileUpload(file_path, resumable=True), filename, folder_id)
 
-    request = service.files().get_media(fileId=file_id)
-    fh = io.FileIO(output_path, mode='wb')
-    downloader = MediaIoBaseDownload(fh, request)
-
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
 
-def generate_profile_card_from_sheet(member_id: str):
-    member_df = load_sheet("회원")
-    profile_df = load_sheet("프로필")
+def upload_bytes_to_drive(data, filename, folder_id, mimetype="application/pdf", service=None):
+    # 메모리 바이트 그대로 업로드 (스레드별 Drive 서비스 사용)
+    media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mimetype, resumable=True)
+    return upload_media_to_drive(service or get_thread_drive_service(), media, filename, folder_id)
 
-    write_log(member_id, f"[디버그] 시트 로딩 완료: 회원 {len(member_df)}명, 프로필 {len(profile_df)}명")
 
+def build_profile_card_data(member_id, member_df, profile_df, photo_pool=None, drive_local=None, log=None):
+    """create_pdf_from_data 입력 (사진 다운로드 포함). photo_pool / drive_local / log 는 fetch_profile_card_photos 참고"""
+    log = log or {}
     member_data = member_df[member_df["회원 ID"] == member_id]
     profile_data = profile_df[profile_df["회원 ID"] == member_id]
 
     if member_data.empty or profile_data.empty:
-        write_log(member_id, f"[❌에러] {member_id}에 해당하는 정보가 시트에 없습니다.")
+        write_log(member_id, f"[❌에러] {member_id}에 해당하는 정보가 시트에 없습니다.", **log)
         raise ValueError(f"{member_id}에 해당하는 회원 정보 또는 프로필 정보가 없습니다.")
 
     m = member_data.iloc[0].to_dict()
     p = profile_data.iloc[0].to_dict()
 
-    # 사진 다운로드 또는 경로 설정 (Streamlit 서버에 미리 저장된 경로로 매핑하거나 다운로드 구현 필요)
-    # 임시방식: 사진1~4는 temp에 다운로드했다고 가정
+    # 사진은 동시에 메모리로 받아서 그대로 PDF 생성에 넘김 (임시 파일 없음)
     photo_urls = str(p.get("본인 사진", "")).split(",")[:4]
-    photo_paths = []
+    photo_ids = p.get(PHOTO_IDS_COL, ())[:4]
 
-    write_log(member_id, f"[디버그] 📸 사진 링크 수집됨: {photo_urls}")
-
-    for i, url in enumerate(photo_urls):
-        try:
-            file_id = extract_drive_file_id(url.strip())
-            image = get_drive_image_profilecard(file_id)
-            temp_img = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-            image.save(temp_img.name)
-            photo_paths.append(temp_img.name)
-            write_log(member_id, f"[디버그] ✅ 이미지 {i + 1} 저장: {temp_img.name}")
-        except Exception as e:
-            write_log(member_id, f"[⚠️사진 에러] {url} 처리 실패: {e}")
-            continue
+    write_log(member_id, f"[디버그] 📸 사진 링크 수집됨: {photo_urls}", **log)
+    photos = fetch_profile_card_photos(member_id, photo_urls, photo_ids, photo_pool, drive_local, log)
 
     data = {
         "member_code": member_id,
@@ -588,7 +776,7 @@ def generate_profile_card_from_sheet(member_id: str):
         "attract_text": p.get("매력", ""),
         "hobby_text": p.get("취미", ""),
         "dating_text": p.get("연애스타일", ""),
-        "photo_paths": photo_paths,
+        "photos": photos,
     }
 
     # 🔽 뱃지 필드 처리
@@ -603,49 +791,115 @@ def generate_profile_card_from_sheet(member_id: str):
         "verify_asset": "자산" in badge_text
     })
 
-    write_log(member_id, f"[디버그] 🧾 PDF 생성 시작 {data}")
-    output_path = create_pdf_from_data(data)
+    return data
+
+
+PROFILE_CARD_FOLDER_ID = "104l4k5PPO25thz919Gi4241_IQ_MSsfe"
+
+
+def profile_card_link(file_id):
+    return f"https://drive.google.com/file/d/{file_id}/view?usp=sharing"
+
+
+def generate_profile_card_from_sheet(member_id: str):
+    member_df = load_sheet("회원")
+    profile_df, _ = load_profile_frame()
+
+    write_log(member_id, f"[디버그] 시트 로딩 완료: 회원 {len(member_df)}명, 프로필 {len(profile_df)}명")
+
+    step = time.perf_counter()
+    data = build_profile_card_data(member_id, member_df, profile_df)
+    timings = {"photo_fetch": time.perf_counter() - step}
+
+    write_log(member_id, f"[디버그] 🧾 PDF 생성 시작 { {k: v for k, v in data.items() if k != 'photos'} }")
+    output_path = create_pdf_from_data(data, timings=timings)
     write_log(member_id, f"[디버그] 📄 PDF 생성 완료: {output_path}")
+    write_log(member_id, f"[디버그] ⏱️ 단계별 시간(초): { {k: round(v, 3) for k, v in timings.items()} }")
 
     write_log(member_id, f"[디버그] ☁️ Drive 업로드 시작")
     uploaded_id = upload_file_to_drive(
         output_path,
         f"{member_id}_프로필카드.pdf",
-        folder_id="104l4k5PPO25thz919Gi4241_IQ_MSsfe"
+        folder_id=PROFILE_CARD_FOLDER_ID
     )
 
     write_log(member_id, f"[디버그] ✅ 업로드 완료: 파일 ID {uploaded_id}")
 
     # ✅ 프로필카드 링크 생성
-    pdf_url = f"https://drive.google.com/file/d/{uploaded_id}/view?usp=sharing"
+    pdf_url = profile_card_link(uploaded_id)
 
     # ✅ 프로필 시트의 AY열에 링크 업데이트
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        key_dict = load_google_service_account_key()
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
-        client = gspread.authorize(creds)
-
-        sheet = client.open_by_url(
-            "https://docs.google.com/spreadsheets/d/1jnZqqmZB8zWau6CHqxm-L9fxlXDaWxOaJm6uDcE6WN0/edit")
-        worksheet = sheet.worksheet("프로필")
-        all_values = worksheet.get_all_values()
-        headers = all_values[1]  # 2행이 헤더
-        data_rows = all_values[2:]  # 3행부터 데이터
-
-        for idx, row in enumerate(data_rows):
-            if str(row[headers.index("회원 ID")]).strip() == str(member_id).strip():
-                row_num = idx + 3  # 실제 시트 행 번호
-                col_num = headers.index("프로필 카드") + 1 if "프로필 카드" in headers else 52  # AY열 기본값
-                worksheet.update_cell(row_num, col_num, pdf_url)
-                write_log(member_id, f"✅ 프로필카드 링크 저장 완료: {pdf_url}")
-                break
+        worksheet = get_sheet_pool().worksheet(MEMBER_SHEET_URL, "프로필")
+        # "프로필 카드" 헤더가 없으면 AY열 기본값
+        if get_sheet_row_index("프로필").update_cell(worksheet, member_id, "프로필 카드", pdf_url, default_col=52):
+            write_log(member_id, f"✅ 프로필카드 링크 저장 완료: {pdf_url}")
     except Exception as e:
         write_log(member_id, f"❌ 프로필카드 링크 저장 실패: {e}")
 
     return uploaded_id
 
 
+# ✅ 프로필카드 일괄 생성: 시트는 한 번만 읽고, 렌더링은 프로세스 풀, 사진/업로드는 스레드 풀,
+#    링크는 마지막에 batch_update 한 번으로 저장
+PROFILE_CARD_IO_WORKERS = 4
+
+
+@st.cache_resource(show_spinner=False)
+def get_card_render_pool():
+    return make_render_pool()
+
+
+def upload_profile_card(member_id, output_path):
+    try:
+        return upload_file_to_drive(output_path, f"{member_id}_프로필카드.pdf", folder_id=PROFILE_CARD_FOLDER_ID)
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+
+def generate_profile_cards_batch(member_ids, on_progress=None):
+    """회원 ID 목록 → {회원 ID: {"file_id"/"error", ...}}. 회원별 실패는 해당 회원 결과에만 기록"""
+    member_ids = list(dict.fromkeys(str(member_id).strip() for member_id in member_ids if str(member_id).strip()))
+    member_df = load_sheet("회원")
+    profile_df, _ = load_profile_frame()
+    output_dir = tempfile.mkdtemp(prefix="profile_cards_")
+    # prepare 는 ProfileCardBatch 의 I/O 스레드에서 실행 → 캐시 객체/세션 값은 여기(메인 스레드)서 받아 둠
+    photo_pool, drive_local, log = get_card_photo_pool(), get_drive_thread_local(), log_context()
+
+    def prepare(member_id):
+        data = build_profile_card_data(member_id, member_df, profile_df, photo_pool, drive_local, log)
+        return data, os.path.join(output_dir, f"{member_id}_프로필카드.pdf")
+
+    batch = ProfileCardBatch(prepare, create_pdf_from_data, upload_profile_card, get_card_render_pool(),
+                             io_workers=PROFILE_CARD_IO_WORKERS)
+    try:
+        results = batch.run(member_ids, on_progress)
+    except BrokenProcessPool:
+        get_card_render_pool.clear()  # 작업 프로세스가 죽은 풀은 다음 실행 때 새로 생성
+        raise
+
+    links = {member_id: profile_card_link(result["file_id"])
+             for member_id, result in results.items() if "file_id" in result}
+    if links:
+        try:
+            worksheet = get_sheet_pool().worksheet(MEMBER_SHEET_URL, "프로필")
+            missing = get_sheet_row_index("프로필").update_cells(worksheet, links, "프로필 카드", default_col=52)
+            for member_id in missing:
+                results[member_id]["error"] = "프로필 시트에서 회원 ID를 찾지 못해 링크 저장 실패"
+        except Exception as e:
+            write_log("", f"❌ 프로필카드 링크 일괄 저장 실패: {e}")
+            for member_id in links:
+                results[member_id]["error"] = f"링크 저장 실패: {e}"
+
+    for member_id, result in results.items():
+        if "error" in result:
+            write_log(member_id, f"❌ 프로필카드 일괄 생성 실패: {result['error']}")
+        else:
+            write_log(member_id, f"✅ 프로필카드 일괄 생성 완료: {links[member_id]} ({result['seconds']}초)")
+    return results
+
+
 # ---------------------------
 # 매칭 로직
 # ---------------------------
@@ -657,16 +911,12 @@ def match_members(df, match_data):
         return pd.DataFrame()
 
     target = target_df.iloc[0]
-    filtered = df.copy()
-
-    numeric_fields = ["상태 FLAG", "본인(키)", "본인(나이)"]
-    for field in numeric_fields:
-        filtered[field] = pd.to_numeric(filtered[field], errors="coerce")
 
-    filtered = filtered[
-        (filtered["성별"] != target["성별"]) &
-        (filtered["상태 FLAG"] >= 4) &
-        (~filtered["매칭권"].fillna("").str.contains("시크릿"))
+    # 스냅샷에서 숫자/카테고리 변환이 끝난 상태이므로 바로 필터링
+    filtered = df[
+        (df["성별"] != target["성별"]) &
+        (df["상태 FLAG"] >= 4) &
+        (~df["매칭권"].fillna("").str.contains("시크릿"))
         ]
     print(f"1차 필터링 후 인원: {filtered}")
 
@@ -692,23 +942,16 @@ def match_members(df, match_data):
         filtered = filtered[filtered["본인(외모)"].isin(match_data["faceShape"])]
         print(f"얼굴상 필터링 후 인원: {filtered}")
     cond = match_data["conditions"]
-    try:
-        if cond[0]:
-            min_h, max_h = sorted(map(int, str(target["이상형(키)"]).replace(" ", "").split("~")))
-            filtered = filtered[filtered["본인(키)"].between(min_h, max_h)]
-            print(f"키 필터링 후 인원: {filtered}")
-    except:
-        write_log(match_data["memberId"], "키 필터 오류")
-        pass
 
-    try:
-        if cond[1]:
-            min_y, max_y = sorted(map(int, str(target["이상형(나이)"]).replace(" ", "").split("~")))
-            filtered = filtered[filtered["본인(나이)"].between(min_y, max_y)]
-            print(f"나이 필터링 후 인원: {filtered}")
-    except Exception as e:
-        print(f"[나이 필터 에러] {e}")
-        write_log(match_data["memberId"], "나이 필터 오류")
+    # 이상형 범위는 스냅샷 로드 시 파싱 완료 (빈 값/파싱 실패는 스냅샷 통계에 집계되고 필터 생략)
+    for i, (ideal_field, profile_field) in enumerate([("이상형(키)", "본인(키)"), ("이상형(나이)", "본인(나이)")]):
+        if cond[i]:
+            min_val, max_val = target.get(min_col(ideal_field)), target.get(max_col(ideal_field))
+            if pd.isna(min_val):
+                print(f"{ideal_field} 조건 비어있음/형식 오류 → 필터 생략")
+                continue
+            filtered = filtered[filtered[profile_field].between(min_val, max_val)]
+            print(f"{profile_field} 필터링 후 인원: {filtered}")
 
     condition_fields = [
         "이상형(사는 곳)", "이상형(학력)", "이상형(흡연)", "이상형(종교)",
@@ -721,9 +964,8 @@ def match_members(df, match_data):
 
     for i in range(2, 10):
         if cond[i]:
-            ideals_raw = str(target.get(condition_fields[i - 2], ""))
-            if ideals_raw.strip():
-                ideals = set(map(str.strip, ideals_raw.split(',')))
+            ideals = target.get(set_col(condition_fields[i - 2]))
+            if ideals is not None:
                 filtered = filtered[filtered[profile_fields[i - 2]].isin(ideals)]
                 print(f"{profile_fields[i - 2]} 기준 {ideals} 필터링 후 인원: {filtered}")
             else:
@@ -732,185 +974,146 @@ def match_members(df, match_data):
     if match_data["afterDate"]:
         try:
             after_date = pd.to_datetime(match_data["afterDate"])
-            filtered["설문 날짜"] = pd.to_datetime(filtered["설문 날짜"], errors="coerce")
-            filtered = filtered[filtered["설문 날짜"] >= after_date]
+            filtered = filtered[filtered[SURVEY_TS_COL] >= after_date]
             print(f"날짜 필터링 후 인원: {filtered}")
         except:
             write_log(match_data["memberId"], "날짜 필터링 오류")
             pass
 
-    sent_ids = str(target.get("받은 프로필 목록", "")).split(",") if pd.notna(target.get("받은 프로필 목록")) else []
-    sent_ids_set = set(map(str.strip, sent_ids))
-    filtered = filtered[~filtered["회원 ID"].astype(str).isin(sent_ids_set)]
+    sent_ids_set = target.get(set_col("받은 프로필 목록"), frozenset())
+    filtered = filtered[~filtered["회원 ID"].isin(sent_ids_set)]
     print(f"받은 프로필 필터링 후 인원: {filtered}")
 
     return filtered
 
 
-def get_profile_candidates(member_id, channel, faces, condition_list, member_df):
-    match_data = {
-        "memberId": member_id,
+# ✅ 여러 요청자 후보를 한 번에 추출 (요청자 × 후보 행렬을 한 번의 패스로 계산)
+#    mode="reciprocal" 이면 요청자별 양방향 점수 상위 k명 (점수 내림차순)
+def get_profile_candidates_batch(requests, member_df, mode="filter", k=None):
+    match_requests = [{
+        "memberId": str(member_id).strip(),
         "channel": channel,
         "conditions": condition_list,
-        "faces":faces
-    }
-    return auto_match_members(member_df, match_data)
+        "faces": faces
+    } for member_id, channel, faces, condition_list in requests]
 
-
-def get_weighted_top4_ids(df):
-    if df.empty:
-        return []
-    score_values = df["보내진 횟수"].fillna(0).astype(float)
-    weights = 1 / (score_values + 1)
-    if weights.sum() > 0:
-        return df.sample(n=min(4, len(df)), weights=weights, random_state=42)["회원 ID"].tolist()
+    index = get_member_index(member_df)
+    if mode == "reciprocal":
+        results = [index.reciprocal_rank(match_data, k or RECIPROCAL_TOP_K) for match_data in match_requests]
     else:
-        return df.head(4)["회원 ID"].tolist()
-
-def get_custom_face_top4(df, my_face_grade):
-    face_column = "등급(외모)"
-    df[face_column] = df[face_column].astype(str).str.strip()
-    selected_ids = []
-
-    def weighted_sample(group_df, n):
-        if group_df.empty:
-            return []
-        weights = 1 / (group_df["보내진 횟수"].fillna(0).astype(float) + 1)
-        return group_df.sample(n=min(n, len(group_df)), weights=weights, random_state=42)["회원 ID"].tolist()
-
-    if my_face_grade == "상":
-        selected_ids += weighted_sample(df[df[face_column] == "상"], 2)
-        mid_df = df[df[face_column].isin(["중상", "중"])]
-        selected_ids += weighted_sample(mid_df, 2)
-
-    elif my_face_grade in ["중상", "중"]:
-        selected_ids += weighted_sample(df[df[face_column] == "상"], 1)
-        mid_df = df[df[face_column].isin(["중상", "중"])]
-        selected_ids += weighted_sample(mid_df, 3)
-
-    elif my_face_grade == "중하":
-        selected_ids += weighted_sample(df[df[face_column] == "중상"], 1)
-        mid_df = df[df[face_column].isin(["중", "중하"])]
-        selected_ids += weighted_sample(mid_df, 2)
-        selected_ids += weighted_sample(df[df[face_column] == "하"], 1)
-
-    elif my_face_grade == "하":
-        selected_ids += weighted_sample(df[df[face_column] == "중"], 1)
-        selected_ids += weighted_sample(df[df[face_column] == "중하"], 1)
-        selected_ids += weighted_sample(df[df[face_column] == "하"], 2)
-
-    # 혹시 4명이 안 뽑혔을 경우 대비
-    selected_ids = selected_ids[:4]
-    return selected_ids
-
-
-# ✅ 후보 추출 함수 (match_members 참조 버전)
-def auto_match_members(df, match_data):
-    print('auto_match', match_data)
-    df["회원 ID"] = df["회원 ID"].astype(str).str.strip()
-    match_data["memberId"] = str(match_data["memberId"]).strip()
+        results = index.match_many(match_requests)
+    candidates = []
+    for match_data, result in zip(match_requests, results):
+        if result is None:
+            print(f"⚠️ 회원 ID {match_data['memberId']}에 해당하는 회원이 없습니다.")
+            result = pd.DataFrame()
+        candidates.append(result)
+    return candidates
 
-    target_df = df[df["회원 ID"] == match_data["memberId"]]
-    if target_df.empty:
-        st.warning("입력한 회원 ID에 해당하는 회원이 없습니다.")
-        return pd.DataFrame()
 
-    target = target_df.iloc[0]
-    filtered = df.copy()
+# ✅ 최종 4명 추출 (보내진 횟수 역가중 비복원 추출, 요청별 시드)
+def get_weighted_top4_ids(df, seed=None):
+    return stratified_sample_ids(df, UNSTRATIFIED_QUOTA, seed=seed)
 
-    numeric_fields = ["상태 FLAG", "본인(키)", "본인(나이)"]
-    for field in numeric_fields:
-        filtered[field] = pd.to_numeric(filtered[field], errors="coerce")
 
-    filtered = filtered[
-        (filtered["성별"] != target["성별"]) &
-        (filtered["상태 FLAG"] >= 4) &
-        (~filtered["매칭권"].fillna("").str.contains("시크릿"))
-        ]
-    print('성별,상태,매칭권 필터링 후 : ', filtered)
+# ✅ 요청자 외모 등급별 할당 인원으로 층화 추출 (모자라면 이웃 등급에서 보충)
+def get_custom_face_top4(df, my_face_grade, seed=None):
+    return stratified_sample_ids(df, face_grade_quotas(my_face_grade), seed=seed)
 
-    # 채널 필터
-    if match_data["channel"] and "전체" not in match_data["channel"]:
-        valid_channels = []
-        channel_map = {"프립(F)": "F", "네이버(N)": "N", "프사오(O)": "O", "인스타(A)": "A", "기타(B)": "B", "기타2(C)": "C"}
-        for ch in match_data["channel"]:
-            if ch in channel_map:
-                valid_channels.append(channel_map[ch])
-        filtered = filtered[filtered["주문번호"].astype(str).str[0].isin(valid_channels)]
-    print('채널 필터링 후 : ', filtered)
 
-    if match_data.get("faces"):
-        filtered = filtered[filtered["등급(외모)"].isin(match_data["faces"])]
-        print("외모 필터링 후 : ", filtered)
+# ✅ 스냅샷별 비트셋 역색인 (최근 2개, 인덱스가 스냅샷을 참조하므로 보관 중에는 id가 재사용되지 않음)
+MEMBER_INDEX_KEEP = 2
 
-    if match_data.get("abilitys"):
-        filtered = filtered[filtered["등급(능력)"].isin(match_data["abilitys"])]
-        print("능력 필터링 후 : ", filtered)
 
-    if match_data.get("faceShape") and match_data["faceShape"] != ["전체"]:
-        filtered = filtered[filtered["본인(외모)"].isin(match_data["faceShape"])]
-        print("얼굴상 필터링 후 : ", filtered)
+@st.cache_resource(show_spinner=False)
+def get_member_index_registry():
+    return {"lock": threading.Lock(), "entries": {}}  # id(스냅샷) → 인덱스
+
+
+def register_member_index(snapshot, changes, previous=None):
+    """새 스냅샷의 인덱스 등록. 직전 스냅샷 인덱스가 있으면 변경 행만 반영해서 만든다"""
+    registry = get_member_index_registry()
+    with registry["lock"]:
+        entries = registry["entries"]
+        if id(snapshot) in entries:
+            return entries[id(snapshot)]
+        base = entries.get(id(previous)) if previous is not None else None
+        if base is not None and base.frame is previous and not changes["full"]:
+            index = base.apply_changes(snapshot, changes)
+        else:
+            index = MemberBitsetIndex(snapshot)
+        entries[id(snapshot)] = index
+        while len(entries) > MEMBER_INDEX_KEEP:
+            entries.pop(next(iter(entries)))
+        return index
 
-    condition_fields = [
-        "이상형(키)", "이상형(나이)", "이상형(사는 곳)", "이상형(학력)", "이상형(흡연)",
-        "이상형(종교)", "이상형(회사 규모)", "이상형(근무 형태)", "이상형(음주)", "이상형(문신)"
-    ]
-    profile_fields = [
-        "본인(키)", "본인(나이)", "본인(거주지-분류)", "본인(학력)", "본인(흡연)",
-        "본인(종교)", "본인(회사 규모)", "본인(근무 형태)", "본인(음주)", "본인(문신)"
-    ]
 
-    conds = match_data.get("conditions", [False] * 10)
-    for i, use in enumerate(conds):
-        if not use:
-            continue
+def get_member_index(snapshot):
+    index = get_member_index_registry()["entries"].get(id(snapshot))
+    if index is None or index.frame is not snapshot:
+        index = register_member_index(snapshot, {"full": True})
+    return index
 
-        ideal_value = str(target.get(condition_fields[i], "")).strip()
-        if not ideal_value:
-            continue
 
-        if i in [0, 1]:
-            try:
-                min_val, max_val = sorted(map(int, ideal_value.replace(" ", "").split("~")))
-                filtered[profile_fields[i]] = pd.to_numeric(filtered[profile_fields[i]], errors="coerce")
-                filtered = filtered[filtered[profile_fields[i]].between(min_val, max_val)]
-                if i == 0:
-                    print("키 필터", min_val, max_val)
-                    print(filtered)
-                else:
-                    print("나이 필터", min_val, max_val)
-                    print(filtered)
-            except:
-                pass
-        else:
-            ideals = set(map(str.strip, ideal_value.split(",")))
-            filtered[profile_fields[i]] = filtered[profile_fields[i]].astype(str).str.strip()
-            filtered = filtered[filtered[profile_fields[i]].isin(ideals)]
+# ✅ 양방향 점수 매칭 (요청자 이상형 ↔ 후보 이상형 모두 평가, 상위 k명)
+#    조건 필터는 조건을 만족하는 전원을 돌려주지만, 양방향 점수는 상위 k명만 돌려준다 (K열/화면에 표시)
+RECIPROCAL_TOP_K = 20
+reciprocal_top_k = int(top_k_param) if str(top_k_param).isdigit() and int(top_k_param) > 0 else RECIPROCAL_TOP_K
 
-    sent_ids = str(target.get("받은 프로필 목록", "")).split(",") if pd.notna(target.get("받은 프로필 목록")) else []
-    sent_ids_set = set(map(str.strip, sent_ids))
-    filtered = filtered[~filtered["회원 ID"].astype(str).isin(sent_ids_set)]
 
-    return filtered
+def reciprocal_match_members(df, match_data, k=RECIPROCAL_TOP_K):
+    match_data["memberId"] = str(match_data["memberId"]).strip()
+
+    ranked = get_member_index(df).reciprocal_rank(match_data, k)
+    if ranked is None:
+        st.warning("입력한 회원 ID에 해당하는 회원이 없습니다.")
+        return pd.DataFrame()
+
+    print('양방향 점수 상위 : ', ranked[["회원 ID", "호환 점수"]].values.tolist())
+    return ranked
+
+
+REQUEST_GRID_RANGE = "B3:H34"  # 요청 블록 8개 (B3, B7, ..., B31) 전체 영역
+REQUEST_GRID_FIRST_ROW = 3
+
+
+def read_request_cell(grid, row, col):
+    """B3부터 한 번에 읽은 요청 격자(B3:H34, B3:U34)에서 시트 좌표(row, 열 문자)의 값을 꺼낸다."""
+    r = row - REQUEST_GRID_FIRST_ROW
+    c = ord(col) - ord("B")
+    if r < len(grid) and c < len(grid[r]):
+        return grid[r][c]
+    return ""
 
 
 def run_multi_matching():
+    # ✅ 이 스레드가 보내는 시트 요청 전부 집계 (핸들 열기/토큰 갱신/회원 시트 조회 포함)
+    #    재시작 직후 저장본을 쓰는 경우의 백그라운드 재조회는 다른 스레드라 빠짐
+    pool = get_sheet_pool()
+    api_calls = pool.start_call_count()
     try:
-        request_df, request_ws = load_sheet_with_ws(sheet_name)
-        member_df = load_sheet("회원")
-        member_df["회원 ID"] = member_df["회원 ID"].astype(str).str.strip()
+        request_ws = pool.worksheet(MEMBER_SHEET_URL, sheet_name)  # 요청 시트는 전체를 읽지 않고 핸들만
+        member_df, _ = load_member_snapshot()
+
+        # ✅ 요청 격자 한 번에 읽기
+        grid = request_ws.batch_get([REQUEST_GRID_RANGE])[0]
+        pool.record("batch_get")
 
         row_indices = list(range(3, 32, 4))  # B3, B7, ..., B31
+        blocks = []  # (base_row, member_id, channel, faces, condition_flags)
+        today = datetime.now(pytz.timezone("Asia/Seoul")).strftime("%Y-%m-%d")  # 같은 날 재실행 시 같은 추출 결과
+        updates = []  # 마지막에 batch_update로 한 번에 저장
 
         for base_row in row_indices:
             print(f"🔄 처리 중: Row {base_row}")
+            member_id = ""
 
             try:
-                member_id = str(request_ws.acell(f"B{base_row}").value).strip()
-                channel = request_ws.acell(f"C{base_row}").value
-                face_grade_raw = request_ws.acell(f"F{base_row}").value or ""
-                default_cond = request_ws.acell(f"G{base_row}").value or ""
-                override_cond = request_ws.acell(f"H{base_row}").value or ""
+                member_id = str(read_request_cell(grid, base_row, "B")).strip()
+                channel = read_request_cell(grid, base_row, "C") or None
+                face_grade_raw = read_request_cell(grid, base_row, "F") or ""
+                default_cond = read_request_cell(grid, base_row, "G") or ""
+                override_cond = read_request_cell(grid, base_row, "H") or ""
                 print('id', member_id, channel, default_cond, override_cond)
 
                 default_cond_list = [c.strip() for c in default_cond.split(",") if c.strip()]
@@ -949,51 +1152,79 @@ def run_multi_matching():
                 print(f"🧩 조건: {condition_list}")
                 print(f"🧩 정규화 조건: {normalized}")
                 print(f"🧩 조건 Flags: {condition_flags}")
+                blocks.append((base_row, member_id, channel, faces, condition_flags))
 
-                # 후보 추출
-                candidates_df = get_profile_candidates(member_id, channel, faces, condition_flags, member_df)
-                print(f"🔍 후보 수: {len(candidates_df)}명")
+            except Exception as inner_e:
+                print(f"❌ Row {base_row} 처리 중 오류: {inner_e}")
+                write_log(member_id, f"❌ Row {base_row} 처리 중 오류: {inner_e}")
+
+        # ✅ 모든 블록의 후보를 한 번에 추출
+        candidates_list = get_profile_candidates_batch([block[1:] for block in blocks], member_df, mode=match_mode,
+                                                       k=reciprocal_top_k)
+
+        for (base_row, member_id, channel, faces, condition_flags), candidates_df in zip(blocks, candidates_list):
+            try:
+                print(f"🔍 Row {base_row} 후보 수: {len(candidates_df)}명")
 
                 # 전체 후보 ID 리스트 저장 (K열 = col 11)
                 # 등급별로 ID 그룹화
-                grouped = candidates_df.groupby("등급(외모)")["회원 ID"].apply(
+                grouped = candidates_df.groupby("등급(외모)", observed=True)["회원 ID"].apply(
                     lambda ids: ",".join(ids.astype(str))).to_dict()
 
                 # 출력할 등급 순서 정의
                 face_order = ["상", "중상", "중", "중하", "하"]
                 formatted_str = ""
+                if match_mode == "reciprocal":  # 조건 필터와 달리 전체가 아닌 상위 k명만 기록됨을 표시
+                    formatted_str += f"[양방향 점수 상위 {reciprocal_top_k}명]\n\n"
                 for grade in face_order:
                     if grade in grouped:
                         formatted_str += f"[{grade}]\n{grouped[grade]}\n\n"
 
-                # K열 업데이트
-                request_ws.update_cell(base_row, 11, formatted_str.strip())
-                print(f"✅ 후보 ID 목록 저장 완료: {formatted_str}")
+                # K열 업데이트 예약
+                updates.append({"range": f"K{base_row}", "values": [[formatted_str.strip()]]})
+                print(f"✅ 후보 ID 목록 준비 완료: {formatted_str}")
 
                 # 최종 4명 추출 후 L+1 ~ L+4에 저장
-                if not faces:  # 외모조건 미선택 시
+                if match_mode == "reciprocal":  # 양방향 점수 순위 그대로 상위 4명
+                    top4 = candidates_df["회원 ID"].head(4).tolist() if not candidates_df.empty else []
+                elif not faces:  # 외모조건 미선택 시
                     my_face_grade = member_df[member_df["회원 ID"] == member_id]["등급(외모)"].values[0]
-                    top4 = get_custom_face_top4(candidates_df, my_face_grade)
+                    top4 = get_custom_face_top4(candidates_df, my_face_grade, seed=request_seed(member_id, today))
                 else:
-                    top4 = get_weighted_top4_ids(candidates_df)
+                    top4 = get_weighted_top4_ids(candidates_df, seed=request_seed(member_id, today))
                 print(f"⭐ 최종 추출된 4명: {top4}")
 
-                for i, pid in enumerate(top4):
-                    request_ws.update_cell(base_row + i, 12, pid)
+                if top4:
+                    updates.append({
+                        "range": f"L{base_row}:L{base_row + len(top4) - 1}",
+                        "values": [[pid] for pid in top4],
+                    })
 
             except Exception as inner_e:
                 print(f"❌ Row {base_row} 처리 중 오류: {inner_e}")
-                write_log(match_data["memberId"], f"❌ Row {base_row} 처리 중 오류: {inner_e}")
+                write_log(member_id, f"❌ Row {base_row} 처리 중 오류: {inner_e}")
+
+        # ✅ K/L열 결과 한 번에 저장
+        if updates:
+            request_ws.batch_update(updates, value_input_option="USER_ENTERED")  # update_cell 과 같게 (숫자 ID 를 숫자로)
+            pool.record("batch_update")
 
         print("🎉 모든 8명 추출 완료!")
 
     except Exception as e:
         print(f"❌ 전체 처리 실패: {e}")
+    finally:
+        pool.stop_call_count()
 
+    summary = f"📊 multi matching API 호출: 총 {sum(api_calls.values())}회 {api_calls}"
+    print(summary)
+    write_log("", summary)
+    return api_calls
 
-def get_phone_number_by_member_id(member_id: str) -> str:
-    member_df = load_sheet("회원")
-    member_df["회원 ID"] = member_df["회원 ID"].astype(str).str.strip()
+
+def get_phone_number_by_member_id(member_id: str, member_df=None) -> str:
+    if member_df is None:
+        member_df, _ = load_member_snapshot()
     row = member_df[member_df["회원 ID"] == str(member_id).strip()]
     if not row.empty:
         return row.iloc[0].get("휴대폰번호", "010-0000-0000")
@@ -1002,7 +1233,7 @@ def get_phone_number_by_member_id(member_id: str) -> str:
 AUTO_SAVE_INTERVAL = 3  # 초 단위
 
 def get_profile_memo(member_id):
-    df, _ = load_sheet_with_ws("프로필")
+    df, _ = load_sheet_with_ws("프로필", allow_stale=False)  # 자동 저장으로 덮어쓰므로 저장본 사용 안 함
     df["회원 ID"] = df["회원 ID"].astype(str).str.strip()
     row = df[df["회원 ID"] == str(member_id).strip()]
     if not row.empty:
@@ -1010,70 +1241,33 @@ def get_profile_memo(member_id):
     return ""
 
 def save_profile_memo(member_id, new_memo):
-    _, ws = load_sheet_with_ws("프로필")
-    all_values = ws.get_all_values()
-    headers = all_values[1]
-    data = all_values[2:]
-
-    if "회원 ID" not in headers or "메모" not in headers:
-        return False
-
-    id_idx = headers.index("회원 ID")
-    memo_idx = headers.index("메모")
-
-    for i, row in enumerate(data):
-        if row[id_idx].strip() == member_id.strip():
-            ws.update_cell(i + 3, memo_idx + 1, new_memo)
-            return True
-    return False
+    ws = get_sheet_pool().worksheet(MEMBER_SHEET_URL, "프로필")
+    return get_sheet_row_index("프로필").update_cell(ws, member_id, "메모", new_memo)
 
 
-def process_and_upload_watermarked_pdf(member_id, source_url, save_name, target_folder_id):
-    import tempfile
-    import os
-
-    write_log(member_id, f"make watermark {source_url}, {save_name}, {target_folder_id}")
-    try:
-        # 🔍 회원 ID로 휴대폰 번호 조회
-        phone_number = get_phone_number_by_member_id(member_id)
-
-        # 1. 임시 파일 생성
-        input_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf").name
-        watermark_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf").name
-        output_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf").name
-
-
-        # 2. 원본 PDF 다운로드
-        source_id = extract_drive_file_id(source_url)
-        download_pdf_from_drive(source_id, input_pdf)
-        write_log(member_id, "Download")
-
-        # 3. 워터마크 PDF 생성 (📱 휴대폰 번호 사용)
-        create_watermark(phone_number, watermark_pdf)
-        write_log(member_id, "Create")
+# ✅ 워터마크 PDF 캐시 (휴대폰 번호 + 페이지 크기별, 요청자 1명의 후보 4명이 같은 워터마크 공유)
+@st.cache_resource(show_spinner=False)
+def get_watermark_stamps():
+    return WatermarkStampCache()
 
-        # 4. 워터마크 적용된 PDF 생성
-        add_watermark_to_pdf(input_pdf, output_pdf, watermark_pdf)
-        write_log(member_id,"워터마크 pdf 생성 성공")
 
-        # 5. Google Drive 업로드
-        uploaded_id = upload_file_to_drive(output_pdf, save_name, target_folder_id)
-        final_link = f"https://drive.google.com/file/d/{uploaded_id}/view?usp=sharing"
+def process_and_upload_watermarked_pdf(phone_number, source_url, save_name, target_folder_id, stamps, drive_local):
+    """워터마크 작업 스레드에서 실행 → (링크 또는 None, 진행 로그 목록).
 
-        # 6. 임시 파일 정리
-        for f in [input_pdf, watermark_pdf, output_pdf]:
-            if os.path.exists(f):
-                os.remove(f)
+    스레드에는 ScriptRunContext 가 없으므로 write_log / 캐시 함수는 부르지 않는다.
+    휴대폰 번호, 워터마크 캐시, Drive 스레드 저장소는 메인 스레드에서 받아 넘기고 로그도 메인 스레드에서 남긴다.
+    """
+    file_id, steps = watermark_job(
+        phone_number, extract_drive_file_id(source_url), stamps,
+        lambda file_id: download_drive_file(file_id, get_thread_drive_service(drive_local)),
+        lambda data: upload_bytes_to_drive(data, save_name, target_folder_id,
+                                           service=get_thread_drive_service(drive_local)))
+    return (f"https://drive.google.com/file/d/{file_id}/view?usp=sharing" if file_id else None), steps
 
-        return final_link
 
-    except Exception as e:
-        write_log(member_id, f"❌ 워터마크 생성 실패: {e}")
-        # 실패 시 임시 파일 삭제
-        for f in [input_pdf, watermark_pdf, output_pdf]:
-            if f and os.path.exists(f):
-                os.remove(f)
-        return None
+# ✅ 워터마크 트리거 동시 작업 수 (작업 1건 = Drive 다운로드 + 업로드 검색/생성 3~4회 요청, 사용자당 초당 요청 한도 고려)
+WATERMARK_WORKERS = 6
+WATERMARK_GRID_RANGE = "B3:U34"  # 요청 블록 8개 (회원 ID B열, 후보 ID L열, 원본 링크 T열, 결과 U열)
 
 
 # URL 쿼리를 통해 mulit_bulk_matching 트리거
@@ -1089,6 +1283,21 @@ if trigger == "multi_matching":
         write_log("", "✅ 외부 트리거: 매칭 완료됨")
         st.stop()
 
+# URL 쿼리로 프로필카드 일괄 생성 (trigger=profile_cards&member_ids=ID1,ID2,...)
+if trigger == "profile_cards":
+    if token != st.secrets.get("apps_script_token"):  # ✅ secrets.toml에 미리 저장된 토큰
+        st.error("⛔ 요청 권한 없음")
+        write_log("", "❌ 외부 트리거 거부됨: 유효하지 않은 토큰")
+        st.stop()
+
+    with st.spinner("📇 프로필카드 일괄 생성 중..."):
+        batch_ids = [member_id for member_id in str(params.get("member_ids", "")).split(",") if member_id.strip()]
+        batch_results = generate_profile_cards_batch(batch_ids)
+        failed = [member_id for member_id, result in batch_results.items() if "error" in result]
+        write_log("", f"✅ 외부 트리거: 프로필카드 {len(batch_results) - len(failed)}/{len(batch_results)}건 생성 (실패: {failed})")
+        st.json(batch_results)
+        st.stop()
+
 if trigger == "watermark":
     # ✅ 요청 출처 검증을 위한 토큰 검사
     if token != st.secrets.get("apps_script_token"):  # ✅ secrets.toml에 미리 저장된 토큰
@@ -1098,45 +1307,57 @@ if trigger == "watermark":
     with st.spinner("📄 워터마크 삽입 중..."):
         try:
             df, ws = load_sheet_with_ws(sheet_name)
-
-            for base_row in range(3, 32, 4):  # B3, B7, ..., B31
-                member_id = str(ws.acell(f"B{base_row}").value).strip()
-                if not member_id:
-                    continue
-
-                # 🔁 J열~S열 데이터 한 번에 읽기 (J~S: 10~19열)
-                cell_range = f"L{base_row}:U{base_row + 3}"
-                batch_values = ws.get_values(cell_range) # .strip()?
-
-                updates = []  # batch_update용
-
-                for i in range(4):
-                    try:
-                        row = batch_values[i] if i < len(batch_values) else []
-                        pid = row[0] if len(row) > 0 else ""
-                        source_link = row[8] if len(row) > 8 else ""
+            folder_id = "104l4k5PPO25thz919Gi4241_IQ_MSsfe"
+            blocks = []  # (base_row, member_id, [(pid, future), ...])
+
+            # ✅ 요청 격자 한 번에 읽기 + 작업 스레드에 넘길 값은 메인 스레드에서 미리 준비
+            grid = ws.get_values(WATERMARK_GRID_RANGE)
+            member_df, _ = load_member_snapshot()
+            stamps = get_watermark_stamps()
+            drive_local = get_drive_thread_local()
+
+            with ThreadPoolExecutor(max_workers=WATERMARK_WORKERS, thread_name_prefix="watermark") as pool:
+                for base_row in range(3, 32, 4):  # B3, B7, ..., B31
+                    member_id = str(read_request_cell(grid, base_row, "B")).strip()
+                    if not member_id:
+                        continue
+                    # 🔍 회원 ID로 휴대폰 번호 조회
+                    phone_number = get_phone_number_by_member_id(member_id, member_df)
+
+                    jobs = []
+                    for row in range(base_row, base_row + 4):
+                        pid = read_request_cell(grid, row, "L")
+                        source_link = read_request_cell(grid, row, "T")
 
                         if not pid or not source_link:
                             continue
 
-                        source_id = extract_drive_file_id(source_link)
                         new_name = f"{member_id}_프로필카드_{pid}.pdf"
-                        folder_id = "104l4k5PPO25thz919Gi4241_IQ_MSsfe"
-
-                        new_link = process_and_upload_watermarked_pdf(member_id, source_link, new_name, folder_id)
-                        if new_link:
-                            updates.append([new_link])
-                            write_log(member_id, f"✅ 워터마크 완료 ({pid}) → 링크 준비 완료")
-                        else:
+                        write_log(member_id, f"make watermark {source_link}, {new_name}, {folder_id}")
+                        jobs.append((pid, pool.submit(process_and_upload_watermarked_pdf, phone_number,
+                                                      source_link, new_name, folder_id, stamps, drive_local)))
+                    blocks.append((base_row, member_id, jobs))
+
+                for base_row, member_id, jobs in blocks:
+                    updates = []  # batch_update용 (후보 순서 유지)
+                    for pid, future in jobs:
+                        try:
+                            new_link, steps = future.result()
+                            for step in steps:
+                                write_log(member_id, step)
+                            if new_link:
+                                updates.append([new_link])
+                                write_log(member_id, f"✅ 워터마크 완료 ({pid}) → 링크 준비 완료")
+                            else:
+                                updates.append([""])
+                                write_log(member_id, f"❌ 워터마크 실패 ({pid})")
+                        except Exception as e:
                             updates.append([""])
-                            write_log(member_id, f"❌ 워터마크 실패 ({pid})")
-                    except Exception as e:
-                        updates.append([""])
-                        write_log(member_id, f"❌ 오류 ({pid if 'pid' in locals() else '?'}): {e}")
+                            write_log(member_id, f"❌ 오류 ({pid}): {e}")
 
-                # ✅ 한번에 U열에 결과 저장
-                if updates:
-                    ws.update(f"U{base_row}:U{base_row + len(updates) - 1}", updates)
+                    # ✅ 한번에 U열에 결과 저장
+                    if updates:
+                        ws.update(f"U{base_row}:U{base_row + len(updates) - 1}", updates)
 
             write_log("", "✅ 외부 트리거: 워터마크 완료됨")
             st.success("✅ 모든 워터마크 처리 완료")
@@ -1271,8 +1492,8 @@ else:
         st.title("\U0001F4CB 회원 프로필 매칭 시스템")
 
         try:
-            member_df = load_sheet("회원")
-            profile_df = load_sheet("프로필")
+            member_df, member_snapshot_stats = load_member_snapshot()
+            profile_df, profile_parse_failures = load_profile_frame()
         except Exception as e:
             st.error("시트를 불러오는 데 실패했습니다: " + str(e))
             write_log("", "시트 로딩 실패")
@@ -1306,6 +1527,13 @@ else:
 
             after_date = st.date_input("설문 이후 날짜 필터", value=None)
 
+            # 조건 필터: 요청자 이상형만으로 거른 뒤 가중 랜덤 / 양방향 점수: 서로의 이상형 충족 수로 상위 k명
+            match_mode_label = st.radio("매칭 방식", ["조건 필터", "양방향 점수"], horizontal=True)
+            ui_top_k = RECIPROCAL_TOP_K
+            if match_mode_label == "양방향 점수":
+                ui_top_k = st.number_input("양방향 점수 상위 몇 명", min_value=1, max_value=500, value=RECIPROCAL_TOP_K,
+                                           help="조건 필터는 조건을 만족하는 전원, 양방향 점수는 점수 상위 N명만 보여줍니다.")
+
             st.markdown("**추가 필터:**")
 
             # ✅ 선택 조건 자동 반영
@@ -1330,6 +1558,7 @@ else:
             st.markdown("---")
 
             st.title(f"👤 {st.session_state['user_id']}님 접속 중")
+            st.caption(sheet_age_caption(["회원", "프로필"]))
             col1, col2 = st.columns([1, 1])
             with col1:
                 if st.button("🚪 로그아웃"):
@@ -1338,11 +1567,38 @@ else:
 
             with col2:
                 if st.button("🔄 수동 새로고침"):
+                    old_log_sink = get_log_sink()  # 공용 기록기 → 새 기록기로 바꾼 뒤에 닫음
+                    old_photo_prefetcher = get_photo_prefetcher()  # 공용 풀 → 새 풀로 바꾼 뒤에 종료
+                    get_sheet_snapshots().expire()  # 다음 조회 때 시트를 실제로 다시 읽음
+                    get_key_ring().invalidate()  # 키 교체 반영
+                    get_drive_thumbnail_fetcher().expire_metadata()  # 사진 수정 시각 다시 확인
                     st.cache_data.clear()
-                    st.cache_resource.clear()  # ✅ 추가!
+                    # ✅ 시트 동기화 상태/인덱스/썸네일 캐시는 유지 → 새로고침해도 바뀐 행만 다시 반영
+                    for cached in (get_sheet_pool, get_log_sink, get_photo_prefetcher, get_drive_service,
+                                   load_sheet_with_ws, load_member_snapshot, load_profile_frame):
+                        cached.clear()
+                    get_log_sink()
+                    old_log_sink.close()  # 남은 로그 전송 (늦게 들어온 행은 put 에서 바로 전송)
+                    old_photo_prefetcher.shutdown()  # 진행 중인 다운로드는 끝까지 받음
                     st.session_state["last_rerun_time"] = time.time()
                     st.rerun()
 
+            with st.expander("🩺 시트 연결 / 로그 통계"):
+                st.json(get_sheet_pool().stats_snapshot())
+                st.json(get_log_sink().stats_snapshot())
+                st.json(member_snapshot_stats)
+                st.json({"시트 동기화": {name: get_sheet_sync(name).stats for name in ("회원", "프로필")}})
+                st.json({"시트 저장본": get_sheet_snapshots().stats})
+                st.json({"시트 행 색인": get_sheet_row_index("프로필").stats})
+                st.json({"암호화 키": get_key_ring().stats})
+                st.json({"워터마크 페이지": get_watermark_stamps().stats})
+                st.json({"프로필 파싱 실패": profile_parse_failures})
+                st.json({"썸네일 캐시": get_thumbnail_cache().stats_snapshot()})
+                st.json({"사진 미리 받기": get_photo_prefetcher().stats})
+                st.json({"Drive 썸네일 전송": get_drive_thumbnail_fetcher().stats})
+                st.json({"정적 썸네일": get_static_thumbnails().stats_snapshot(),
+                         "직전 실행 갤러리 전송 바이트": st.session_state.get("gallery_payload", {})})
+
         if "member_info_triggered" not in st.session_state:
             st.session_state["member_info_triggered"] = False
         if "selected_conditions" not in st.session_state:
@@ -1370,6 +1626,7 @@ else:
                 else:
                     m = target_member.iloc[0]
                     member_id_str = m.get("회원 ID", "")
+                    prefetch_photos([m.get(PHOTO_IDS_COL, ())[:5]])  # 기본 정보 그리는 동안 사진 미리 받기
                     st.markdown(f"### 🔍 {member_id_str} 회원 기본 정보")
 
                     info_rows = [
@@ -1411,39 +1668,26 @@ else:
                     with st.expander("📸 사진 보기"):
                         # ✅ 프로필 사진 표시 및 변경 최적화
                         # 이미지 캐시 딕셔너리 초기화
-                        if "image_cache_dict" not in st.session_state:
-                            st.session_state["image_cache_dict"] = {}
-                        image_cache = st.session_state["image_cache_dict"]
 
                         photo_urls = str(m.get("본인 사진", "")).split(',')
+                        photo_ids = m.get(PHOTO_IDS_COL, ())
                         photo_cols = st.columns(min(5, len(photo_urls)))
 
-                        for i, url in enumerate(photo_urls[:5]):
+                        for i, (url, file_id) in enumerate(zip(photo_urls[:5], photo_ids)):
                             url = url.strip()
 
                             with photo_cols[i]:
                                 if url.lower() in ["n/a", "본인사진"] or not url:
                                     continue
 
-                                file_id = extract_drive_file_id(url)
                                 if not file_id:
                                     st.warning("유효하지 않은 이미지 링크입니다.")
                                     continue
 
                                 try:
-                                    if file_id in image_cache:
-                                        img_b64 = image_cache[file_id]
-                                    else:
-                                        image = get_drive_image(file_id)
-                                        img_b64 = image_to_base64(image)
-                                        image_cache[file_id] = img_b64
-
-                                    st.markdown(
-                                        f'<a href="{url}" target="_blank">'
-                                        f'<img src="data:image/png;base64,{img_b64}" style="width:130px;border-radius:10px;"/>'
-                                        f'</a>',
-                                        unsafe_allow_html=True
-                                    )
+                                    img_url = get_photo_prefetcher().result((file_id, 200))
+
+                                    st.markdown(photo_link_html(url, img_url, 130, "tab1"), unsafe_allow_html=True)
                                 except Exception:
                                     st.warning("이미지 로드 실패")
                                     write_log("", "이미지 로드 실패")
@@ -1467,9 +1711,9 @@ else:
                                     os.remove(temp_file_path)
 
                                     # ✅ 기존 캐시 삭제
-                                    if "image_cache_dict" in st.session_state:
-                                        if original_file_id in st.session_state["image_cache_dict"]:
-                                            st.session_state["image_cache_dict"].pop(original_file_id, None)
+                                    if original_file_id:
+                                        get_thumbnail_cache().invalidate(original_file_id)
+                                        get_drive_thumbnail_fetcher().expire_metadata(original_file_id)
 
                                     # 프로필 사진 시트 업데이트
                                     if update_profile_photo_in_sheet(member_id_str, i, new_url):
@@ -1493,21 +1737,20 @@ else:
                         "conditions": conds
                     }
 
-                    result_df = match_members(member_df, match_data)
-                    st.subheader(f"📝 {memberId} 조건에 매칭된 총 회원 수: {len(result_df)}명")
-
-                    score_values = result_df["보내진 횟수"].fillna(0)
-                    score_values = pd.to_numeric(score_values, errors="coerce").fillna(0)
-                    weights = 1 / (score_values + 1)
-
-                    if weights.sum() > 0 and len(result_df) > 0:
-                        top_ids = result_df.sample(n=min(4, len(result_df)), weights=weights, random_state=42)[
-                            "회원 ID"].tolist()
+                    if match_mode_label == "양방향 점수":
+                        result_df = reciprocal_match_members(member_df, match_data, k=int(ui_top_k))
+                        st.subheader(f"📝 {memberId} 양방향 점수 상위 {len(result_df)}명 (최대 {int(ui_top_k)}명)")
+                        top_ids = result_df.head(4)["회원 ID"].tolist() if not result_df.empty else []
+                        list_columns = ["회원 ID", "이름", "호환 점수", "보내진 횟수"]
                     else:
-                        top_ids = result_df.head(4)["회원 ID"].tolist()
+                        result_df = match_members(member_df, match_data)
+                        st.subheader(f"📝 {memberId} 조건에 매칭된 총 회원 수: {len(result_df)}명")
+
+                        top_ids = get_weighted_top4_ids(result_df, seed=request_seed(memberId))
+                        list_columns = ["회원 ID", "이름", "보내진 횟수"]
 
                     with st.expander("\U0001F4CB 조건에 매칭된 회원 리스트 보기 (클릭)"):
-                        st.dataframe(result_df[["회원 ID", "이름", "보내진 횟수"]].reset_index(drop=True), height=200)
+                        st.dataframe(result_df[list_columns].reset_index(drop=True), height=200)
 
                     if "top_ids" not in st.session_state:
                         st.session_state["top_ids"] = []
@@ -1531,12 +1774,7 @@ else:
                         if available_df.empty:
                             st.error("❌ 추가로 뽑을 수 있는 회원이 없습니다.")
                         else:
-                            score_values = available_df["보내진 횟수"].fillna(0).astype(float)
-                            weights = 1 / (score_values + 1)
-                            new_top_ids = \
-                            available_df.sample(n=min(4, len(available_df)), weights=weights, random_state=None)[
-                                "회원 ID"].tolist()
-                            st.session_state["top_ids"] = new_top_ids
+                            st.session_state["top_ids"] = get_weighted_top4_ids(available_df, seed=None)
 
                             # ✅ 추가: top_rows, matched_profiles 갱신!
                             st.session_state["top_rows"] = member_df[
@@ -1580,6 +1818,11 @@ else:
                     top_rows = st.session_state.get("top_rows", pd.DataFrame())
                     matched_profiles = st.session_state.get("matched_profiles", pd.DataFrame())
 
+                    # ✅ 상위 4명 사진 전체를 먼저 병렬 요청
+                    if not matched_profiles.empty:
+                        top_profiles = matched_profiles[matched_profiles["회원 ID"].isin(st.session_state["top_ids"])]
+                        prefetch_photos(top_profiles[PHOTO_IDS_COL])
+
                     st.markdown("---")
                     st.subheader(f"📄 {memberId} 조건에 매칭된 상위 4명 프로필")
                     columns = st.columns(4)
@@ -1610,17 +1853,14 @@ else:
 
                             with st.expander("📸 사진 보기"):
                                 photo_urls = str(row.get("본인 사진", "")).split(',')
-                                for i, url in enumerate(photo_urls):
+                                photo_ids = row.get(PHOTO_IDS_COL, ())
+                                for i, (url, file_id) in enumerate(zip(photo_urls, photo_ids)):
                                     url = url.strip()
-                                    if "drive.google.com" in url and "id=" in url:
-                                        file_id = url.split("id=")[-1].split("&")[0]
+                                    if file_id:
                                         try:
-                                            image = get_drive_image(file_id)
-                                            img_b64 = image_to_base64(image)
-                                            st.markdown(
-                                                f'<a href="{url}" target="_blank"><img src="data:image/png;base64,{img_b64}" style="width:150px;border-radius:10px;"/></a>',
-                                                unsafe_allow_html=True
-                                            )
+                                            img_url = get_photo_prefetcher().result((file_id, 200))
+                                            st.markdown(photo_link_html(url, img_url, 150, "tab1"),
+                                                        unsafe_allow_html=True)
                                         except Exception as e:
                                             st.warning(f"이미지 로드 실패: {e}")
                                             write_log("", f"이미지 로드 실패: {e}")
@@ -1629,16 +1869,14 @@ else:
 
     with tab2:
 
-        # 받은 프로필 수를 숫자로 변환
-        member_df["받은 프로필 수"] = pd.to_numeric(member_df["받은 프로필 수"], errors="coerce").fillna(0)
-
-        # 🔥 상태가 '검증완료'인 회원만 필터링
+        # 🔥 상태가 '검증완료'인 회원만 필터링 (받은 프로필 수는 스냅샷에서 이미 숫자형)
         verified_members = member_df[member_df["상태"] == "검증완료"]
+        received_counts = verified_members["받은 프로필 수"].fillna(0)
 
         # 받은 프로필 수 그룹 나누기
-        group1 = verified_members[(verified_members["받은 프로필 수"] >= 0) & (verified_members["받은 프로필 수"] <= 3)]
-        group2 = verified_members[(verified_members["받은 프로필 수"] >= 4) & (verified_members["받은 프로필 수"] <= 7)]
-        group3 = verified_members[(verified_members["받은 프로필 수"] >= 8) & (verified_members["받은 프로필 수"] <= 11)]
+        group1 = verified_members[received_counts.between(0, 3)]
+        group2 = verified_members[received_counts.between(4, 7)]
+        group3 = verified_members[received_counts.between(8, 11)]
 
         columns_to_show = ["회원 ID", "이름", "등급(외모)", "등급(능력)", "받은 프로필 수"]
 
@@ -1657,6 +1895,7 @@ else:
         sheet_url = "https://docs.google.com/spreadsheets/d/1jnZqqmZB8zWau6CHqxm-L9fxlXDaWxOaJm6uDcE6WN0/edit"
         worksheet_name = '테스트용(하태훈)2의 사본'
         df, _ = load_sheet_with_ws(worksheet_name)
+        st.caption(sheet_age_caption([worksheet_name]))
 
         # 첫 번째 열(회원 ID가 있는 열) 기준으로 B3, B7, ..., B31 위치 인덱싱
         member_indices = [0, 4, 8, 12, 16, 20, 24, 28]
@@ -1670,11 +1909,6 @@ else:
             # 매칭된 4개 프로필의 회원 ID (J열: 열 index 9)
             profile_ids = df.iloc[selected_idx:selected_idx + 4, 9].astype(str).tolist()
 
-            # 이미지 캐시 딕셔너리 초기화
-            if "image_cache_dict" not in st.session_state:
-                st.session_state["image_cache_dict"] = {}
-            image_cache = st.session_state["image_cache_dict"]
-
             # 각 프로필 사진 출력 (M~Q열)
             for i, pid in enumerate(profile_ids):
                 st.markdown(f"👤 **프로필 {i + 1} - 회원ID {pid}**")
@@ -1692,21 +1926,11 @@ else:
                         if not file_id:
                             continue
 
-                        # 이미지 캐시 활용
-                        if file_id in image_cache:
-                            img_b64 = image_cache[file_id]
-                        else:
-                            image = get_drive_image2(file_id)
-                            img_b64 = image_to_base64(image)
-                            image_cache[file_id] = img_b64
+                        # 썸네일 디스크 캐시 → 정적 URL
+                        img_url = get_thumbnail_url(file_id, 300)
 
                         with col:
-                            st.markdown(
-                                f'<a href="{link}" target="_blank">'
-                                f'<img src="data:image/png;base64,{img_b64}" style="width:300px;border-radius:10px;"/>'
-                                f'</a>',
-                                unsafe_allow_html=True
-                            )
+                            st.markdown(photo_link_html(link, img_url, 300, "tab3"), unsafe_allow_html=True)
 
                     except Exception:
                         pass  # 로딩 실패 시 무시
@@ -1823,3 +2047,42 @@ else:
                         st.markdown(f"[📄 생성된 프로필카드 보기]({file_url})", unsafe_allow_html=True)
                     except Exception as e:
                         st.error(f"❌ 오류 발생: {e}")
+
+        st.markdown("---")
+        st.subheader("📚 여러 회원 프로필카드 일괄 생성")
+        batch_input = st.text_area("회원 ID 목록 (줄바꿈 또는 쉼표로 구분)", key="profilecard_batch_input")
+
+        if st.button("📚 일괄 생성하기", key="profilecard_batch_generate"):
+            batch_ids = list(dict.fromkeys(
+                member_id.strip() for member_id in batch_input.replace(",", "\n").split("\n") if member_id.strip()))
+            if not batch_ids:
+                st.warning("회원 ID를 입력해주세요.")
+            else:
+                stage_labels = {"prepare": "🖼️ 사진 준비 완료", "render": "📄 PDF 생성 완료", "upload": "☁️ 업로드 중"}
+                progress_bar = st.progress(0.0, text=f"0/{len(batch_ids)} 완료")
+                status_slots = {member_id: st.empty() for member_id in batch_ids}
+                finished = []
+
+                def show_card_progress(member_id, stage, result):
+                    if result is None:
+                        status_slots[member_id].info(f"{member_id}: {stage_labels[stage]}")
+                        return
+                    finished.append(member_id)
+                    progress_bar.progress(len(finished) / len(batch_ids), text=f"{len(finished)}/{len(batch_ids)} 완료")
+                    if "error" in result:
+                        status_slots[member_id].error(f"{member_id}: ❌ {result['stage']} 단계 실패 - {result['error']}")
+                    else:
+                        status_slots[member_id].success(f"{member_id}: ✅ 업로드 완료 ({result['seconds']}초)")
+
+                with st.spinner("프로필카드를 일괄 생성 중입니다..."):
+                    batch_results = generate_profile_cards_batch(batch_ids, show_card_progress)
+
+                # 링크 저장 결과까지 반영해서 최종 표시
+                for member_id, result in batch_results.items():
+                    if "file_id" in result and "error" not in result:
+                        status_slots[member_id].markdown(
+                            f"✅ {member_id}: [📄 프로필카드 보기]({profile_card_link(result['file_id'])}) ({result['seconds']}초)")
+                    elif "file_id" in result:
+                        status_slots[member_id].warning(f"{member_id}: ⚠️ {result['error']}")
+                succeeded = sum(1 for result in batch_results.values() if "error" not in result)
+                st.success(f"✅ {succeeded}/{len(batch_ids)}건 생성 완료")
@@ -5,8 +5,9 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfbase import pdfmetrics
 from reportlab.lib.utils import ImageReader
 from PIL import Image, ImageOps
-import os
-import regex
+import io
+import time
+from textLayout import remove_emojis, wrap_text
 
 # ✅ 폰트 등록 (배포 환경에 맞게 상대 경로 사용)
 pdfmetrics.registerFont(TTFont('PreLight', 'fonts/Pretendard-Light.ttf'))
@@ -14,50 +15,134 @@ pdfmetrics.registerFont(TTFont('PreRegular', 'fonts/Pretendard-Regular.ttf'))
 pdfmetrics.registerFont(TTFont('PreMedium', 'fonts/Pretendard-Medium.ttf'))
 pdfmetrics.registerFont(TTFont('PreSemiBold', 'fonts/Pretendard-SemiBold.ttf'))
 
-# 유니코드 이모지 범위
-emoji_range = {
-    '\U0001F600', '\U0001F9FF',  # emoticons
-    '\U0001F300', '\U0001F5FF',  # symbols & pictographs
-    '\U0001F680', '\U0001F6FF',  # transport & map symbols
-    '\U0001F1E0', '\U0001F1FF',  # flags
-    '\U00002700', '\U000027BF',  # dingbats
-    '\U0001F900', '\U0001F9FF',  # supplemental symbols
-    '\U00002600', '\U000026FF',  # misc symbols
-    '\U00002300', '\U000023FF',  # misc technical
-    '\U0000200D', '\U0001F3FB', '\U0001F3FC', '\U0001F3FD', '\U0001F3FE', '\U0001F3FF'  # ZWJ + skin tones
-}
-
-def remove_emojis(text):
-    # 모든 유니코드 이모지 및 결합된 이모지 제거
-    return regex.sub(r'\X', lambda m: '' if any(char in emoji_range for char in m.group()) else m.group(), text)
-
-
-def auto_rotate_image(image_path):
-    try:
-        image = Image.open(image_path)
-        image = ImageOps.exif_transpose(image)
-        temp_path = f"rotated_{os.path.basename(image_path)}"
-        image.save(temp_path)
-        return temp_path
-    except:
-        return image_path
-
-
-def create_pdf_from_data(data: dict, output_path: str = None) -> str:
+EXIF_ORIENTATION = 0x0112
+
+# ✅ 사진 칸(195.5×264.5pt)에 맞춰 인쇄 해상도로 줄여서 넣음 (원본 12MP 를 그대로 넣지 않음)
+PHOTO_TARGET_DPI = 300
+PHOTO_JPEG_QUALITY = 85
+
+
+def load_photo(raw, slot=None, dpi=PHOTO_TARGET_DPI):
+    """원본 사진 바이트 → ImageReader 용 JPEG 버퍼 (EXIF 방향 반영, 임시 파일 없이 메모리에서 처리).
+
+    slot(가로, 세로 pt) 과 dpi 가 있으면 칸에 들어갈 크기보다 큰 사진은 그 해상도로 줄이고
+    progressive JPEG 로 다시 인코딩한다. 이미 작고 회전이 필요 없는 JPEG 는 그대로 넘긴다.
+    """
+    image = Image.open(io.BytesIO(raw))
+    target = None
+    if slot and dpi:
+        target = (round(slot[0] / 72 * dpi), round(slot[1] / 72 * dpi))
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    fits = target is None or (min(image.size) <= min(target) and max(image.size) <= max(target))
+    if image.format == "JPEG" and orientation == 1 and fits:
+        return io.BytesIO(raw)
+
+    if target:
+        side = max(target)
+        image.draft("RGB", (side, side))  # JPEG 는 디코딩 단계에서 1/2, 1/4, 1/8 로 미리 축소
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    if target:
+        scale = min(target[0] / image.width, target[1] / image.height)
+        if scale < 1:
+            image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                 Image.LANCZOS, reducing_gap=2.0)
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=PHOTO_JPEG_QUALITY, progressive=True, optimize=True)
+    buffered.seek(0)
+    return buffered
+
+
+WIDTH, HEIGHT = A4
+WARNING_TEXT = "해당 프로필을 무단으로 열람, 사용, 공개, 배포 시 디지털 워터마킹 서비스를 통해 유출자를 추적 가능하며 유출 시 법적 책임이 발생할 수 있습니다."
+LABEL_COLOR = colors.HexColor("#FD6F22")
+
+# ✅ 기본 항목 배치 (라벨 중앙 x, 값 x, 라벨 목록). "자가"는 house == "O" 일 때만 오른쪽 열 마지막에 추가
+INFO_COLUMNS = [
+    (70, 105, ["나이", "키", "거주지", "흡연", "음주"], ["age", "height", "region", "smoking", "drink"]),
+    (230, 270, ["학력", "회사규모", "근무형태", "종교", "MBTI"], ["edu", "company", "work", "religion", "mbti"]),
+    (390, 430, ["직무", "연봉", "자차"], ["job", "salary", "car"]),
+]
+ROW_Y_START = HEIGHT - 185
+ROW_SPACING = 27
+
+SECTION_TITLES = ["저를 소개합니다", "저의 매력포인트는", "제 취미는요", "저의 연애스타일은"]
+SECTION_FIELDS = ["info_text", "attract_text", "hobby_text", "dating_text"]
+SECTION_Y_POSITIONS = [HEIGHT - 350, HEIGHT - 490, HEIGHT - 590, HEIGHT - 700]
+
+PHOTO_WIDTH, PHOTO_HEIGHT, PHOTO_SPACING_X, PHOTO_SPACING_Y = 195.5, 264.5, 40, 100
+_photo_start_x = (WIDTH - (PHOTO_WIDTH * 2 + PHOTO_SPACING_X)) / 2
+_photo_start_y = HEIGHT - 160 - PHOTO_HEIGHT
+PHOTO_POSITIONS = [
+    (_photo_start_x, _photo_start_y),
+    (_photo_start_x + PHOTO_WIDTH + PHOTO_SPACING_X, _photo_start_y),
+    (_photo_start_x, _photo_start_y - PHOTO_HEIGHT - PHOTO_SPACING_Y),
+    (_photo_start_x + PHOTO_WIDTH + PHOTO_SPACING_X, _photo_start_y - PHOTO_HEIGHT - PHOTO_SPACING_Y),
+]
+
+
+def label_x(x_center, text):
+    """라벨 중앙 정렬 x (PreSemiBold 13)"""
+    return x_center - pdfmetrics.stringWidth(text, "PreSemiBold", 13) / 2
+
+
+STATIC_LABELS = [(label_x(k_center, k), ROW_Y_START - i * ROW_SPACING, k)
+                 for k_center, _, keys, _ in INFO_COLUMNS for i, k in enumerate(keys)]
+HOUSE_LABEL = (label_x(INFO_COLUMNS[2][0], "자가"), ROW_Y_START - len(INFO_COLUMNS[2][2]) * ROW_SPACING, "자가")
+
+
+def draw_warning(c):
+    c.setFont("PreMedium", 9)
+    c.setFillColor(colors.HexColor("#9E9E9E"))
+    c.drawCentredString(WIDTH / 2, HEIGHT - 35, WARNING_TEXT)
+
+
+def draw_static_layer(c):
+    """1페이지 고정 요소: 회원코드 박스 배경, 기본 항목 라벨, 섹션 제목 박스"""
+    c.setFillColor(colors.HexColor("#FD8F53"))
+    c.roundRect(40, HEIGHT - 125, 165, 24, 12, fill=1, stroke=0)
+
+    c.setFont("PreSemiBold", 13)
+    c.setFillColor(LABEL_COLOR)
+    for x, y, text in STATIC_LABELS:
+        c.drawString(x, y, text)
+
+    box_x, box_width, box_height = 40, 170, 23
+    for title, y_start in zip(SECTION_TITLES, SECTION_Y_POSITIONS):
+        c.setFillColor(colors.HexColor("#FEE6E0"))
+        c.roundRect(box_x, y_start, box_width, box_height, 12, fill=1, stroke=0)
+        c.setFont("PreMedium", 16)
+        c.setFillColor(colors.black)
+        c.drawCentredString(box_x + box_width / 2, y_start + 5, title)
+
+
+def draw_photo_number(c, idx):
+    x, y = PHOTO_POSITIONS[idx]
+    circle_radius = 30
+    circle_x = x + 10
+    circle_y = y + PHOTO_HEIGHT - 10
+    c.setFillColor(colors.HexColor("#0070C0"))
+    c.circle(circle_x, circle_y, circle_radius, stroke=0, fill=1)
+    c.setFillColor(colors.white)
+    c.setFont("PreSemiBold", 40)
+    c.drawCentredString(circle_x, circle_y - 12, str(idx + 1))
+
+
+def create_pdf_from_data(data: dict, output_path: str = None, timings: dict = None,
+                         photo_dpi: int = PHOTO_TARGET_DPI) -> str:
+    """data["photos"]: 사진 원본 바이트 목록 (최대 4장). timings 를 넘기면 단계별 소요 시간(초)을 채운다.
+    photo_dpi=None 이면 사진을 줄이지 않고 원본 그대로 넣음"""
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
     member_code = data.get("member_code", "")
     output_path = output_path or f"{member_code}_프로필카드.pdf"
-    c = canvas.Canvas(output_path, pagesize=A4)
+    c = canvas.Canvas(output_path, pagesize=A4, pageCompression=1)
     width, height = A4
 
-    # 경고 문구
-    warning = "해당 프로필을 무단으로 열람, 사용, 공개, 배포 시 디지털 워터마킹 서비스를 통해 유출자를 추적 가능하며 유출 시 법적 책임이 발생할 수 있습니다."
-    c.setFont("PreMedium", 9)
-    c.setFillColor(colors.HexColor("#9E9E9E"))
-    c.drawCentredString(width / 2, height - 35, warning)
+    # 경고 문구 + 고정 요소 (회원코드 박스 배경, 라벨, 섹션 제목)
+    draw_warning(c)
+    draw_static_layer(c)
 
-    # 회원코드 박스
-    c.setFillColor(colors.HexColor("#FD8F53"))
-    c.roundRect(40, height - 125, 165, 24, 12, fill=1, stroke=0)
+    # 회원코드 (박스 배경은 draw_static_layer)
     c.setFillColor(colors.white)
     c.setFont("PreRegular", 16.5)
     c.drawCentredString(40 + 165 / 2, height - 118, f"회원코드  {member_code}")
@@ -81,133 +166,54 @@ def create_pdf_from_data(data: dict, output_path: str = None) -> str:
             c.drawImage(badge_img, badge_x_start + badge_index * badge_spacing, badge_y, badge_size, badge_size, mask='auto')
             badge_index += 1
 
-    # 기본 항목
-    left_keys = ["나이", "키", "거주지", "흡연", "음주"]
-    center_keys = ["학력", "회사규모", "근무형태", "종교", "MBTI"]
-    right_keys = ["직무", "연봉", "자차"]
-    if data.get("house") == "O":
-        right_keys.append("자가")
-
-    left_values = [data.get(k, "") for k in ["age", "height", "region", "smoking", "drink"]]
-    center_values = [data.get(k, "") for k in ["edu", "company", "work", "religion", "mbti"]]
-    right_values = [data.get(k, "") for k in ["job", "salary", "car"]]
+    # 기본 항목 값 (라벨은 draw_static_layer)
+    c.setFont("PreMedium", 11)
+    c.setFillColor(colors.black)
+    for _, v_x, _, fields in INFO_COLUMNS:
+        for i, field in enumerate(fields):
+            c.drawString(v_x, ROW_Y_START - i * ROW_SPACING, data.get(field, ""))
     if data.get("house") == "O":
-        right_values.append("O")
-
-    def draw_centered_text(x_center, y, text, font, size, color):
-        c.setFont(font, size)
-        c.setFillColor(color)
-        text_width = c.stringWidth(text, font, size)
-        c.drawString(x_center - text_width / 2, y, text)
-
-    left_k_center, left_v_x = 70, 105
-    center_k_center, center_v_x = 230, 270
-    right_k_center, right_v_x = 390, 430
-    row_y_start = height - 185
-    row_spacing = 27
-
-    for i, (k, v) in enumerate(zip(left_keys, left_values)):
-        y = row_y_start - i * row_spacing
-        draw_centered_text(left_k_center, y, k, "PreSemiBold", 13, colors.HexColor("#FD6F22"))
-        c.setFont("PreMedium", 11)
-        c.setFillColor(colors.black)
-        c.drawString(left_v_x, y, v)
-
-    for i, (k, v) in enumerate(zip(center_keys, center_values)):
-        y = row_y_start - i * row_spacing
-        draw_centered_text(center_k_center, y, k, "PreSemiBold", 13, colors.HexColor("#FD6F22"))
-        c.setFont("PreMedium", 11)
-        c.setFillColor(colors.black)
-        c.drawString(center_v_x, y, v)
-
-    for i, (k, v) in enumerate(zip(right_keys, right_values)):
-        y = row_y_start - i * row_spacing
-        draw_centered_text(right_k_center, y, k, "PreSemiBold", 13, colors.HexColor("#FD6F22"))
-        c.setFont("PreMedium", 11)
-        c.setFillColor(colors.black)
-        c.drawString(right_v_x, y, v)
+        x, y, text = HOUSE_LABEL
+        c.drawString(INFO_COLUMNS[2][1], y, "O")
+        c.setFont("PreSemiBold", 13)
+        c.setFillColor(LABEL_COLOR)
+        c.drawString(x, y, text)
 
-    def draw_section(title, content, y_start):
-        box_x, box_width, box_height = 40, 170, 23
+    def draw_section(content, y_start):
         text_x, max_width, line_spacing = 45, 500, 15
-        c.setFillColor(colors.HexColor("#FEE6E0"))
-        c.roundRect(box_x, y_start, box_width, box_height, 12, fill=1, stroke=0)
-        c.setFont("PreMedium", 16)
-        c.setFillColor(colors.black)
-        c.drawCentredString(box_x + box_width / 2, y_start + 5, title)
-
-        from reportlab.pdfbase.pdfmetrics import stringWidth
-        def wrap_text(text, font_name, font_size, max_width):
-            lines = []
-            for paragraph in text.strip().split("\n"):
-                words = paragraph.strip().split(" ")
-                line = ""
-                for word in words:
-                    test_line = f"{line} {word}".strip()
-                    if stringWidth(test_line, font_name, font_size) <= max_width:
-                        line = test_line
-                    else:
-                        lines.append(line)
-                        line = word
-                if line:
-                    lines.append(line)
-            return lines
-
         c.setFont("PreMedium", 13)
         c.setFillColor(colors.black)
         wrapped_lines = wrap_text(content, "PreMedium", 13, max_width)
         for i, line in enumerate(wrapped_lines):
             c.drawString(text_x, y_start - 5 - (i + 1) * line_spacing, line.strip())
 
-    sections = [
-        ("저를 소개합니다", remove_emojis(data.get("info_text", ""))),
-        ("저의 매력포인트는", remove_emojis(data.get("attract_text", ""))),
-        ("제 취미는요", remove_emojis(data.get("hobby_text", ""))),
-        ("저의 연애스타일은", remove_emojis(data.get("dating_text", ""))),
-    ]
-    section_y_positions = [height - 350, height - 490, height - 590, height - 700]
-    for (title, content), y in zip(sections, section_y_positions):
-        draw_section(title, content, y)
+    for field, y in zip(SECTION_FIELDS, SECTION_Y_POSITIONS):
+        draw_section(remove_emojis(data.get(field, "")), y)
+
+    timings["page1"] = time.perf_counter() - started
 
-    def draw_photos_page(c, image_paths):
+    def draw_photos_page(c, photos):
         c.showPage()
-        c.setFont("PreMedium", 9)
-        c.setFillColor(colors.HexColor("#9E9E9E"))
-        c.drawCentredString(width / 2, height - 35, warning)
-
-        img_width, img_height, spacing_x, spacing_y = 195.5, 264.5, 40, 100
-        total_width = img_width * 2 + spacing_x
-        start_x = (width - total_width) / 2
-        start_y = height - 160 - img_height
-
-        positions = [
-            (start_x, start_y),
-            (start_x + img_width + spacing_x, start_y),
-            (start_x, start_y - img_height - spacing_y),
-            (start_x + img_width + spacing_x, start_y - img_height - spacing_y),
-        ]
-
-        for idx, image_path in enumerate(image_paths):
-            if idx >= 4 or not os.path.exists(image_path):
+        draw_warning(c)
+
+        for idx, raw in enumerate(photos[:4]):
+            if not raw:
+                continue
+            step = time.perf_counter()
+            try:
+                img = ImageReader(load_photo(raw, (PHOTO_WIDTH, PHOTO_HEIGHT), photo_dpi))
+            except Exception as e:
+                print(f"⚠️ 사진 {idx + 1} 읽기 실패: {e}")
                 continue
-            x, y = positions[idx]
-            rotated_path = auto_rotate_image(image_path)
-            img = ImageReader(rotated_path)
-            c.drawImage(img, x, y, img_width, img_height, preserveAspectRatio=True, mask='auto')
-            circle_radius = 30
-            circle_x = x + 10
-            circle_y = y + img_height - 10
-            c.setFillColor(colors.HexColor("#0070C0"))
-            c.circle(circle_x, circle_y, circle_radius, stroke=0, fill=1)
-            c.setFillColor(colors.white)
-            c.setFont("PreSemiBold", 40)
-            c.drawCentredString(circle_x, circle_y - 12, str(idx + 1))
-
-    image_paths = data.get("photo_paths", [])
-    draw_photos_page(c, image_paths)
+            timings["photo_decode"] = timings.get("photo_decode", 0.0) + time.perf_counter() - step
+            x, y = PHOTO_POSITIONS[idx]
+            c.drawImage(img, x, y, PHOTO_WIDTH, PHOTO_HEIGHT, preserveAspectRatio=True, mask='auto')
+            draw_photo_number(c, idx)
+
+    step = time.perf_counter()
+    draw_photos_page(c, data.get("photos", []))
+    timings["photos_page"] = time.perf_counter() - step
+    step = time.perf_counter()
     c.save()
-    # 이미지 임시 파일 삭제
-    for img_path in image_paths:
-        if img_path.startswith("/tmp") and os.path.exists(img_path):
-            os.remove(img_path)
+    timings["save"] = time.perf_counter() - step
     return output_path
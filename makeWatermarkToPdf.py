@@ -1,12 +1,18 @@
+import io
+import threading
+from collections import OrderedDict
+
 import PyPDF2
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 
+STAMP_CACHE_SIZE = 64  # 메모리에 들고 있을 워터마크 페이지 수 (요청자 1명당 1개)
+
 
-def create_watermark(watermark_text, watermark_pdf):
-    """워터마크 PDF를 생성"""
-    c = canvas.Canvas(watermark_pdf, pagesize=A4)
-    width, height = A4
+def create_watermark(watermark_text, watermark_pdf, pagesize=A4):
+    """워터마크 PDF를 생성 (watermark_pdf: 경로 또는 파일 객체)"""
+    c = canvas.Canvas(watermark_pdf, pagesize=pagesize)
+    width, height = pagesize
 
     c.setFont("Helvetica", 50)  # 워터마크 폰트와 크기 설정
     c.setFillAlpha(0.15)  # 워터마크 투명도 설정 (0.0 ~ 1.0)
@@ -25,25 +31,108 @@ def create_watermark(watermark_text, watermark_pdf):
     c.save()
 
 
-def add_watermark_to_pdf(input_pdf, output_pdf, watermark_pdf):
-    """워터마크를 기존 PDF에 추가"""
-    # 원본 PDF 열기
+class WatermarkStampCache:
+    """(워터마크 문구, 페이지 크기) → 워터마크 PDF 바이트. 오래 안 쓴 것부터 버리는 LRU.
+
+    파싱된 페이지는 원본 스트림을 나중에 읽는 객체라 스레드 간에 공유하면 안 되므로
+    바꿀 수 없는 바이트만 보관하고, page() 는 호출할 때마다 새로 파싱한 페이지를 돌려준다.
+    같은 키를 여러 스레드가 동시에 처음 요청하면 한 스레드만 만들고 나머지는 기다렸다가 같은 바이트를 쓴다.
+    """
+
+    def __init__(self, max_entries=STAMP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stamps = OrderedDict()
+        self._building = {}  # 키 → 만드는 중 표시 (threading.Event)
+        self.stats = {"hits": 0, "builds": 0, "waits": 0, "evictions": 0}
+
+    def stamp_bytes(self, watermark_text, pagesize=A4):
+        key = (watermark_text, tuple(round(v, 2) for v in pagesize))
+        while True:
+            with self._lock:
+                data = self._stamps.get(key)
+                if data is not None:
+                    self._stamps.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return data
+                building = self._building.get(key)
+                if building is None:
+                    building = self._building[key] = threading.Event()
+                    break
+                self.stats["waits"] += 1
+            building.wait()  # 만든 스레드가 실패했으면 다시 돌아서 직접 만든다
+
+        try:
+            buffered = io.BytesIO()
+            create_watermark(watermark_text, buffered, pagesize)
+            data = buffered.getvalue()
+            with self._lock:
+                self._stamps[key] = data
+                self._stamps.move_to_end(key)
+                self.stats["builds"] += 1
+                while len(self._stamps) > self.max_entries:
+                    self._stamps.popitem(last=False)
+                    self.stats["evictions"] += 1
+            return data
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+            building.set()
+
+    def page(self, watermark_text, pagesize=A4):
+        """작업마다 새로 파싱한 워터마크 페이지 (스레드마다 따로 써도 안전)"""
+        return PyPDF2.PdfReader(io.BytesIO(self.stamp_bytes(watermark_text, pagesize))).pages[0]
+
+
+def add_watermark_to_pdf_bytes(pdf_bytes, watermark_page):
+    """PDF 바이트 → 워터마크가 추가된 PDF 바이트 (파일 없이 메모리에서 처리)"""
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    writer = PyPDF2.PdfWriter()
+
+    # 각 페이지마다 워터마크 추가
+    for original_page in reader.pages:
+        original_page.merge_page(watermark_page)
+        writer.add_page(original_page)
+
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def add_watermark_to_pdf(input_pdf, output_pdf, watermark_pdf=None, watermark_page=None):
+    """워터마크를 기존 PDF 파일에 추가 (watermark_page: 이미 파싱된 워터마크 페이지가 있으면 그대로 사용)"""
+    if watermark_page is None:
+        watermark_page = PyPDF2.PdfReader(watermark_pdf).pages[0]
     with open(input_pdf, 'rb') as original_file:
-        reader = PyPDF2.PdfReader(original_file)
-        writer = PyPDF2.PdfWriter()
-
-        # 워터마크 PDF 읽기
-        with open(watermark_pdf, 'rb') as watermark_file:
-            watermark_reader = PyPDF2.PdfReader(watermark_file)
-            watermark_page = watermark_reader.pages[0]
-
-            # 각 페이지마다 워터마크 추가
-            for page_num in range(len(reader.pages)):
-                original_page = reader.pages[page_num]
-                original_page.merge_page(watermark_page)
-                writer.add_page(original_page)
-
-            # 워터마크가 추가된 새 PDF 저장
-            with open(output_pdf, 'wb') as output_file:
-                writer.write(output_file)
+        watermarked = add_watermark_to_pdf_bytes(original_file.read(), watermark_page)
+    with open(output_pdf, 'wb') as output_file:
+        output_file.write(watermarked)
+
+
+def watermark_job(phone_number, source_id, stamps, download, upload):
+    """워터마크 작업 1건 → (업로드된 파일 ID 또는 None, 진행 로그 목록). 실패해도 예외 대신 (None, 로그)
+
+    작업 스레드에서 그대로 실행되므로 download(파일 ID) → PDF 바이트, upload(PDF 바이트) → 파일 ID 와
+    stamps(WatermarkStampCache) 는 호출한 쪽(메인 스레드)에서 만들어 넘긴다.
+    """
+    steps = []
+    try:
+        # 1. 원본 PDF 다운로드 (메모리로, 임시 파일 없음)
+        source_pdf = download(source_id)
+        steps.append("Download")
+
+        # 2. 워터마크 페이지 (📱 휴대폰 번호 사용, 같은 번호는 한 번만 그리고 작업마다 새로 파싱)
+        watermark_page = stamps.page(phone_number)
+        steps.append("Create")
+
+        # 3. 워터마크 적용된 PDF 생성
+        watermarked_pdf = add_watermark_to_pdf_bytes(source_pdf, watermark_page)
+        steps.append("워터마크 pdf 생성 성공")
+
+        # 4. 업로드
+        return upload(watermarked_pdf), steps
+
+    except Exception as e:
+        steps.append(f"❌ 워터마크 생성 실패: {e}")
+        return None, steps
 
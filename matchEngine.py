@@ -0,0 +1,819 @@
+import copy
+import zlib
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# ✅ 회원 시트에서 숫자로 다루는 컬럼
+NUMERIC_FIELDS = ["상태 FLAG", "본인(키)", "본인(나이)", "보내진 횟수", "받은 프로필 수"]
+
+# ✅ 값 종류가 적은 컬럼 → category 로 변환
+CATEGORY_FIELDS = [
+    "성별", "등급(외모)", "등급(능력)", "본인(외모)",
+    "본인(거주지-분류)", "본인(학력)", "본인(흡연)", "본인(종교)",
+    "본인(회사 규모)", "본인(근무 형태)", "본인(음주)", "본인(문신)",
+]
+CATEGORY_MAX_RATIO = 0.5  # 고유값 비율이 이보다 크면 문자열 그대로 유지
+
+ID_FIELDS = ["회원 ID"]
+
+# ✅ 로드 시점에 미리 파싱해 두는 파생 컬럼
+IDEAL_RANGE_FIELDS = ["이상형(키)", "이상형(나이)"]
+IDEAL_SET_FIELDS = [
+    "이상형(사는 곳)", "이상형(학력)", "이상형(흡연)", "이상형(종교)",
+    "이상형(회사 규모)", "이상형(근무 형태)", "이상형(음주)", "이상형(문신)"
+]
+RECEIVED_FIELD = "받은 프로필 목록"
+SURVEY_DATE_FIELD = "설문 날짜"
+PHOTO_FIELD = "본인 사진"
+
+
+def min_col(field):
+    return f"{field}_min"
+
+
+def max_col(field):
+    return f"{field}_max"
+
+
+def set_col(field):
+    return f"{field}_set"
+
+
+SURVEY_TS_COL = f"{SURVEY_DATE_FIELD}_ts"
+PHOTO_IDS_COL = f"{PHOTO_FIELD}_ids"
+
+
+# Google Drive 공유 URL에서 파일 ID 추출
+def extract_drive_file_id(url):
+    if "id=" in url:
+        return url.split("id=")[-1].split("&")[0]
+    elif "/file/d/" in url:
+        return url.split("/file/d/")[-1].split("/")[0]
+    return ""
+
+
+def frame_memory_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _readonly(values):
+    values = np.array(values, copy=True)
+    values.flags.writeable = False
+    return values
+
+
+def _freeze(values):
+    """컬럼 배열을 쓰기 금지 복사본으로 교체 (공유 스냅샷 보호용)"""
+    if isinstance(values, pd.Categorical):
+        return pd.Categorical.from_codes(_readonly(values.codes), dtype=values.dtype)
+    if isinstance(values, pd.arrays.IntegerArray):
+        data = values.to_numpy(dtype=np.int64, na_value=0)
+        return pd.arrays.IntegerArray(_readonly(data), _readonly(values.isna()))
+    return _readonly(values)
+
+
+def _freeze_measured(values):
+    """(쓰기 금지 배열, 메모리 바이트). 쓰기 금지 object 배열은 memory_usage(deep=True)가 실패하므로 고정 전에 측정"""
+    return _freeze(values), int(pd.Series(values, copy=False).memory_usage(index=False, deep=True))
+
+
+def _to_numeric_array(series):
+    numeric = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+    valid = ~np.isnan(numeric)
+    if valid.any() and np.all(numeric[valid] == np.round(numeric[valid])):
+        # 정수 컬럼은 Int64 (화면 표시가 "3.0" 이 되지 않도록)
+        return pd.arrays.IntegerArray(np.where(valid, numeric, 0).astype(np.int64), ~valid)
+    return numeric
+
+
+def _to_category_array(series):
+    stripped = series.astype(str).str.strip()
+    if stripped.nunique() > max(1, len(stripped) * CATEGORY_MAX_RATIO):
+        return stripped.to_numpy(dtype=object)
+    return pd.Categorical(stripped)
+
+
+def parse_ideal_range(ideal_value):
+    """"160~175" 형태의 이상형 범위를 (min, max) 로 변환 (형식이 다르면 ValueError)"""
+    min_val, max_val = sorted(map(int, ideal_value.replace(" ", "").split("~")))
+    return min_val, max_val
+
+
+def _derive_range(series):
+    values = series.astype(str).str.strip()
+    mins = np.zeros(len(values), dtype=np.int64)
+    maxs = np.zeros(len(values), dtype=np.int64)
+    missing = np.ones(len(values), dtype=bool)
+    failures = 0
+    for pos, value in enumerate(values):
+        if not value:
+            continue
+        try:
+            mins[pos], maxs[pos] = parse_ideal_range(value)
+            missing[pos] = False
+        except ValueError:
+            failures += 1
+    return pd.arrays.IntegerArray(mins, missing), pd.arrays.IntegerArray(maxs, missing), failures
+
+
+def _derive_set(series):
+    """쉼표 목록 → frozenset (빈 값이면 None: 조건 없음)"""
+    values = np.empty(len(series), dtype=object)
+    for pos, value in enumerate(series.astype(str)):
+        values[pos] = frozenset(map(str.strip, value.split(","))) if value.strip() else None
+    return values
+
+
+def _derive_received(series):
+    values = np.empty(len(series), dtype=object)
+    for pos, value in enumerate(series):
+        values[pos] = frozenset(map(str.strip, str(value).split(","))) if pd.notna(value) else frozenset()
+    return values
+
+
+def _derive_photo_ids(series):
+    """본인 사진 URL 목록 → 같은 순서의 Drive 파일 ID 튜플 (추출 실패 항목은 "")"""
+    values = np.empty(len(series), dtype=object)
+    failures = 0
+    for pos, value in enumerate(series.astype(str)):
+        ids = []
+        for url in value.split(","):
+            url = url.strip()
+            file_id = extract_drive_file_id(url)
+            if url and url.lower() not in ["n/a", "본인사진"] and not file_id:
+                failures += 1
+            ids.append(file_id)
+        values[pos] = tuple(ids)
+    return values, failures
+
+
+def derive_columns(df):
+    """시트 원본 컬럼에서 파생 컬럼을 만든다. ({컬럼명: 배열}, {원본 컬럼: 파싱 실패 수}) 반환
+
+    이상형 범위 → _min/_max (Int64), 이상형 쉼표 목록 → _set (frozenset),
+    받은 프로필 목록 → _set, 설문 날짜 → _ts (Timestamp), 본인 사진 → _ids (Drive 파일 ID 튜플).
+    시트에 없는 컬럼은 건너뛴다.
+    """
+    derived = {}
+    failures = {}
+    for field in IDEAL_RANGE_FIELDS:
+        if field in df.columns:
+            derived[min_col(field)], derived[max_col(field)], failures[field] = _derive_range(df[field])
+    for field in IDEAL_SET_FIELDS:
+        if field in df.columns:
+            derived[set_col(field)] = _derive_set(df[field])
+    if RECEIVED_FIELD in df.columns:
+        derived[set_col(RECEIVED_FIELD)] = _derive_received(df[RECEIVED_FIELD])
+    if SURVEY_DATE_FIELD in df.columns:
+        raw_dates = df[SURVEY_DATE_FIELD]
+        parsed = pd.to_datetime(raw_dates, errors="coerce")
+        failures[SURVEY_DATE_FIELD] = int((parsed.isna() & (raw_dates.astype(str).str.strip() != "")).sum())
+        derived[SURVEY_TS_COL] = parsed.to_numpy()
+    if PHOTO_FIELD in df.columns:
+        derived[PHOTO_IDS_COL], failures[PHOTO_FIELD] = _derive_photo_ids(df[PHOTO_FIELD])
+    return derived, failures
+
+
+def build_profile_frame(raw_df):
+    """load_sheet("프로필") 결과에 본인 사진 파일 ID 등 파생 컬럼을 붙인다. (프레임, 파싱 실패 수) 반환"""
+    derived, failures = derive_columns(raw_df)
+    frame = raw_df.copy()
+    for col, values in derived.items():
+        frame[col] = values
+    return frame, failures
+
+
+def _convert_member_column(col, series):
+    if col in ID_FIELDS:
+        return series.astype(str).str.strip().to_numpy(dtype=object)
+    if col in NUMERIC_FIELDS:
+        return _to_numeric_array(series)
+    if col in CATEGORY_FIELDS:
+        return _to_category_array(series)
+    return series.to_numpy(dtype=object)
+
+
+def build_member_snapshot(raw_df):
+    """load_sheet("회원") 결과를 한 번만 타입 변환해 읽기 전용 스냅샷으로 만든다.
+
+    숫자 컬럼은 숫자형, 값 종류가 적은 컬럼은 category, 회원 ID는 공백 제거 후 저장하고
+    derive_columns 의 파생 컬럼을 덧붙인 뒤 모든 컬럼 배열을 쓰기 금지로 설정한다.
+    (스냅샷, 통계) 를 반환하며 통계에는 메모리 사용량과 파싱 실패 수가 들어 있다.
+    """
+    arrays = {}
+    memory_after = 0
+    for pos, col in enumerate(raw_df.columns):  # 빈 헤더가 중복될 수 있어 위치 기준으로 처리
+        arrays[pos], size = _freeze_measured(_convert_member_column(col, raw_df.iloc[:, pos]))
+        memory_after += size
+
+    derived, failures = derive_columns(raw_df)
+    for col, values in derived.items():
+        arrays[len(arrays)], size = _freeze_measured(values)
+        memory_after += size
+
+    snapshot = pd.DataFrame(arrays, index=raw_df.index, copy=False)
+    snapshot.columns = list(raw_df.columns) + list(derived)
+    stats = {
+        "rows": len(snapshot),
+        "memory_before": frame_memory_bytes(raw_df),
+        "memory_after": memory_after + int(raw_df.index.memory_usage(deep=True)),
+        "parse_failures": failures,
+    }
+    return snapshot, stats
+
+
+# ---------------------------
+# 행 단위 변경 반영 (sheetSync.SheetDeltaSync 용)
+# ---------------------------
+
+def _column_array(frame, pos):
+    """위치 pos 컬럼의 배열 (category/Int64 는 pandas 배열 그대로, 나머지는 numpy)"""
+    array = frame.iloc[:, pos].array
+    return array if isinstance(array, (pd.Categorical, pd.arrays.IntegerArray)) else array.to_numpy()
+
+
+def _as_float(values):
+    if isinstance(values, pd.arrays.IntegerArray):
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    return np.asarray(values, dtype=float)
+
+
+def _merge_column(old, new, take):
+    """old 뒤에 new 를 이어 붙인 배열에서 take 위치만 순서대로 꺼낸다 (old 의 타입 기준)"""
+    if len(new) == 0:
+        return old.take(take)
+    if isinstance(old, pd.arrays.IntegerArray) and not isinstance(new, pd.arrays.IntegerArray):
+        values = _as_float(new)
+        valid = ~np.isnan(values)
+        if np.all(values[valid] == np.round(values[valid])):  # 바뀐 행이 전부 정수/빈 값이면 Int64 유지
+            new = pd.arrays.IntegerArray(np.where(valid, values, 0).astype(np.int64), ~valid)
+    if isinstance(old, pd.Categorical):
+        return union_categoricals([old, pd.Categorical(np.asarray(new, dtype=object))]).take(take)
+    if isinstance(old, pd.arrays.IntegerArray) and isinstance(new, pd.arrays.IntegerArray):
+        return pd.concat([pd.Series(old), pd.Series(new)], ignore_index=True).array.take(take)
+    if isinstance(old, pd.arrays.IntegerArray) or isinstance(new, pd.arrays.IntegerArray):
+        return np.concatenate([_as_float(old), _as_float(new)])[take]  # 한쪽에 소수가 있으면 float 로 통일
+    return np.concatenate([np.asarray(old), np.asarray(new, dtype=np.asarray(old).dtype)])[take]
+
+
+def merge_frame_rows(frame, new_rows, take, freeze=False):
+    """frame 행 + new_rows 행 중 take 위치만 골라 새 프레임을 만든다 (컬럼 위치 기준, 중복 헤더 허용).
+
+    (새 프레임, 메모리 바이트) 반환. freeze=True 면 컬럼을 쓰기 금지로 고정하면서 메모리를 재고, 아니면 None
+    """
+    arrays = {}
+    memory = 0
+    for pos in range(frame.shape[1]):
+        values = _merge_column(_column_array(frame, pos), _column_array(new_rows, pos), take)
+        if freeze:
+            values, size = _freeze_measured(values)
+            memory += size
+        arrays[pos] = values
+    merged = pd.DataFrame(arrays, copy=False)
+    merged.columns = frame.columns
+    if not freeze:
+        return merged, None
+    return merged, memory + int(merged.index.memory_usage(deep=True))
+
+
+def _subtract_failures(failures, removed):
+    return {field: failures.get(field, 0) - removed.get(field, 0) for field in failures}
+
+
+def _add_failures(failures, added):
+    return {field: failures.get(field, 0) + added.get(field, 0) for field in set(failures) | set(added)}
+
+
+def patch_member_snapshot(snapshot, stats, changed_raw, take, dropped_positions):
+    """바뀐/추가된 행(changed_raw, 시트 원본 문자열)만 타입 변환해 기존 스냅샷에 반영한다.
+
+    take 는 (기존 스냅샷 행 + changed_raw 행) 기준의 새 행 순서, dropped_positions 는 빠지거나 바뀐 기존 행 위치.
+    파싱 실패 수는 빠진 행 몫을 빼고 새 행 몫을 더해 갱신한다.
+    memory_after 는 새 스냅샷 기준으로 다시 재고, 시트 원본 전체가 없어 잴 수 없는 memory_before 는 뺀다.
+    """
+    raw_count = changed_raw.shape[1]
+    arrays = {}
+    for pos, col in enumerate(changed_raw.columns):
+        arrays[pos] = _convert_member_column(col, changed_raw.iloc[:, pos])
+    derived, added_failures = derive_columns(changed_raw)
+    for values in derived.values():
+        arrays[len(arrays)] = values
+    new_rows = pd.DataFrame(arrays, copy=False)
+    new_rows.columns = snapshot.columns
+
+    _, removed_failures = derive_columns(snapshot.iloc[list(dropped_positions), :raw_count])
+    patched, memory_after = merge_frame_rows(snapshot, new_rows, take, freeze=True)
+    patched_stats = dict(stats, rows=len(patched), memory_after=memory_after,
+                         parse_failures=_add_failures(_subtract_failures(stats["parse_failures"], removed_failures),
+                                                      added_failures))
+    patched_stats.pop("memory_before", None)
+    return patched, patched_stats
+
+
+def patch_profile_frame(frame, failures, changed_raw, take, dropped_positions):
+    """build_profile_frame 결과에 바뀐/추가된 행만 반영. (프레임, 파싱 실패 수) 반환"""
+    new_rows, added_failures = build_profile_frame(changed_raw)
+    _, removed_failures = derive_columns(frame.iloc[list(dropped_positions), :changed_raw.shape[1]])
+    patched, _ = merge_frame_rows(frame, new_rows, take)
+    return patched, _add_failures(_subtract_failures(failures, removed_failures), added_failures)
+
+
+# ---------------------------
+# 비트셋 역색인 매칭 엔진
+# ---------------------------
+
+CONDITION_FIELDS = [
+    "이상형(키)", "이상형(나이)", "이상형(사는 곳)", "이상형(학력)", "이상형(흡연)",
+    "이상형(종교)", "이상형(회사 규모)", "이상형(근무 형태)", "이상형(음주)", "이상형(문신)"
+]
+PROFILE_FIELDS = [
+    "본인(키)", "본인(나이)", "본인(거주지-분류)", "본인(학력)", "본인(흡연)",
+    "본인(종교)", "본인(회사 규모)", "본인(근무 형태)", "본인(음주)", "본인(문신)"
+]
+RANGE_FIELDS = PROFILE_FIELDS[:2]
+SET_FIELDS = PROFILE_FIELDS[2:]
+GRADE_FIELDS = ["성별", "등급(외모)", "등급(능력)", "본인(외모)"]
+CHANNEL_MAP = {"프립(F)": "F", "네이버(N)": "N", "프사오(O)": "O", "인스타(A)": "A", "기타(B)": "B", "기타2(C)": "C"}
+CHANNEL_KEY = "주문번호[0]"
+
+
+def resolve_channels(channel):
+    """채널 선택값을 주문번호 첫 글자 목록으로 변환. 필터가 필요 없으면 None"""
+    if not channel or "전체" in channel:
+        return None
+    return [CHANNEL_MAP[ch] for ch in channel if ch in CHANNEL_MAP]
+
+
+VALUE_FIELDS = GRADE_FIELDS + SET_FIELDS + [CHANNEL_KEY]
+
+
+def _value_series(frame, field):
+    """비트셋 역색인에 쓰는 컬럼 값 (채널은 주문번호 첫 글자)"""
+    if field == CHANNEL_KEY:
+        return frame["주문번호"].astype(str).str[0]
+    if field in SET_FIELDS:
+        return frame[field].astype(str).str.strip()
+    return frame[field]
+
+
+def _numeric_values(series):
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _base_mask(frame):
+    """기본 조건: 상태 FLAG >= 4 & 시크릿 매칭권 제외"""
+    flag = _numeric_values(frame["상태 FLAG"])
+    secret = frame["매칭권"].fillna("").astype(str).str.contains("시크릿").to_numpy(dtype=bool)
+    return (flag >= 4) & ~secret
+
+
+class MemberBitsetIndex:
+    """(컬럼, 값) → 회원 행 비트셋(np.packbits) 역색인.
+
+    동등/포함 조건은 비트셋 OR/AND, 키/나이 범위는 정렬 배열 searchsorted 로 처리한다.
+    기존 pandas 필터(auto_match_members, tests/test_match_engine.py 의 기준 함수)와 동일한 후보 집합을 돌려준다.
+    여러 요청자를 한 번에 처리할 때는 match_many 가 (요청자 × 후보) 행렬을 브로드캐스팅으로 계산한다.
+    """
+
+    BATCH_CELLS = 8_000_000  # match_many 한 번에 만드는 (요청자 × 후보) 행렬 최대 크기
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.size = len(frame)
+
+        ids = frame["회원 ID"].astype(str).str.strip().to_numpy(dtype=object)
+        self._ids = ids
+        self._positions_by_id = {}
+        for pos, member_id in enumerate(ids):
+            self._positions_by_id.setdefault(member_id, []).append(pos)
+
+        # 컬럼별 값 코드 (결측값은 -1 → 어떤 값에도 속하지 않음)
+        self._codes = {}
+        self._code_of = {}
+        self._values = {}
+        for field in VALUE_FIELDS:
+            codes, uniques = pd.factorize(_value_series(frame, field))
+            self._codes[field] = codes
+            self._code_of[field] = {value: code for code, value in enumerate(uniques)}
+            self._values[field] = {value: np.packbits(codes == code) for code, value in enumerate(uniques)}
+
+        self._range_values = {field: _numeric_values(frame[field]) for field in RANGE_FIELDS}
+        self._build_pool(_base_mask(frame))
+
+    def _build_pool(self, base_mask):
+        """전체 행 배열(코드/범위 값/기본 조건)에서 풀 기준 구조와 정렬 범위를 만든다 (모두 벡터 연산)"""
+        frame = self.frame
+        self._all = np.packbits(np.ones(self.size, dtype=bool))
+        self._empty = np.zeros_like(self._all)
+
+        # 기본 조건: 상태 FLAG >= 4 & 시크릿 매칭권 제외
+        self._base_mask = base_mask
+        self._base = np.packbits(base_mask)
+        # match_many 는 기본 조건을 통과한 회원(풀)만 열로 사용
+        self._pool = np.flatnonzero(base_mask)
+        self._pool_slot = np.full(self.size, -1)
+        self._pool_slot[self._pool] = np.arange(len(self._pool))
+        self._pool_codes = {field: codes[self._pool] for field, codes in self._codes.items()}
+
+        self._pool_range_values = {}
+        self._ranges = {}
+        for field, values in self._range_values.items():
+            rows = np.flatnonzero(~np.isnan(values))
+            order = np.argsort(values[rows], kind="stable")
+            self._pool_range_values[field] = values[self._pool]
+            self._ranges[field] = (values[rows][order], rows[order])
+
+        # 설문 날짜 필터 (NaT 는 어떤 날짜 조건도 통과하지 못함)
+        survey_ts = frame[SURVEY_TS_COL] if SURVEY_TS_COL in frame.columns else pd.Series(pd.NaT, index=frame.index)
+        self._survey_ts = pd.to_datetime(survey_ts, errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+        # 양방향 점수용: 풀 회원 각자의 이상형 (범위는 min/max 배열, 포함 조건은 필드별로 지연 생성)
+        self._pool_ideal_ranges = {}
+        for field in CONDITION_FIELDS[:2]:
+            if min_col(field) in frame.columns:
+                self._pool_ideal_ranges[field] = tuple(
+                    _numeric_values(frame[col(field)])[self._pool] for col in (min_col, max_col)
+                )
+        self._pool_ideal_sets = {}
+
+    def apply_changes(self, frame, changes):
+        """SheetDeltaSync 변경 내역으로 새 스냅샷용 인덱스를 만든다 (기존 인덱스는 그대로 둠).
+
+        기존 행 위치가 그대로이고 수정/끝에 추가만 있으면 바뀐 행의 비트만 고치고,
+        삭제/중간 삽입/정렬 등으로 위치가 바뀌었으면 전체를 다시 만든다.
+        """
+        if changes["full"] or changes["reordered"]:
+            return MemberBitsetIndex(frame)
+
+        index = copy.copy(self)
+        index.frame = frame
+        index.size = len(frame)
+        grow = index.size - self.size
+        positions = np.asarray(changes["positions"], dtype=np.int64)
+        changed = frame.iloc[positions]
+
+        # 회원 ID → 위치 (바뀐 ID 만 목록 교체)
+        index._ids = np.concatenate([self._ids, np.full(grow, "", dtype=object)])
+        index._positions_by_id = dict(self._positions_by_id)
+        new_ids = changed["회원 ID"].astype(str).str.strip().to_numpy(dtype=object)
+        for pos, member_id in zip(positions, new_ids):
+            if pos < self.size:
+                old_id = self._ids[pos]
+                rest = [p for p in index._positions_by_id.get(old_id, []) if p != pos]
+                if rest:
+                    index._positions_by_id[old_id] = rest
+                else:
+                    index._positions_by_id.pop(old_id, None)
+            index._positions_by_id[member_id] = sorted(index._positions_by_id.get(member_id, []) + [pos])
+            index._ids[pos] = member_id
+
+        # 값 비트셋: 바뀐 행이 속했던/속하게 된 값만 다시 계산 (행이 늘면 전부 길이 확장)
+        index._codes, index._code_of, index._values = {}, {}, {}
+        for field in VALUE_FIELDS:
+            codes = np.concatenate([self._codes[field], np.full(grow, -1, dtype=self._codes[field].dtype)])
+            code_of = dict(self._code_of[field])
+            for pos, value in zip(positions, _value_series(changed, field)):
+                codes[pos] = -1 if pd.isna(value) else code_of.setdefault(value, len(code_of))
+            touched = set(self._codes[field][positions[positions < self.size]]) | set(codes[positions])
+
+            values = dict(self._values[field])
+            for value, code in code_of.items():
+                if not grow and code not in touched:
+                    continue
+                mask = np.zeros(index.size, dtype=bool)
+                if value in self._values[field]:
+                    mask[:self.size] = np.unpackbits(self._values[field][value], count=self.size).astype(bool)
+                mask[positions] = codes[positions] == code
+                values[value] = np.packbits(mask)
+            index._codes[field], index._code_of[field], index._values[field] = codes, code_of, values
+
+        index._range_values = {}
+        for field, values in self._range_values.items():
+            values = np.concatenate([values, np.full(grow, np.nan)])
+            values[positions] = _numeric_values(changed[field])
+            index._range_values[field] = values
+
+        base_mask = np.concatenate([self._base_mask, np.zeros(grow, dtype=bool)])
+        base_mask[positions] = _base_mask(changed)
+        index._build_pool(base_mask)
+        return index
+
+    def _any_of(self, field, values):
+        bitsets = self._values[field]
+        result = self._empty.copy()
+        for value in values:
+            bits = bitsets.get(value)
+            if bits is not None:
+                np.bitwise_or(result, bits, out=result)
+        return result
+
+    def _between(self, field, min_val, max_val):
+        sorted_values, rows = self._ranges[field]
+        lo = np.searchsorted(sorted_values, min_val, side="left")
+        hi = np.searchsorted(sorted_values, max_val, side="right")
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows[lo:hi]] = True
+        return np.packbits(mask)
+
+    def _rows_of(self, member_ids):
+        mask = np.zeros(self.size, dtype=bool)
+        for member_id in member_ids:
+            mask[self._positions_by_id.get(member_id, [])] = True
+        return np.packbits(mask)
+
+    def target_position(self, member_id):
+        positions = self._positions_by_id.get(str(member_id).strip())
+        return positions[0] if positions else None
+
+    def resolve_request(self, match_data):
+        """match_data 를 필터 명세로 변환. 대상 회원이 없으면 None
+
+        {"target": 대상 행, "gender": 대상 성별, "sets": [(컬럼, 허용값)], "ideal_sets": [(컬럼, 허용값)],
+         "ranges": [(컬럼, min, max)], "conditions": 사용 조건 번호, "after_date": 설문 날짜 하한, "sent_ids": 받은 프로필 ID}
+        """
+        target_pos = self.target_position(match_data["memberId"])
+        if target_pos is None:
+            return None
+        target = self.frame.iloc[target_pos]
+        spec = {"target": target_pos, "gender": target["성별"], "sets": [], "ideal_sets": [], "ranges": []}
+
+        channels = resolve_channels(match_data.get("channel"))
+        if channels is not None:
+            spec["sets"].append((CHANNEL_KEY, channels))
+        if match_data.get("faces"):
+            spec["sets"].append(("등급(외모)", match_data["faces"]))
+        if match_data.get("abilitys"):
+            spec["sets"].append(("등급(능력)", match_data["abilitys"]))
+        if match_data.get("faceShape") and match_data["faceShape"] != ["전체"]:
+            spec["sets"].append(("본인(외모)", match_data["faceShape"]))
+
+        # 이상형 조건은 스냅샷 파생 컬럼 사용 (빈 값/파싱 실패는 조건 없음)
+        conds = match_data.get("conditions", [False] * 10)
+        spec["conditions"] = [i for i, use in enumerate(conds) if use]
+        for i in spec["conditions"]:
+            field = CONDITION_FIELDS[i]
+            if i in [0, 1]:
+                min_val = target.get(min_col(field))
+                if pd.notna(min_val):
+                    spec["ranges"].append((PROFILE_FIELDS[i], int(min_val), int(target[max_col(field)])))
+            elif target.get(set_col(field)) is not None:
+                spec["ideal_sets"].append((PROFILE_FIELDS[i], target[set_col(field)]))
+
+        after_date = match_data.get("afterDate")
+        spec["after_date"] = pd.to_datetime(after_date).to_datetime64() if after_date else None
+        spec["sent_ids"] = target.get(set_col(RECEIVED_FIELD), frozenset())
+        return spec
+
+    def candidate_bits(self, match_data):
+        """조건에 맞는 후보 비트셋. 대상 회원이 없으면 None"""
+        spec = self.resolve_request(match_data)
+        if spec is None:
+            return None
+
+        same_gender = self._any_of("성별", [spec["gender"]])
+        bits = self._base & (self._all & ~same_gender)
+        for field, values in spec["sets"] + spec["ideal_sets"]:
+            bits &= self._any_of(field, values)
+        for field, min_val, max_val in spec["ranges"]:
+            bits &= self._between(field, min_val, max_val)
+        if spec["after_date"] is not None:
+            bits &= np.packbits(self._survey_ts >= spec["after_date"])
+        bits &= self._all & ~self._rows_of(spec["sent_ids"])
+        return bits
+
+    def candidate_positions(self, match_data):
+        bits = self.candidate_bits(match_data)
+        if bits is None:
+            return None
+        return np.flatnonzero(np.unpackbits(bits, count=self.size))
+
+    def match(self, match_data):
+        """기존 auto_match_members 와 같은 후보 DataFrame. 대상 회원이 없으면 None"""
+        positions = self.candidate_positions(match_data)
+        if positions is None:
+            return None
+        return self.frame.iloc[positions]
+
+    def _allowed_codes(self, field, specs, rows):
+        """요청자별 허용 코드표 (요청자 × (코드 수 + 1)). 마지막 칸은 결측값(-1) 용이며 필터가 있으면 False"""
+        code_of = self._code_of[field]
+        allowed = np.zeros((len(rows), len(code_of) + 1), dtype=bool)
+        for r, spec in zip(rows, specs):
+            values = [v for f, v in spec["sets"] + spec["ideal_sets"] if f == field]
+            if not values:
+                allowed[r, :] = True  # 필터 없음 → 결측값 포함 전원 통과
+                continue
+            codes = [code_of[v] for v in values[0] if v in code_of]
+            allowed[r, codes] = True
+        return allowed
+
+    def eligibility_matrix(self, specs):
+        """필터 명세 목록 → (요청자 × 풀 회원) bool 행렬. 한 번의 브로드캐스팅 패스로 계산"""
+        rows = np.arange(len(specs))
+        eligible = np.ones((len(specs), len(self._pool)), dtype=bool)
+
+        # 성별: 대상과 다른 성별만 (대상 성별이 결측이면 전원 통과)
+        gender_codes = self._pool_codes["성별"]
+        target_gender = np.array([self._code_of["성별"].get(spec["gender"], -2) for spec in specs])
+        eligible &= gender_codes[None, :] != target_gender[:, None]
+
+        set_fields = {field for spec in specs for field, _ in spec["sets"] + spec["ideal_sets"]}
+        for field in set_fields:
+            allowed = self._allowed_codes(field, specs, rows)
+            eligible &= allowed[:, self._pool_codes[field]]  # 코드 -1 은 마지막 칸
+
+        range_fields = {field for spec in specs for field, _, _ in spec["ranges"]}
+        for field in range_fields:
+            lo = np.full(len(specs), -np.inf)
+            hi = np.full(len(specs), np.inf)
+            active = np.zeros(len(specs), dtype=bool)
+            for r, spec in enumerate(specs):
+                for f, min_val, max_val in spec["ranges"]:
+                    if f == field:
+                        lo[r], hi[r], active[r] = min_val, max_val, True
+            values = self._pool_range_values[field][None, :]
+            eligible &= ((values >= lo[:, None]) & (values <= hi[:, None])) | ~active[:, None]
+
+        after = np.array([np.datetime64("NaT") if spec["after_date"] is None else spec["after_date"] for spec in specs],
+                         dtype="datetime64[ns]")
+        if not np.isnat(after).all():
+            pool_ts = self._survey_ts[self._pool]
+            eligible &= (pool_ts[None, :] >= after[:, None]) | np.isnat(after)[:, None]
+
+        for r, spec in enumerate(specs):
+            for member_id in spec["sent_ids"]:
+                slots = self._pool_slot[self._positions_by_id.get(member_id, [])]
+                eligible[r, slots[slots >= 0]] = False
+        return eligible
+
+    def match_many(self, match_requests):
+        """여러 요청자의 후보 DataFrame 목록 (match 를 요청자마다 호출한 것과 동일). 대상이 없으면 None"""
+        specs = [self.resolve_request(match_data) for match_data in match_requests]
+        valid = [i for i, spec in enumerate(specs) if spec is not None]
+        results = [None] * len(specs)
+
+        chunk = max(1, self.BATCH_CELLS // max(1, len(self._pool)))
+        for start in range(0, len(valid), chunk):
+            batch = valid[start:start + chunk]
+            eligible = self.eligibility_matrix([specs[i] for i in batch])
+            for i, row in zip(batch, eligible):
+                results[i] = self.frame.iloc[self._pool[row]]
+        return results
+
+    def _ideal_set_index(self, field):
+        """풀 회원의 이상형 포함 조건 → (조건 없음 마스크, 값 → 해당 값을 허용하는 풀 슬롯)"""
+        if field not in self._pool_ideal_sets:
+            ideal_sets = self.frame[set_col(field)].to_numpy(dtype=object)[self._pool]
+            no_filter = np.array([ideals is None for ideals in ideal_sets], dtype=bool)
+            slots_by_value = {}
+            for slot, ideals in enumerate(ideal_sets):
+                for value in ideals or ():
+                    slots_by_value.setdefault(value, []).append(slot)
+            self._pool_ideal_sets[field] = (no_filter, {v: np.array(s) for v, s in slots_by_value.items()})
+        return self._pool_ideal_sets[field]
+
+    def _reverse_accepts(self, i, target, slots):
+        """역방향: 후보(풀 슬롯) 각자의 이상형 i 가 요청자 본인 값을 허용하는지.
+        정방향과 같은 규칙으로 이상형이 비어 있는 후보는 점수 없음 (요청자 본인 값이 비어 있어도 점수 없음)"""
+        field = CONDITION_FIELDS[i]
+        if i in [0, 1]:
+            if field not in self._pool_ideal_ranges:
+                return np.zeros(len(slots), dtype=bool)
+            mins, maxs = self._pool_ideal_ranges[field]
+            mins, maxs = mins[slots], maxs[slots]
+            value = pd.to_numeric(target.get(PROFILE_FIELDS[i]), errors="coerce")
+            if pd.isna(value):
+                return np.zeros(len(slots), dtype=bool)
+            return (mins <= value) & (value <= maxs)  # 이상형이 비어 있으면 NaN → False
+
+        if set_col(field) not in self.frame.columns:
+            return np.zeros(len(slots), dtype=bool)
+        _, slots_by_value = self._ideal_set_index(field)
+        accepts = np.zeros(len(self._pool), dtype=bool)
+        accepts[slots_by_value.get(str(target.get(PROFILE_FIELDS[i], "")).strip(), [])] = True
+        return accepts[slots]
+
+    def reciprocal_scores(self, spec):
+        """양방향 점수 (후보 풀 슬롯, 점수).
+
+        이상형 조건은 거르지 않고 (조건 수 × 2) × 후보 bool 행렬로 계산해 합산한다.
+        정방향 = 요청자의 이상형을 후보가 만족, 역방향 = 후보의 이상형을 요청자가 만족.
+        두 방향 모두 이상형 값이 있는 쪽만 점수를 준다 (비어 있는 이상형은 어느 쪽이든 0점).
+        성별/채널/등급/얼굴형/날짜/받은 프로필 조건은 기존처럼 먼저 거른다.
+        """
+        hard = dict(spec, ideal_sets=[], ranges=[])
+        slots = np.flatnonzero(self.eligibility_matrix([hard])[0])
+        target = self.frame.iloc[spec["target"]]
+
+        rows = []
+        for field, values in spec["ideal_sets"]:
+            allowed = self._allowed_codes(field, [spec], [0])[0]
+            rows.append(allowed[self._pool_codes[field][slots]])
+        for field, min_val, max_val in spec["ranges"]:
+            values = self._pool_range_values[field][slots]
+            rows.append((values >= min_val) & (values <= max_val))
+        for i in spec["conditions"]:
+            rows.append(self._reverse_accepts(i, target, slots))
+
+        if not rows:
+            return slots, np.zeros(len(slots), dtype=int)
+        return slots, np.vstack(rows).sum(axis=0)
+
+    def reciprocal_rank(self, match_data, k=20):
+        """양방향 점수 상위 k명 DataFrame ("호환 점수" 컬럼 추가, 점수 내림차순). 대상 회원이 없으면 None
+
+        전체 정렬 대신 np.argpartition 으로 상위 k명만 고른 뒤 그 안에서만 정렬한다 (상위 k명 안의 동점은 시트 순서).
+        """
+        spec = self.resolve_request(match_data)
+        if spec is None:
+            return None
+        slots, scores = self.reciprocal_scores(spec)
+        k = min(k, len(slots))
+        if k == 0:
+            return self.frame.iloc[[]].assign(**{"호환 점수": np.array([], dtype=int)})
+
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(slots) else np.arange(len(slots))
+        top = top[np.lexsort((top, -scores[top]))]
+        return self.frame.iloc[self._pool[slots[top]]].assign(**{"호환 점수": scores[top]})
+
+
+# ---------------------------
+# 가중 층화 추출 (최종 4명 선택)
+# ---------------------------
+
+FACE_GRADE_ORDER = ["상", "중상", "중", "중하", "하"]
+TOP_PICKS = 4
+
+# 요청자 외모 등급 → [(뽑을 등급 묶음, 인원)]. 묶음이 None 이면 등급 무관
+FACE_GRADE_QUOTAS = {
+    "상": [(["상"], 2), (["중상", "중"], 2)],
+    "중상": [(["상"], 1), (["중상", "중"], 3)],
+    "중": [(["상"], 1), (["중상", "중"], 3)],
+    "중하": [(["중상"], 1), (["중", "중하"], 2), (["하"], 1)],
+    "하": [(["중"], 1), (["중하"], 1), (["하"], 2)],
+}
+UNSTRATIFIED_QUOTA = [(None, TOP_PICKS)]
+
+
+def face_grade_quotas(my_face_grade):
+    """요청자 외모 등급별 등급 묶음 할당. 모르는 등급(빈 값 포함)이면 빈 할당 → 추출 없음 (기존 동작)"""
+    return FACE_GRADE_QUOTAS.get(str(my_face_grade).strip(), [])
+
+
+def request_seed(*parts):
+    """요청 단위 시드 (회원 ID 등 요청 정보가 같으면 같은 시드, 요청자마다 다른 시드)"""
+    return zlib.crc32("|".join(map(str, parts)).encode("utf-8"))
+
+
+def _grade_distance(grades, bucket):
+    """후보 등급과 묶음 등급 사이의 최소 거리 (FACE_GRADE_ORDER 기준, 모르는 등급은 가장 멂)"""
+    rank = {grade: i for i, grade in enumerate(FACE_GRADE_ORDER)}
+    far = len(FACE_GRADE_ORDER)
+    positions = np.array([rank.get(g, far * 2) for g in grades])
+    bucket_positions = np.array([rank[g] for g in bucket if g in rank] or [far * 2])
+    return np.abs(positions[:, None] - bucket_positions[None, :]).min(axis=1)
+
+
+def stratified_sample_ids(df, quotas=UNSTRATIFIED_QUOTA, seed=None,
+                          grade_col="등급(외모)", weight_col="보내진 횟수"):
+    """등급 묶음별 할당 인원만큼 비복원 가중 추출한 회원 ID 목록.
+
+    가중치는 1 / (보내진 횟수 + 1). 후보마다 Efraimidis–Spirakis 키 log(u) / w 를 한 번에 만들고
+    묶음 안에서 키가 큰 순으로 뽑는다. 묶음 인원이 모자라면 가까운 등급부터 (같은 거리면 키 순) 채운다.
+    seed 가 같으면 결과도 같다 (None 이면 매번 다름).
+    """
+    if df is None or df.empty:
+        return []
+    ids = df["회원 ID"].astype(str).to_numpy(dtype=object)
+    grades = df[grade_col].astype(str).str.strip().to_numpy(dtype=object)
+    sent = pd.to_numeric(df[weight_col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    weights = 1 / (np.clip(np.nan_to_num(sent), 0, None) + 1)
+
+    rng = np.random.default_rng(seed)
+    keys = np.log(1 - rng.random(len(ids))) / weights  # 1 - u ∈ (0, 1] → log 가 -inf 가 되지 않음
+
+    taken = np.zeros(len(ids), dtype=bool)
+    picked = []
+    shortfalls = []
+    for bucket, quota in quotas:
+        in_bucket = np.ones(len(ids), dtype=bool) if bucket is None else np.isin(grades, bucket)
+        rows = np.flatnonzero(in_bucket & ~taken)
+        chosen = rows[np.argsort(-keys[rows], kind="stable")[:quota]]
+        taken[chosen] = True
+        picked.extend(chosen)
+        if len(chosen) < quota:
+            shortfalls.append((bucket, quota - len(chosen)))
+
+    # 모자란 인원은 이웃 등급에서 결정적으로 보충
+    for bucket, missing in shortfalls:
+        rows = np.flatnonzero(~taken)
+        if len(rows) == 0:
+            break
+        distance = np.zeros(len(rows)) if bucket is None else _grade_distance(grades[rows], bucket)
+        chosen = rows[np.lexsort((-keys[rows], distance))[:missing]]
+        taken[chosen] = True
+        picked.extend(chosen)
+
+    return ids[picked].tolist()
@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+DEFAULT_WORKERS = 6  # 동시에 받는 사진 수
+DEFAULT_TIMEOUT = 10.0  # 사진 한 장당 최대 대기 시간(초, 요청 시점부터)
+MAX_TRACKED = 256  # 결과를 찾아가지 않은 작업이 이보다 많으면 끝난 것부터 정리
+
+
+class PhotoPrefetcher:
+    """사진 병렬 미리 받기 (공용 스레드 풀).
+
+    prefetch 로 필요한 사진을 한꺼번에 요청해 두고, 화면을 그릴 때 result 로 완료된 결과를 꺼낸다.
+    다운로드/디코딩/인코딩은 모두 작업 스레드에서 하고, 제한 시간을 넘긴 사진은 TimeoutError 로 건너뛴다.
+    시간 초과된 작업은 목록에서 빼므로 다음 요청 때 새 제한 시간으로 다시 받는다 (끝난 다운로드는 디스크 캐시에 있음).
+    """
+
+    def __init__(self, fetch, max_workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT):
+        self._fetch = fetch
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="photo-prefetch")
+        self._lock = threading.Lock()
+        self._futures = {}  # key → (future, 요청 시각)
+        self.stats = {"submitted": 0, "reused": 0, "completed": 0, "timeouts": 0, "failures": 0}
+
+    def _submit(self, key):
+        entry = self._futures.get(key)
+        if entry is not None and not (entry[0].done() and entry[0].exception() is not None):
+            self.stats["reused"] += 1
+            return entry
+        entry = (self._executor.submit(self._fetch, *key), time.monotonic())
+        self._futures[key] = entry
+        self.stats["submitted"] += 1
+        return entry
+
+    def _trim(self):
+        if len(self._futures) <= MAX_TRACKED:
+            return
+        for key in [key for key, (future, _) in self._futures.items() if future.done()]:
+            del self._futures[key]
+
+    def prefetch(self, keys):
+        """keys: fetch 인자 튜플 목록. 이미 진행 중인 작업은 다시 요청하지 않음"""
+        with self._lock:
+            for key in keys:
+                self._submit(tuple(key))
+            self._trim()
+
+    def result(self, key):
+        """완료된 결과. 요청 후 timeout 초가 지나도 안 끝나면 TimeoutError, 실패하면 원래 예외"""
+        key = tuple(key)
+        with self._lock:
+            future, submitted_at = self._submit(key)
+        try:
+            value = future.result(timeout=max(0.0, submitted_at + self.timeout - time.monotonic()))
+        except FutureTimeoutError:
+            with self._lock:
+                self.stats["timeouts"] += 1
+                if self._futures.get(key, (None,))[0] is future:
+                    del self._futures[key]
+            future.cancel()  # 아직 대기 중이면 취소, 실행 중이면 끝까지 받아 캐시에 저장
+            raise TimeoutError(f"사진 로딩 시간 초과 ({self.timeout:.0f}초)")
+        except Exception:
+            with self._lock:
+                self.stats["failures"] += 1
+                self._futures.pop(key, None)
+            raise
+        with self._lock:
+            self.stats["completed"] += 1
+            if self._futures.get(key, (None,))[0] is future:
+                del self._futures[key]  # 결과는 디스크 캐시에 있으므로 메모리에서는 바로 해제
+        return value
+
+    def shutdown(self):
+        """새 작업은 받지 않고, 이미 요청된 다운로드는 끝까지 받은 뒤 스레드 종료 (기다리지 않음)"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+DEFAULT_RENDER_WORKERS = max(1, min(4, (os.cpu_count() or 1)))  # PDF 렌더링 (CPU)
+DEFAULT_IO_WORKERS = 4  # 사진 다운로드 / Drive 업로드 (네트워크)
+
+
+def make_render_pool(max_workers=DEFAULT_RENDER_WORKERS):
+    # Streamlit 서버는 스레드가 많아 fork 대신 spawn 사용 (작업 프로세스는 makeProfileCard 만 import)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def timed_call(fn, *args):
+    """(결과, 소요 초). 프로세스 풀에도 넘길 수 있도록 모듈 최상위 함수"""
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+def fetch_card_photos(pool, download, photo_ids):
+    """사진 파일 ID 와 같은 순서의 [(바이트, None) 또는 (None, 예외)] (pool 에서 동시 다운로드).
+
+    download(파일 ID) → 바이트 는 pool 의 작업 스레드에서 실행되므로 필요한 객체는 호출한 쪽에서 묶어 넘긴다.
+    빈 파일 ID (링크에서 ID 추출 실패) 는 받지 않고 바로 실패로 기록한다.
+    """
+    futures = [pool.submit(download, file_id) if file_id else None for file_id in photo_ids]
+    results = []
+    for future in futures:
+        try:
+            if future is None:
+                raise ValueError("사진 링크에서 파일 ID를 찾지 못했습니다.")
+            results.append((future.result(), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+class ProfileCardBatch:
+    """여러 회원 프로필카드를 준비 → 렌더링 → 업로드 3단계로 겹쳐서 처리.
+
+    prepare(회원 ID) → render 인자 (스레드 풀: 사진 다운로드 등)
+    render(*인자) → PDF 경로 (프로세스 풀: 모듈 최상위 함수여야 함)
+    upload(회원 ID, PDF 경로) → Drive 파일 ID (스레드 풀)
+    on_progress(회원 ID, 단계, 결과) 는 run 을 호출한 스레드에서 불리므로 Streamlit 화면 갱신에 써도 된다.
+    한 회원의 실패는 그 회원 결과에만 기록되고 나머지는 계속 진행한다.
+    """
+
+    def __init__(self, prepare, render, upload, render_pool, io_workers=DEFAULT_IO_WORKERS):
+        self._prepare = prepare
+        self._render = render
+        self._upload = upload
+        self._render_pool = render_pool
+        self.io_workers = io_workers
+
+    def run(self, member_ids, on_progress=None):
+        """회원 ID → {"file_id": ...} 또는 {"error": ..., "stage": ...}
+        (각각 전체 "seconds" 와 단계별 실행 시간 "timings" 포함)"""
+        results = {}
+        started = {member_id: time.perf_counter() for member_id in member_ids}
+        timings = {member_id: {} for member_id in member_ids}
+
+        def finish(member_id, step, **result):
+            result["seconds"] = round(time.perf_counter() - started[member_id], 2)
+            result["timings"] = timings[member_id]
+            results[member_id] = result
+            if on_progress:
+                on_progress(member_id, step, result)
+
+        with ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="profile-card") as io_pool:
+            pending = {io_pool.submit(timed_call, self._prepare, member_id): (member_id, "prepare")
+                       for member_id in member_ids}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    member_id, stage = pending.pop(future)
+                    try:
+                        value, seconds = future.result()
+                    except Exception as e:
+                        finish(member_id, stage, error=str(e), stage=stage)
+                        continue
+                    timings[member_id][stage] = round(seconds, 3)
+                    if stage == "prepare":
+                        pending[self._render_pool.submit(timed_call, self._render, *value)] = (member_id, "render")
+                    elif stage == "render":
+                        pending[io_pool.submit(timed_call, self._upload, member_id, value)] = (member_id, "upload")
+                    else:
+                        finish(member_id, "done", file_id=value)
+                        continue
+                    if on_progress:
+                        on_progress(member_id, stage, None)
+        return results
@@ -0,0 +1,112 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import google.auth.transport.requests
+import gspread
+from google.oauth2 import service_account
+
+SHEET_SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+
+class SheetClientPool:
+    """서비스 계정 인증 정보와 Spreadsheet/Worksheet 핸들을 한 번만 만들고 재사용한다.
+
+    프로세스 전체(모든 세션/스레드)가 하나를 같이 쓰고, 핸들 생성과 토큰 갱신은 잠금 안에서 한 번만 일어난다.
+    """
+
+    TOKEN_REFRESH_MARGIN = timedelta(minutes=5)  # 만료 5분 전에 미리 토큰 갱신
+
+    def __init__(self, creds):
+        self._lock = threading.RLock()
+        self._creds = creds
+        self._client = None
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._thread = threading.local()  # 스레드별 API 요청 집계 (start_call_count)
+        self.stats = {
+            "authorize": 0,
+            "token_refresh": 0,
+            "spreadsheet_hit": 0,
+            "spreadsheet_miss": 0,
+            "worksheet_hit": 0,
+            "worksheet_miss": 0,
+        }
+
+    @classmethod
+    def from_service_account_info(cls, key_dict):
+        return cls(service_account.Credentials.from_service_account_info(dict(key_dict), scopes=SHEET_SCOPE))
+
+    def _refresh_token_if_needed(self):
+        expiry = self._creds.expiry  # google-auth는 naive UTC 사용
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if self._creds.token and expiry and expiry - now > self.TOKEN_REFRESH_MARGIN:
+            return
+        self._creds.refresh(google.auth.transport.requests.Request())
+        self.stats["token_refresh"] += 1
+        self.record("token_refresh")
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = gspread.authorize(self._creds)
+                self.stats["authorize"] += 1
+            self._refresh_token_if_needed()
+            return self._client
+
+    def spreadsheet(self, url):
+        with self._lock:
+            client = self.client()
+            if url in self._spreadsheets:
+                self.stats["spreadsheet_hit"] += 1
+            else:
+                self._spreadsheets[url] = client.open_by_url(url)
+                self.stats["spreadsheet_miss"] += 1
+                self.record("open_by_url")
+            return self._spreadsheets[url]
+
+    def worksheet(self, url, title):
+        with self._lock:
+            key = (url, title)
+            if key in self._worksheets:
+                self.client()  # 토큰 만료 임박 시 선제 갱신
+                self.stats["worksheet_hit"] += 1
+            else:
+                self._worksheets[key] = self.spreadsheet(url).worksheet(title)
+                self.stats["worksheet_miss"] += 1
+                self.record("worksheet")
+            return self._worksheets[key]
+
+    def start_call_count(self):
+        """지금부터 현재 스레드가 보내는 시트 API 요청을 {요청: 횟수} 로 집계해서 돌려준다 (stop_call_count 로 끝냄).
+
+        풀 안의 요청(토큰 갱신, 문서/시트 열기)은 자동으로, 핸들로 직접 보낸 요청은 record 로 더한다.
+        """
+        self._thread.calls = {}
+        return self._thread.calls
+
+    def stop_call_count(self):
+        self._thread.calls = None
+
+    def record(self, name):
+        """핸들로 직접 보낸 요청(get_all_values, batch_get ...)을 현재 스레드 집계에 더함 (집계 중이 아니면 무시)"""
+        calls = getattr(self._thread, "calls", None)
+        if calls is not None:
+            calls[name] = calls.get(name, 0) + 1
+
+    def invalidate(self, url=None):
+        """시트 구조가 바뀌었을 때 캐시된 핸들 제거 (url 미지정 시 전체)"""
+        with self._lock:
+            if url is None:
+                self._spreadsheets.clear()
+                self._worksheets.clear()
+                return
+            self._spreadsheets.pop(url, None)
+            for key in [k for k in self._worksheets if k[0] == url]:
+                self._worksheets.pop(key, None)
+
+    def stats_snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["worksheet_hit"] + stats["worksheet_miss"]
+        stats["worksheet_reuse_ratio"] = round(stats["worksheet_hit"] / lookups, 3) if lookups else 0.0
+        return stats
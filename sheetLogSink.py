@@ -0,0 +1,113 @@
+import atexit
+import queue
+import threading
+import time
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 2.0  # 첫 행이 들어온 뒤 이 시간(초)이 지나면 모인 만큼 전송
+MAX_PENDING_ROWS = 5000  # 전송 실패로 쌓아 둘 최대 행 수 (넘치면 오래된 행부터 버림)
+
+
+class SheetLogSink:
+    """write_log 행을 큐에 모아 두었다가 백그라운드 스레드에서 append_rows로 한 번에 보낸다.
+
+    open_worksheet() → 로그 워크시트 핸들 (전송 스레드에서 호출되므로 Streamlit 캐시 함수를 부르면 안 됨).
+    전송에 실패한 행은 버리지 않고 남겨 두었다가 flush_interval 뒤에 다음 행과 함께 다시 보낸다.
+    """
+
+    def __init__(self, open_worksheet, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_pending=MAX_PENDING_ROWS):
+        self._open_worksheet = open_worksheet
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._queue = queue.Queue()
+        self._stop = object()
+        self._lock = threading.Lock()  # stats / 종료 상태 (호출 스레드와 전송 스레드가 함께 씀)
+        self._closed = False
+        self.stats = {"queued": 0, "sent_rows": 0, "append_calls": 0, "failures": 0, "direct_sends": 0,
+                      "pending_rows": 0, "dropped_rows": 0}
+        self._thread = threading.Thread(target=self._run, name="sheet-log-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, row):
+        with self._lock:
+            self.stats["queued"] += 1
+            if not self._closed:
+                self._queue.put(row)
+                return
+            self.stats["direct_sends"] += 1
+        # 닫힌 기록기(새로고침으로 교체됨)를 잡고 있던 호출 → 버리지 않고 바로 전송
+        self._send([row])
+
+    def stats_snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def flush(self, timeout=10.0):
+        """지금까지 쌓인 행을 즉시 전송하고 완료될 때까지 대기"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        if not self._thread.is_alive():
+            return
+        self.flush(timeout)
+        with self._lock:
+            self._closed = True
+            self._queue.put(self._stop)  # 이전에 들어온 행은 모두 _stop 앞에 있으므로 전송됨
+        self._thread.join(timeout)
+
+    def _run(self):
+        buffer = []
+        deadline = None
+        retrying = False  # 직전 전송 실패 → 행 수가 차도 deadline 까지는 다시 보내지 않음
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            if item is self._stop:
+                self._send(buffer)
+                return
+            if isinstance(item, threading.Event):
+                buffer = self._send(buffer)
+                retrying = bool(buffer)
+                deadline = time.monotonic() + self._flush_interval if buffer else None
+                item.set()
+                continue
+            if item is not None:
+                buffer.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self._flush_interval
+
+            full = len(buffer) >= self._batch_size and not retrying
+            if full or (buffer and time.monotonic() >= deadline):
+                buffer = self._send(buffer)
+                retrying = bool(buffer)
+                deadline = time.monotonic() + self._flush_interval if buffer else None
+
+    def _send(self, rows):
+        """보내지 못하고 남은 행 목록 (성공하면 [])"""
+        if not rows:
+            return []
+        try:
+            # 로그 시트 내용은 읽지 않고 핸들만 사용
+            self._open_worksheet().append_rows(rows)
+            with self._lock:
+                self.stats["append_calls"] += 1
+                self.stats["sent_rows"] += len(rows)
+                self.stats["pending_rows"] = 0
+            return []
+        except Exception as e:
+            kept = rows[-self._max_pending:]
+            with self._lock:
+                self.stats["failures"] += 1
+                self.stats["dropped_rows"] += len(rows) - len(kept)
+                self.stats["pending_rows"] = len(kept)
+            print(f"[로그 기록 실패] {len(rows)}건 (다음 전송 때 다시 시도): {e}")
+            return kept
@@ -0,0 +1,136 @@
+import threading
+
+from gspread.utils import rowcol_to_a1
+
+
+def trim_row(row):
+    """시트 API 는 끝쪽 빈 칸을 잘라서 돌려주므로 비교 전에 같은 모양으로 맞춤"""
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+class SheetRowIndex:
+    """키(회원 ID) → 시트 행 번호, 헤더 → 열 번호 색인. 한 칸 쓰기에 전체 시트 조회가 필요 없게 한다.
+
+    load(live) → (헤더, 행) 으로 만든다. live=False 는 저장본/캐시 값이어도 되고, live=True 는 실제 시트 조회.
+    쓰기 전에는 헤더 행 + 해당 행의 키 칸 + 대상 칸만 batch_get 1번으로 읽어 확인하고,
+    헤더가 바뀌었거나 키 칸이 다르면(중간 삽입/삭제/정렬) 실제 시트로 다시 만든 뒤 한 번 더 시도한다.
+    """
+
+    def __init__(self, load, key_field="회원 ID", header_row=2):
+        self._load = load
+        self.key_field = key_field
+        self.header_row = header_row
+        self._lock = threading.Lock()
+        self.header = None
+        self._rows = {}  # 키 → 시트 행 번호 (같은 키가 여러 번이면 첫 행)
+        self._cols = {}  # 헤더 → 시트 열 번호
+        self.stats = {"builds": 0, "live_builds": 0, "writes": 0, "validations": 0, "invalidations": 0, "missing": 0}
+
+    def _build(self, live):
+        header, rows = self._load(live)
+        self.header = list(header)
+        self._cols = {}
+        for col, name in enumerate(self.header, start=1):
+            self._cols.setdefault(name, col)
+        key_pos = self._cols.get(self.key_field)
+        self._rows = {}
+        if key_pos is not None:
+            for offset, row in enumerate(rows):
+                key = str(row[key_pos - 1]).strip() if key_pos - 1 < len(row) else ""
+                if key:
+                    self._rows.setdefault(key, self.header_row + 1 + offset)
+        self.stats["live_builds" if live else "builds"] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self.header = None
+            self.stats["invalidations"] += 1
+
+    def locate(self, key, field, default_col=None):
+        """(행 번호, 열 번호, 키 열 번호). 색인에 없으면 None (검증 없이 색인 값만 사용)"""
+        with self._lock:
+            if self.header is None:
+                self._build(live=False)
+            return self._locate(str(key).strip(), field, default_col)
+
+    def _locate(self, key, field, default_col):
+        row = self._rows.get(key)
+        col = self._cols.get(field, default_col)
+        key_col = self._cols.get(self.key_field)
+        if row is None or col is None or key_col is None:
+            return None
+        return row, col, key_col
+
+    def _validate(self, worksheet, key, row, col, key_col):
+        """헤더/키 칸이 색인과 같으면 대상 칸의 현재 값, 다르면 None"""
+        header_range = f"{self.header_row}:{self.header_row}"
+        header, key_cell, target = worksheet.batch_get(
+            [header_range, rowcol_to_a1(row, key_col), rowcol_to_a1(row, col)])
+        self.stats["validations"] += 1
+        current_header = header[0] if header else []
+        current_key = key_cell[0][0] if key_cell and key_cell[0] else ""
+        if trim_row(current_header) != trim_row(self.header) or str(current_key).strip() != key:
+            return None
+        return target[0][0] if target and target[0] else ""
+
+    def update_cell(self, worksheet, key, field, value, default_col=None):
+        """key 행의 field 칸에 쓰기. value 가 함수면 현재 칸 값을 받아 새 값을 만든다.
+
+        쓰기에 성공하면 True, 키/열을 실제 시트에서도 찾지 못하면 False
+        """
+        key = str(key).strip()
+        with self._lock:
+            if self.header is None:
+                self._build(live=False)
+            for attempt in range(2):
+                location = self._locate(key, field, default_col)
+                if location is not None:
+                    row, col, key_col = location
+                    current = self._validate(worksheet, key, row, col, key_col)
+                    if current is not None:
+                        worksheet.update_cell(row, col, value(current) if callable(value) else value)
+                        self.stats["writes"] += 1
+                        return True
+                    print(f"🔄 시트 행 색인 불일치 → 다시 생성 ({key})")
+                    self.stats["invalidations"] += 1
+                if attempt == 0:
+                    self._build(live=True)  # 새로 추가된 행/바뀐 헤더 반영
+            self.stats["missing"] += 1
+            return False
+
+    def update_cells(self, worksheet, values, field, default_col=None):
+        """{키: 값} 을 field 열에 batch_update 1번으로 쓰기. 쓰지 못한(시트에 없는) 키 목록 반환"""
+        values = {str(key).strip(): value for key, value in values.items()}
+        with self._lock:
+            if self.header is None:
+                self._build(live=False)
+            for attempt in range(2):
+                located = {key: self._locate(key, field, default_col) for key in values}
+                found = {key: location for key, location in located.items() if location is not None}
+                header_range = f"{self.header_row}:{self.header_row}"
+                checks = worksheet.batch_get([header_range] + [rowcol_to_a1(row, key_col)
+                                                               for row, _, key_col in found.values()])
+                self.stats["validations"] += 1
+                header_ok = trim_row(checks[0][0] if checks[0] else []) == trim_row(self.header)
+                keys_ok = all((cell[0][0] if cell and cell[0] else "").strip() == key
+                              for key, cell in zip(found, checks[1:]))
+                if header_ok and keys_ok and (len(found) == len(values) or attempt == 1):
+                    if found:
+                        # update_cell 과 같은 USER_ENTERED (batch_update 기본값은 RAW)
+                        worksheet.batch_update([{"range": rowcol_to_a1(row, col), "values": [[values[key]]]}
+                                                for key, (row, col, _) in found.items()],
+                                               value_input_option="USER_ENTERED")
+                        self.stats["writes"] += len(found)
+                    missing = [key for key in values if key not in found]
+                    self.stats["missing"] += len(missing)
+                    return missing
+                if not (header_ok and keys_ok):
+                    print("🔄 시트 행 색인 불일치 → 다시 생성 (일괄 쓰기)")
+                    self.stats["invalidations"] += 1
+                if attempt == 0:
+                    self._build(live=True)
+            self.stats["missing"] += len(values)
+            return list(values)
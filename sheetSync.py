@@ -0,0 +1,103 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+def row_hash(row):
+    """행 내용 해시 (프로세스 메모리 안에서만 비교하므로 내장 hash 사용)"""
+    return hash(tuple(row))
+
+
+def row_keys(rows, key_pos):
+    """행 식별자 = (키 컬럼 값, 같은 키의 몇 번째 행인지). 키가 중복/빈 값이어도 순서대로 구분된다"""
+    seen = {}
+    keys = []
+    for row in rows:
+        key = row[key_pos].strip() if key_pos is not None and key_pos < len(row) else ""
+        nth = seen.get(key, 0)
+        seen[key] = nth + 1
+        keys.append((key, nth))
+    return keys
+
+
+class SheetDeltaSync:
+    """get_all_values 결과를 직전 스냅샷과 행 단위로 비교해 바뀐 행만 프레임에 반영한다.
+
+    build(raw_df) → (프레임, 정보) 는 처음/헤더 변경 시 전체 생성,
+    patch(프레임, 정보, 바뀐 행 raw_df, take, dropped_positions) → (프레임, 정보) 는 변경분 반영에 쓴다.
+    sync 는 (프레임, 정보, 변경 내역) 을 돌려주며 변경 내역으로 인덱스 등도 부분 갱신할 수 있다.
+
+    변경 내역: {"full": 전체 재생성 여부, "inserted"/"updated"/"deleted": 회원 ID 목록,
+              "positions": 새 프레임에서 추가/수정된 행 위치, "reordered": 기존 행 순서 변경/삭제 여부}
+    """
+
+    def __init__(self, build, patch, key_field="회원 ID"):
+        self._build = build
+        self._patch = patch
+        self.key_field = key_field
+        self._lock = threading.Lock()
+        self.header = None
+        self.frame = None
+        self.info = None
+        self._keys = []
+        self._hashes = []
+        self.stats = {"full_builds": 0, "patches": 0, "unchanged": 0, "rows_patched": 0}
+
+    def _full(self, header, rows):
+        self.header = list(header)
+        self._keys = row_keys(rows, self._key_pos())
+        self._hashes = [row_hash(row) for row in rows]
+        self.frame, self.info = self._build(pd.DataFrame(rows, columns=header))
+        self.stats["full_builds"] += 1
+        return self.frame, self.info, {"full": True, "inserted": [], "updated": [], "deleted": [],
+                                       "positions": np.arange(len(rows)), "reordered": True}
+
+    def _key_pos(self):
+        return self.header.index(self.key_field) if self.key_field in self.header else None
+
+    def sync(self, header, rows):
+        with self._lock:
+            if self.frame is None or list(header) != self.header:
+                return self._full(header, rows)
+
+            keys = row_keys(rows, self._key_pos())
+            hashes = [row_hash(row) for row in rows]
+            old_pos = {key: pos for pos, key in enumerate(self._keys)}
+
+            take = np.empty(len(rows), dtype=np.int64)
+            changed_rows = []
+            positions = []
+            inserted, updated = [], []
+            kept = set()
+            reordered = False
+            for pos, (key, digest) in enumerate(zip(keys, hashes)):
+                prev = old_pos.get(key)
+                if prev is not None and prev != pos:
+                    reordered = True  # 기존 행 위치가 바뀜 (중간 삽입/삭제/정렬)
+                if prev is not None and self._hashes[prev] == digest:
+                    take[pos] = prev
+                    kept.add(prev)
+                    continue
+                (updated if prev is not None else inserted).append(key[0])
+                take[pos] = len(self._keys) + len(changed_rows)
+                changed_rows.append(rows[pos])
+                positions.append(pos)
+
+            dropped = [pos for pos in range(len(self._keys)) if pos not in kept]
+            new_keys = set(keys)
+            deleted = [key[0] for key in self._keys if key not in new_keys]
+            reordered = reordered or bool(deleted)
+            changes = {"full": False, "inserted": inserted, "updated": updated, "deleted": deleted,
+                       "positions": np.array(positions, dtype=np.int64), "reordered": reordered}
+
+            if not changed_rows and not reordered and len(rows) == len(self._keys):
+                self.stats["unchanged"] += 1
+                return self.frame, self.info, changes
+
+            changed_raw = pd.DataFrame(changed_rows, columns=header)
+            self.frame, self.info = self._patch(self.frame, self.info, changed_raw, take, dropped)
+            self._keys, self._hashes = keys, hashes
+            self.stats["patches"] += 1
+            self.stats["rows_patched"] += len(changed_rows)
+            return self.frame, self.info, changes
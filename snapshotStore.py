@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+METADATA_KEY = b"lovemate_sheet"
+PARQUET_COMPRESSION = "zstd"
+
+
+class SheetSnapshotStore:
+    """시트 원본 값(헤더 + 행) 보관소. 최신 값은 메모리에, 디스크에는 압축 Parquet 로 저장한다.
+
+    프로세스가 아직 한 번도 실제로 읽지 않은 시트는 디스크 저장본을 바로 돌려주고 백그라운드에서 다시 읽는다
+    (재시작 직후 첫 화면이 전체 조회를 기다리지 않도록). 그 밖에는 max_age 보다 오래된 값이면 바로 다시 읽는다.
+    """
+
+    def __init__(self, root, max_age=300, on_refresh=None):
+        self.root = root
+        self.max_age = max_age
+        self._on_refresh = on_refresh
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._memory = {}  # key → {"header", "rows", "fetched_at", "source"}
+        self._live = set()  # 이 프로세스에서 실제로 읽은 적 있는 시트
+        self._refreshing = set()
+        self.stats = {"live_fetches": 0, "disk_hits": 0, "background_refreshes": 0, "saves": 0, "failures": 0}
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.parquet")
+
+    def _save(self, key, header, rows, fetched_at):
+        """원자적 저장 (임시 파일 → os.replace). 중복/빈 헤더가 있어 컬럼은 위치 번호로, 헤더는 메타데이터로 보관"""
+        df = pd.DataFrame(rows, columns=[str(i) for i in range(len(header))], dtype=object)
+        table = pa.Table.from_pandas(df.astype(str), preserve_index=False)
+        meta = json.dumps({"header": list(header), "fetched_at": fetched_at}, ensure_ascii=False).encode("utf-8")
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), METADATA_KEY: meta})
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        os.close(fd)
+        try:
+            pq.write_table(table, temp_path, compression=PARQUET_COMPRESSION)
+            os.replace(temp_path, self._path(key))
+            with self._lock:
+                self.stats["saves"] += 1
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            print(f"⚠️ 시트 저장본 기록 실패 {key}: {e}")
+
+    def _load(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            table = pq.read_table(path)
+            meta = json.loads(table.schema.metadata[METADATA_KEY].decode("utf-8"))
+            rows = table.to_pandas().values.tolist()
+        except Exception as e:
+            print(f"⚠️ 시트 저장본 읽기 실패 {key}: {e}")
+            return None
+        return {"header": meta["header"], "rows": rows, "fetched_at": meta["fetched_at"], "source": "disk"}
+
+    def _store(self, key, header, rows):
+        entry = {"header": header, "rows": rows, "fetched_at": time.time(), "source": "live"}
+        with self._lock:
+            self._memory[key] = entry
+            self._live.add(key)
+            self.stats["live_fetches"] += 1
+        threading.Thread(target=self._save, args=(key, header, rows, entry["fetched_at"]), daemon=True).start()
+        return entry
+
+    def _revalidate(self, key, fetch):
+        try:
+            self._store(key, *fetch())
+            with self._lock:
+                self.stats["background_refreshes"] += 1
+            if self._on_refresh:
+                self._on_refresh(key)
+        except Exception as e:
+            with self._lock:
+                self.stats["failures"] += 1
+            print(f"⚠️ 시트 백그라운드 갱신 실패 {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, key, fetch, allow_stale=True):
+        """(헤더, 행). fetch() → (헤더, 행) 은 실제 시트 조회"""
+        with self._lock:
+            entry = self._memory.get(key)
+            cold = key not in self._live
+        if entry is not None and not cold and time.time() - entry["fetched_at"] < self.max_age:
+            return entry["header"], entry["rows"]
+
+        if cold and allow_stale:
+            entry = entry or self._load(key)
+            if entry is not None:
+                with self._lock:
+                    self._memory.setdefault(key, entry)
+                    self.stats["disk_hits"] += 1
+                    start = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start:
+                    threading.Thread(target=self._revalidate, args=(key, fetch), daemon=True).start()
+                return entry["header"], entry["rows"]
+
+        entry = self._store(key, *fetch())
+        return entry["header"], entry["rows"]
+
+    def expire(self):
+        """메모리 값을 모두 오래된 것으로 표시 (수동 새로고침 → 다음 조회 때 실제로 다시 읽음)"""
+        with self._lock:
+            for entry in self._memory.values():
+                entry["fetched_at"] = min(entry["fetched_at"], time.time() - self.max_age)
+
+    def describe(self, key):
+        """화면 표시용: {"age": 초, "source": "live"/"disk", "refreshing": bool}. 아직 없으면 None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            return {"age": time.time() - entry["fetched_at"], "source": entry["source"],
+                    "refreshing": key in self._refreshing}
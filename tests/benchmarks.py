@@ -0,0 +1,287 @@
+# 성능 비교 모음 (pytest 수집 대상 아님): python -m tests.benchmarks [이름 ...]
+# 각 benchmark_* 는 기존 방식과 바뀐 방식을 같은 입력으로 돌려 시간/크기를 비교한 결과를 돌려준다.
+# 결과를 확인하는 단언은 tests/test_benchmarks.py 에서 작은 입력으로 실행한다.
+import base64
+import io
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import urlopen
+
+import numpy as np
+import regex
+from cryptography.fernet import Fernet
+from PIL import Image
+from reportlab.pdfbase import pdfmetrics
+
+from driveThumbnails import DriveThumbnailFetcher
+from keyRing import FernetKeyRing
+from makeProfileCard import PHOTO_TARGET_DPI, create_pdf_from_data
+from makeWatermarkToPdf import WatermarkStampCache, add_watermark_to_pdf, add_watermark_to_pdf_bytes, create_watermark
+from matchEngine import MemberBitsetIndex, build_member_snapshot
+from tests.conftest import synthetic_jpeg
+from tests.test_match_engine import filter_members_reference, make_synthetic_members, random_requests
+from tests.test_text_layout import NO_SPACE, legacy_wrap_text, sample_texts
+from tests.test_watermark import card_pdf
+from textLayout import remove_emojis, wrap_text
+from thumbnailCache import StaticThumbnailStore
+
+
+def benchmark_bitset_index(sizes=(10_000, 100_000), requests=50, seed=0):
+    """가상 회원 10k/100k 에서 기존 pandas 필터(시트 원본 프레임), 비트셋 엔진, 일괄(match_many) 처리의 요청당 시간을 비교"""
+    results = []
+    for n in sizes:
+        raw = make_synthetic_members(n, seed)
+        snapshot, _ = build_member_snapshot(raw)
+        started = time.perf_counter()
+        index = MemberBitsetIndex(snapshot)
+        build_time = time.perf_counter() - started
+
+        match_requests = random_requests(n, requests, seed)
+
+        started = time.perf_counter()
+        expected = [filter_members_reference(raw, m) for m in match_requests]
+        pandas_time = (time.perf_counter() - started) / requests
+
+        started = time.perf_counter()
+        actual = [index.match(m) for m in match_requests]
+        bitset_time = (time.perf_counter() - started) / requests
+
+        started = time.perf_counter()
+        batched = index.match_many(match_requests)
+        batch_time = (time.perf_counter() - started) / requests
+
+        for exp, act, bat in zip(expected, actual, batched):
+            assert exp["회원 ID"].tolist() == act["회원 ID"].tolist() == bat["회원 ID"].tolist()
+
+        results.append({
+            "members": n,
+            "index_build_s": round(build_time, 4),
+            "pandas_ms": round(pandas_time * 1000, 2),
+            "bitset_ms": round(bitset_time * 1000, 2),
+            "batch_ms": round(batch_time * 1000, 2),
+            "speedup": round(pandas_time / bitset_time, 1),
+        })
+    return results
+
+
+
+
+def inline_png_payload_bytes(jpeg_bytes):
+    """이전 방식(PNG 재인코딩 + base64 data URI)으로 보냈을 때 img src 크기"""
+    buffered = io.BytesIO()
+    Image.open(io.BytesIO(jpeg_bytes)).save(buffered, format="PNG")
+    return len("data:image/png;base64," + base64.b64encode(buffered.getvalue()).decode())
+
+
+def benchmark_gallery_payload(photos=20, sizes=(200, 300), seed=0):
+    """가상 사진 갤러리 1회 렌더링 시 웹소켓으로 나가는 img src 바이트: data URI(PNG) vs 정적 URL (썸네일 크기별)"""
+    rng = np.random.default_rng(seed)
+    results = {}
+    for size in sizes:
+        store = StaticThumbnailStore(tempfile.mkdtemp(), "./app/static/thumbs")
+        before = after = file_bytes = 0
+        for _ in range(photos):
+            data = synthetic_jpeg(rng, int(size * 0.75), size, quality=85)
+            before += inline_png_payload_bytes(data)
+            after += len(store.publish(data))
+            file_bytes += len(data)
+        results[size] = {"photos": photos, "inline_png_bytes": before, "static_url_bytes": after,
+                         "first_load_jpeg_bytes": file_bytes}
+    return results
+
+
+def benchmark_gallery_transfer(photos=20, sizes=(200, 300), original_px=3000, seed=0):
+    """로컬 가짜 Drive 썸네일 서버로 갤러리 1회 분량을 받아 썸네일/원본 전송 바이트를 비교 (썸네일 크기별).
+
+    사진 1장은 썸네일이 없어 원본으로 대체되는 경우로 둔다.
+    """
+    rng = np.random.default_rng(seed)
+    original = synthetic_jpeg(rng, int(original_px * 0.75), original_px)
+    thumbnails = {}
+
+    class FakeDrive(BaseHTTPRequestHandler):
+        def do_GET(self):
+            match = re.match(r"^/thumb/(?P<file_id>[^=]+)=s(?P<size>\d+)$", self.path)
+            if not match:
+                self.send_error(404)
+                return
+            px = int(match.group("size"))
+            if px not in thumbnails:
+                thumbnail = Image.open(io.BytesIO(original))
+                thumbnail.thumbnail((px, px))
+                buffered = io.BytesIO()
+                thumbnail.save(buffered, format="JPEG", quality=85)
+                thumbnails[px] = buffered.getvalue()
+            body = thumbnails[px]
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeDrive)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def get_metadata(file_id):
+        return {} if file_id == "no-thumb" else {"thumbnailLink": f"{base_url}/thumb/{file_id}=s220"}
+
+    def http_get(url):
+        with urlopen(url, timeout=10) as response:
+            return response.status, response.read()
+
+    file_ids = [f"photo{i}" for i in range(photos - 1)] + ["no-thumb"]
+    results = {}
+    try:
+        for size in sizes:
+            results[size] = {}
+            for mode, use_thumbnails in [("original", False), ("thumbnail", True)]:
+                fetcher = DriveThumbnailFetcher(get_metadata, lambda file_id: original, http_get, use_thumbnails)
+                for file_id in file_ids:
+                    fetcher.fetch(file_id, size)
+                results[size][mode] = dict(fetcher.stats, total_bytes=fetcher.stats["thumbnail_bytes"] + fetcher.stats["original_bytes"])
+    finally:
+        server.shutdown()
+    return results
+
+
+def benchmark_login_latency(logins=20, key_fetch_seconds=0.25):
+    """로그인 1회의 키 관련 지연: 매번 키 조회(기존) vs 키 묶음 재사용.
+
+    키 조회는 gspread 인증 + 관리자 시트 열기 + B1 읽기 왕복을 key_fetch_seconds 로 흉내 낸다.
+    """
+    key = Fernet.generate_key()
+    token = Fernet(key).encrypt(b"password").decode()
+
+    def fetch_key():
+        time.sleep(key_fetch_seconds)
+        return key
+
+    started = time.perf_counter()
+    for _ in range(logins):
+        assert Fernet(fetch_key()).decrypt(token.encode()) == b"password"
+    uncached = (time.perf_counter() - started) / logins
+
+    ring = FernetKeyRing(lambda: [fetch_key()])
+    started = time.perf_counter()
+    for _ in range(logins):
+        assert ring.decrypt(token) == "password"
+    cached = (time.perf_counter() - started) / logins
+
+    return {"logins": logins, "per_login_ms_without_ring": round(uncached * 1000, 2),
+            "per_login_ms_with_ring": round(cached * 1000, 3), "key_loads_with_ring": ring.stats["loads"]}
+
+
+# 기존 remove_emojis (비교 기준). 이모지 집합에는 범위 끝값만 들어 있음
+emoji_range = {
+    '\U0001F600', '\U0001F9FF', '\U0001F300', '\U0001F5FF', '\U0001F680', '\U0001F6FF', '\U0001F1E0', '\U0001F1FF',
+    '\U00002700', '\U000027BF', '\U0001F900', '\U0001F9FF', '\U00002600', '\U000026FF', '\U00002300', '\U000023FF',
+    '\U0000200D', '\U0001F3FB', '\U0001F3FC', '\U0001F3FD', '\U0001F3FE', '\U0001F3FF'
+}
+
+
+
+def legacy_remove_emojis(text):
+    return regex.sub(r'\X', lambda m: '' if any(char in emoji_range for char in m.group()) else m.group(), text)
+
+
+def benchmark_layout(repeats=20, seed=0):
+    """긴 소개/연애스타일 문단 줄바꿈 + 이모지 제거: 기존 방식(매 단어 stringWidth, 문자 묶음마다 lambda) vs textLayout"""
+    texts = sample_texts(seed)
+    results = {}
+    for name, wrap, strip in [("legacy", legacy_wrap_text, legacy_remove_emojis), ("layout", wrap_text, remove_emojis)]:
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for text in texts:
+                wrap(strip(text), "PreMedium", 13, 500)
+        elapsed = time.perf_counter() - started
+        widest = max(pdfmetrics.stringWidth(line, "PreMedium", 13) for line in wrap(NO_SPACE, "PreMedium", 13, 500))
+        results[name] = {"ms_per_text": round(elapsed / (repeats * len(texts)) * 1000, 2),
+                         "no_space_max_line_width": round(widest, 1)}
+    return results
+
+
+def benchmark_photo_downscale(cards=5, upload_mbps=20, seed=0, photo_size=(3000, 4000)):
+    """12MP 사진 4장짜리 카드: 원본 그대로 넣기 vs 인쇄 해상도로 줄이기 - 카드 크기와 생성 + 업로드 시간.
+
+    업로드 시간은 upload_mbps 회선 기준 추정치 (바이트 × 8 / 대역폭)
+    """
+    rng = np.random.default_rng(seed)
+    photos = [synthetic_jpeg(rng, *photo_size, quality=92, orientation=orientation) for orientation in (1, 6, 1, 1)]
+    output_dir = tempfile.mkdtemp()
+    results = {}
+    for mode, dpi in [("original", None), (f"{PHOTO_TARGET_DPI}dpi", PHOTO_TARGET_DPI)]:
+        total_bytes, total_seconds = 0, 0.0
+        for i in range(cards):
+            path = os.path.join(output_dir, f"{mode}_{i}.pdf")
+            started = time.perf_counter()
+            create_pdf_from_data({"member_code": f"M{i}", "info_text": "안녕하세요 " * 40, "photos": photos}, path,
+                                 photo_dpi=dpi)
+            total_seconds += time.perf_counter() - started
+            total_bytes += os.path.getsize(path)
+            os.remove(path)
+        avg_bytes = total_bytes / cards
+        upload_seconds = avg_bytes * 8 / (upload_mbps * 1_000_000)
+        results[mode] = {"avg_card_bytes": round(avg_bytes), "generate_s": round(total_seconds / cards, 3),
+                         "upload_s_est": round(upload_seconds, 3),
+                         "end_to_end_s": round(total_seconds / cards + upload_seconds, 3)}
+    return results
+
+
+def benchmark_watermark_jobs(jobs=32, requesters=8, seed=0):
+    """트리거 1회(요청자 8명 × 후보 4명) 분량의 워터마크 처리량 (Drive 전송 제외):
+    기존 방식(임시 파일 3개 + 작업마다 워터마크 생성/파싱) vs 메모리 처리 + 워터마크 캐시
+    """
+    source = card_pdf(seed)
+    phones = [f"010-1234-{i:04d}" for i in range(requesters)]
+    job_phones = [phones[i * requesters // jobs] for i in range(jobs)]
+
+    started = time.perf_counter()
+    for phone in job_phones:
+        input_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf").name
+        watermark_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf").name
+        output_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf").name
+        with open(input_pdf, "wb") as f:  # 다운로드 결과를 디스크에 쓰던 단계
+            f.write(source)
+        create_watermark(phone, watermark_pdf)
+        add_watermark_to_pdf(input_pdf, output_pdf, watermark_pdf)
+        with open(output_pdf, "rb") as f:  # MediaFileUpload 가 경로에서 다시 읽던 단계
+            f.read()
+        for path in (input_pdf, watermark_pdf, output_pdf):
+            os.remove(path)
+    file_based = time.perf_counter() - started
+
+    stamps = WatermarkStampCache()
+    started = time.perf_counter()
+    for phone in job_phones:
+        add_watermark_to_pdf_bytes(source, stamps.page(phone))
+    in_memory = time.perf_counter() - started
+
+    return {"jobs": jobs, "source_bytes": len(source),
+            "file_based_s": round(file_based, 3), "file_based_jobs_per_s": round(jobs / file_based, 1),
+            "in_memory_s": round(in_memory, 3), "in_memory_jobs_per_s": round(jobs / in_memory, 1),
+            "stamp_builds": stamps.stats["builds"]}
+
+
+BENCHMARKS = {
+    "bitset_index": benchmark_bitset_index,
+    "gallery_payload": benchmark_gallery_payload,
+    "gallery_transfer": benchmark_gallery_transfer,
+    "login_latency": benchmark_login_latency,
+    "layout": benchmark_layout,
+    "photo_downscale": benchmark_photo_downscale,
+    "watermark_jobs": benchmark_watermark_jobs,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        print(name, BENCHMARKS[name]())
@@ -0,0 +1,27 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import ExifTags, Image
+
+
+def synthetic_jpeg(rng, width, height, quality=90, orientation=None):
+    """사진과 비슷하도록 부드러운 그라디언트 + 약한 노이즈 JPEG 바이트 (orientation: EXIF 방향)"""
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 / x.max(), y * 255 / y.max(), np.full_like(x, rng.integers(0, 255))], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    options = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = orientation
+        options["exif"] = exif
+    buffered = io.BytesIO()
+    Image.fromarray(pixels).save(buffered, format="JPEG", quality=quality, **options)
+    return buffered.getvalue()
+
+
+@pytest.fixture
+def photo_jpeg():
+    """photo_jpeg(width, height, quality=90, orientation=None) → 가상 사진 JPEG 바이트 (테스트마다 같은 시드)"""
+    rng = np.random.default_rng(0)
+    return lambda width, height, **options: synthetic_jpeg(rng, width, height, **options)
@@ -0,0 +1,32 @@
+from makeProfileCard import PHOTO_TARGET_DPI
+from tests.benchmarks import (
+    benchmark_bitset_index, benchmark_gallery_payload, benchmark_gallery_transfer, benchmark_photo_downscale,
+    benchmark_watermark_jobs,
+)
+
+
+def test_bitset_index_benchmark_agrees_with_reference():
+    [result] = benchmark_bitset_index(sizes=(2_000,), requests=5)  # 결과가 기준 필터와 다르면 benchmark 안에서 실패
+    assert result["members"] == 2_000
+
+
+def test_static_urls_are_much_smaller_than_inline_png():
+    result = benchmark_gallery_payload(photos=3, sizes=(200,))[200]
+    assert result["static_url_bytes"] * 100 < result["inline_png_bytes"]
+
+
+def test_thumbnails_transfer_fewer_bytes_than_originals():
+    results = benchmark_gallery_transfer(photos=4, sizes=(200,), original_px=1200)[200]
+    assert results["thumbnail"]["fallbacks"] == 1  # "no-thumb" 만 원본
+    assert results["thumbnail"]["thumbnail_fetches"] == 3
+    assert results["thumbnail"]["total_bytes"] < results["original"]["total_bytes"] / 2
+
+
+def test_downscaled_card_is_much_smaller():
+    results = benchmark_photo_downscale(cards=1, photo_size=(1500, 2000))
+    assert results[f"{PHOTO_TARGET_DPI}dpi"]["avg_card_bytes"] * 3 < results["original"]["avg_card_bytes"]
+
+
+def test_benchmark_builds_one_stamp_per_requester():
+    results = benchmark_watermark_jobs(jobs=8, requesters=2)
+    assert results["stamp_builds"] == 2
@@ -0,0 +1,35 @@
+from driveThumbnails import DriveThumbnailFetcher, sized_thumbnail_link
+
+
+def test_sized_thumbnail_link():
+    assert sized_thumbnail_link("https://lh3.example/abc=s220", 300) == "https://lh3.example/abc=s300"
+    assert sized_thumbnail_link("https://lh3.example/abc=s220-c", 200) == "https://lh3.example/abc=s200"
+    assert sized_thumbnail_link("https://lh3.example/abc", 200) == "https://lh3.example/abc=s200"
+
+
+def test_failed_thumbnail_falls_back_to_original():
+    def http_get(url):
+        raise OSError("timeout")
+
+    fetcher = DriveThumbnailFetcher(lambda file_id: {"thumbnailLink": "https://lh3.example/x=s220"},
+                                    lambda file_id: b"original", http_get)
+    assert fetcher.fetch("x", 200) == b"original"
+    assert fetcher.stats["fallbacks"] == 1 and fetcher.stats["original_fetches"] == 1
+
+
+def test_metadata_is_reused_until_expired():
+    calls = []
+
+    def get_metadata(file_id):
+        calls.append(file_id)
+        return {"modifiedTime": str(len(calls))}
+
+    fetcher = DriveThumbnailFetcher(get_metadata, lambda file_id: b"original", lambda url: (404, b""),
+                                    metadata_ttl=60)
+    assert fetcher.metadata("a") == fetcher.metadata("a") == {"modifiedTime": "1"}
+    fetcher.expire_metadata("a")  # 사진 교체
+    assert fetcher.metadata("a") == {"modifiedTime": "2"}
+    fetcher.metadata_ttl = 0
+    assert fetcher.metadata("a") == {"modifiedTime": "3"}
+    assert calls == ["a", "a", "a"]
+    assert fetcher.stats["metadata_hits"] == 1 and fetcher.stats["metadata_fetches"] == 3
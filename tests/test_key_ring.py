@@ -0,0 +1,54 @@
+import time
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+from keyRing import FernetKeyRing
+
+
+def test_previous_keys_still_decrypt_after_rotation():
+    old_key = Fernet.generate_key()
+    token = Fernet(old_key).encrypt(b"password").decode()
+    ring = FernetKeyRing(lambda: [Fernet.generate_key(), old_key])
+    assert ring.decrypt(token) == "password"
+    assert ring.decrypt(ring.rotate(token)) == "password"
+
+
+def test_key_replaced_elsewhere_is_picked_up_on_failure():
+    keys = [Fernet.generate_key()]
+    ring = FernetKeyRing(lambda: list(keys))
+    ring.encrypt("warm up")
+    keys.insert(0, Fernet.generate_key())  # 다른 프로세스가 키 교체
+    token = Fernet(keys[0]).encrypt(b"password").decode()
+    assert ring.decrypt(token) == "password"
+    assert ring.stats["reloads_on_failure"] == 1
+
+
+def test_bad_tokens_reload_keys_at_most_once_per_interval():
+    loads = []
+
+    def load_keys():
+        loads.append(time.monotonic())
+        return [Fernet.generate_key()]
+
+    ring = FernetKeyRing(load_keys, min_reload_interval=60)
+    bad = Fernet(Fernet.generate_key()).encrypt(b"password").decode()
+    for _ in range(20):
+        with pytest.raises(InvalidToken):
+            ring.decrypt(bad)
+    assert len(loads) == 2  # 첫 로드 + 실패로 인한 재조회 1번
+    assert ring.stats["failures"] == 20 and ring.stats["reloads_on_failure"] == 1
+
+
+def test_invalid_previous_keys_are_skipped():
+    old_key = Fernet.generate_key()
+    token = Fernet(old_key).encrypt(b"password").decode()
+    ring = FernetKeyRing(lambda: [Fernet.generate_key(), "교체 메모".encode(), old_key])
+    assert ring.decrypt(token) == "password"
+    assert ring.stats["invalid_keys"] == 1
+
+
+def test_invalid_current_key_raises():
+    ring = FernetKeyRing(lambda: [b"not-a-key", Fernet.generate_key()])
+    with pytest.raises(ValueError):
+        ring.encrypt("password")
@@ -0,0 +1,23 @@
+from PIL import Image
+
+from makeProfileCard import PHOTO_HEIGHT, PHOTO_TARGET_DPI, PHOTO_WIDTH, load_photo
+
+SLOT = (PHOTO_WIDTH, PHOTO_HEIGHT)
+TARGET = (round(PHOTO_WIDTH / 72 * PHOTO_TARGET_DPI), round(PHOTO_HEIGHT / 72 * PHOTO_TARGET_DPI))
+
+
+def test_large_photo_is_downscaled_to_print_resolution(photo_jpeg):
+    image = Image.open(load_photo(photo_jpeg(1500, 2000, quality=92, orientation=1), SLOT))
+    assert image.width <= TARGET[0] and image.height <= TARGET[1]
+    assert max(image.width / TARGET[0], image.height / TARGET[1]) > 0.99  # 칸을 채우는 크기까지만 줄임
+
+
+def test_exif_rotation_is_applied(photo_jpeg):
+    # 방향 6 = 90도 회전 → 가로로 저장된 사진이 세로로 들어가야 함
+    image = Image.open(load_photo(photo_jpeg(2000, 1500, quality=92, orientation=6), SLOT))
+    assert image.height > image.width
+
+
+def test_small_upright_jpeg_is_passed_through(photo_jpeg):
+    raw = photo_jpeg(300, 400, quality=92, orientation=1)
+    assert load_photo(raw, SLOT).getvalue() == raw
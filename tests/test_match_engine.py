@@ -0,0 +1,276 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from matchEngine import (
+    CONDITION_FIELDS, PROFILE_FIELDS, MemberBitsetIndex, build_member_snapshot, face_grade_quotas,
+    patch_member_snapshot, stratified_sample_ids,
+)
+from sheetSync import SheetDeltaSync
+
+
+def filter_members_reference(df, match_data):
+    """비트셋 엔진 도입 전의 auto_match_members 그대로 (출력/경고만 제거, 검증 기준).
+
+    df 는 load_sheet("회원") 과 같은 시트 원본 문자열 프레임 (타입 스냅샷이 아님)
+    """
+    df = df.copy()
+    match_data = dict(match_data)
+    df["회원 ID"] = df["회원 ID"].astype(str).str.strip()
+    match_data["memberId"] = str(match_data["memberId"]).strip()
+
+    target_df = df[df["회원 ID"] == match_data["memberId"]]
+    if target_df.empty:
+        return None
+
+    target = target_df.iloc[0]
+    filtered = df.copy()
+
+    numeric_fields = ["상태 FLAG", "본인(키)", "본인(나이)"]
+    for field in numeric_fields:
+        filtered[field] = pd.to_numeric(filtered[field], errors="coerce")
+
+    filtered = filtered[
+        (filtered["성별"] != target["성별"]) &
+        (filtered["상태 FLAG"] >= 4) &
+        (~filtered["매칭권"].fillna("").str.contains("시크릿"))
+        ]
+
+    if match_data["channel"] and "전체" not in match_data["channel"]:
+        valid_channels = []
+        channel_map = {"프립(F)": "F", "네이버(N)": "N", "프사오(O)": "O", "인스타(A)": "A", "기타(B)": "B", "기타2(C)": "C"}
+        for ch in match_data["channel"]:
+            if ch in channel_map:
+                valid_channels.append(channel_map[ch])
+        filtered = filtered[filtered["주문번호"].astype(str).str[0].isin(valid_channels)]
+
+    if match_data.get("faces"):
+        filtered = filtered[filtered["등급(외모)"].isin(match_data["faces"])]
+
+    if match_data.get("abilitys"):
+        filtered = filtered[filtered["등급(능력)"].isin(match_data["abilitys"])]
+
+    if match_data.get("faceShape") and match_data["faceShape"] != ["전체"]:
+        filtered = filtered[filtered["본인(외모)"].isin(match_data["faceShape"])]
+
+    conds = match_data.get("conditions", [False] * 10)
+    for i, use in enumerate(conds):
+        if not use:
+            continue
+
+        ideal_value = str(target.get(CONDITION_FIELDS[i], "")).strip()
+        if not ideal_value:
+            continue
+
+        if i in [0, 1]:
+            try:
+                min_val, max_val = sorted(map(int, ideal_value.replace(" ", "").split("~")))
+                filtered[PROFILE_FIELDS[i]] = pd.to_numeric(filtered[PROFILE_FIELDS[i]], errors="coerce")
+                filtered = filtered[filtered[PROFILE_FIELDS[i]].between(min_val, max_val)]
+            except:  # noqa: E722 (기존 코드 그대로)
+                pass
+        else:
+            ideals = set(map(str.strip, ideal_value.split(",")))
+            filtered[PROFILE_FIELDS[i]] = filtered[PROFILE_FIELDS[i]].astype(str).str.strip()
+            filtered = filtered[filtered[PROFILE_FIELDS[i]].isin(ideals)]
+
+    sent_ids = str(target.get("받은 프로필 목록", "")).split(",") if pd.notna(target.get("받은 프로필 목록")) else []
+    sent_ids_set = set(map(str.strip, sent_ids))
+    filtered = filtered[~filtered["회원 ID"].astype(str).isin(sent_ids_set)]
+
+    return filtered
+
+
+def make_synthetic_members(n, seed=0):
+    """가상 회원 시트 (load_sheet("회원") 과 같은 문자열 컬럼)"""
+    rng = np.random.default_rng(seed)
+    regions = ["서울", "경기", "인천", "부산", "대구", "대전", "광주", "기타"]
+    choices = {
+        "본인(학력)": ["고졸", "대졸", "석사", "박사"],
+        "본인(흡연)": ["O", "X"],
+        "본인(종교)": ["무교", "기독교", "불교", "천주교"],
+        "본인(회사 규모)": ["대기업", "중견", "중소", "공기업", "프리랜서"],
+        "본인(근무 형태)": ["주간", "교대", "재택"],
+        "본인(음주)": ["안 마심", "가끔", "자주"],
+        "본인(문신)": ["O", "X"],
+    }
+    ideal_sources = {
+        "이상형(사는 곳)": regions,
+        "이상형(학력)": choices["본인(학력)"],
+        "이상형(흡연)": choices["본인(흡연)"],
+        "이상형(종교)": choices["본인(종교)"],
+        "이상형(회사 규모)": choices["본인(회사 규모)"],
+        "이상형(근무 형태)": choices["본인(근무 형태)"],
+        "이상형(음주)": choices["본인(음주)"],
+        "이상형(문신)": choices["본인(문신)"],
+    }
+    heights = rng.integers(150, 191, n)
+    ages = rng.integers(22, 46, n)
+    data = {
+        "회원 ID": [str(i + 1) for i in range(n)],
+        "성별": rng.choice(["남", "여"], n),
+        "상태 FLAG": rng.choice(["3", "4", "5", ""], n, p=[0.2, 0.4, 0.3, 0.1]),
+        "매칭권": rng.choice(["일반", "프리미엄", "시크릿"], n, p=[0.6, 0.3, 0.1]),
+        "주문번호": [f"{c}{i:06d}" for i, c in enumerate(rng.choice(list("FNOABC"), n))],
+        "등급(외모)": rng.choice(["상", "중상", "중", "중하", "하"], n),
+        "등급(능력)": rng.choice(["상", "중", "하"], n),
+        "본인(외모)": rng.choice(["강아지상", "고양이상", "곰상", "여우상"], n),
+        "본인(키)": heights.astype(str),
+        "본인(나이)": ages.astype(str),
+        "본인(거주지-분류)": rng.choice(regions, n),
+        "보내진 횟수": rng.integers(0, 10, n).astype(str),
+        "이상형(키)": [f"{h - 10}~{h + 5}" for h in rng.integers(155, 185, n)],
+        "이상형(나이)": [f"{a - 3} ~ {a + 4}" for a in rng.integers(25, 42, n)],
+        "받은 프로필 목록": [",".join(map(str, rng.integers(1, n + 1, 8))) for _ in range(n)],
+    }
+    for field, values in choices.items():
+        data[field] = rng.choice(values, n)
+    for field, values in ideal_sources.items():
+        data[field] = [", ".join(rng.choice(values, rng.integers(1, len(values)), replace=False)) for _ in range(n)]
+    return pd.DataFrame(data)
+
+
+def random_requests(n, count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{
+        "memberId": str(member_id),
+        "channel": ["전체"],
+        "faces": [],
+        "conditions": list(rng.random(10) < 0.5),
+    } for member_id in rng.integers(1, n + 1, count)]
+
+
+def make_messy_sheet(n, seed=0):
+    """실제 시트처럼 빈 칸/공백/형식 오류가 섞인 원본 문자열 프레임"""
+    raw = make_synthetic_members(n, seed)
+    raw.loc[::97, "회원 ID"] += " "
+    raw.loc[::13, "이상형(키)"] = ""
+    raw.loc[5::17, "이상형(나이)"] = "무관"
+    raw.loc[7::19, "이상형(키)"] = "175 ~ 160"
+    raw.loc[3::23, "본인(키)"] = ""
+    raw.loc[4::31, "본인(나이)"] = "서른"
+    raw.loc[9::37, "상태 FLAG"] = " 4"
+    raw.loc[11::29, "본인(학력)"] += " "
+    raw.loc[2::11, "이상형(사는 곳)"] = " 서울 ,경기,  부산"
+    raw.loc[6::41, "받은 프로필 목록"] = ""
+    raw.loc[8::43, "매칭권"] = ""
+    return raw
+
+
+def test_bitset_index_matches_reference_filter():
+    raw = make_messy_sheet(2_000)
+    snapshot, _ = build_member_snapshot(raw)
+    index = MemberBitsetIndex(snapshot)
+    match_requests = random_requests(2_000, 40)
+    match_requests.append({"memberId": "1", "channel": ["네이버(N)"], "faces": ["상", "중"],
+                           "abilitys": ["상"], "faceShape": ["고양이상"], "conditions": [True] * 10})
+    match_requests.append({"memberId": "3", "channel": ["전체", "프립(F)"], "faces": [], "conditions": [True] * 10})
+    batched = index.match_many(match_requests)
+    for match_data, batch in zip(match_requests, batched):
+        expected = filter_members_reference(raw, match_data)["회원 ID"].tolist()
+        assert index.match(match_data)["회원 ID"].tolist() == expected
+        assert batch["회원 ID"].tolist() == expected
+
+
+def test_reciprocal_scores_skip_blank_ideals_in_both_directions():
+    raw = make_synthetic_members(300)
+    raw["상태 FLAG"] = "4"
+    raw["매칭권"] = "일반"
+    raw["받은 프로필 목록"] = ""
+    raw.loc[raw["회원 ID"] == "1", CONDITION_FIELDS] = ""  # 요청자 이상형 없음 → 정방향 0점
+    blank_ideal = raw["회원 ID"].isin(["2", "3", "4", "5", "6", "7"])
+    raw.loc[blank_ideal, CONDITION_FIELDS] = ""  # 후보 이상형 없음 → 역방향도 0점
+    snapshot, _ = build_member_snapshot(raw)
+    ranked = MemberBitsetIndex(snapshot).reciprocal_rank({"memberId": "1", "conditions": [True] * 10}, k=300)
+    scores = dict(zip(ranked["회원 ID"], ranked["호환 점수"]))
+    blank_candidates = [member_id for member_id in ["2", "3", "4", "5", "6", "7"] if member_id in scores]
+    assert blank_candidates
+    assert all(scores[member_id] == 0 for member_id in blank_candidates)
+    assert max(scores.values()) > 0
+
+
+def test_unknown_face_grade_picks_nobody():
+    snapshot, _ = build_member_snapshot(make_synthetic_members(300))
+    for grade in ["", None, "특상"]:
+        assert stratified_sample_ids(snapshot, face_grade_quotas(grade), seed=1) == []
+    assert len(stratified_sample_ids(snapshot, face_grade_quotas("중"), seed=1)) == 4
+
+
+def test_patched_snapshot_stats_match_full_build():
+    raw = make_synthetic_members(1_000)
+    header, rows = list(raw.columns), raw.values.tolist()
+    sync = SheetDeltaSync(build_member_snapshot, patch_member_snapshot)
+    sync.sync(header, rows)
+
+    rows = [list(row) for row in rows[:600]]  # 행 삭제 + 한 칸 수정
+    rows[5][header.index("본인(학력)")] = "박사"
+    snapshot, stats, changes = sync.sync(header, rows)
+    _, full_stats = build_member_snapshot(pd.DataFrame(rows, columns=header))
+    assert not changes["full"]
+    assert stats["rows"] == full_stats["rows"] == len(snapshot)
+    assert stats["memory_after"] == full_stats["memory_after"]
+    assert "memory_before" not in stats
+
+
+
+def update_rows(header, rows):
+    rows[5][header.index("본인(학력)")] = "박사후"  # 처음 보는 값
+    rows[7][header.index("성별")] = "남" if rows[7][header.index("성별")] == "여" else "여"
+    rows[9][header.index("상태 FLAG")] = "5"
+    rows[11][header.index("본인(키)")] = ""
+    rows[13][header.index("이상형(사는 곳)")] = "제주"
+    return rows
+
+
+def insert_rows(header, rows):
+    for member_id, source in [("9001", rows[3]), ("9002", rows[4])]:
+        row = list(source)
+        row[header.index("회원 ID")] = member_id
+        row[header.index("본인(종교)")] = "원불교"
+        row[header.index("상태 FLAG")] = "4"
+        rows.append(row)
+    return rows
+
+
+def delete_rows(header, rows):
+    return rows[:10] + rows[11:]
+
+
+def reorder_rows(header, rows):
+    return rows[100:] + rows[:100]
+
+
+@pytest.mark.parametrize("mutate, incremental", [
+    (update_rows, True), (insert_rows, True), (delete_rows, False), (reorder_rows, False),
+])
+def test_apply_changes_matches_fresh_index(mutate, incremental):
+    raw = make_synthetic_members(500)
+    header = list(raw.columns)
+    rows = [list(row) for row in raw.values.tolist()]
+    sync = SheetDeltaSync(build_member_snapshot, patch_member_snapshot)
+    snapshot, _, _ = sync.sync(header, rows)
+    index = MemberBitsetIndex(snapshot)
+    match_requests = random_requests(500, 30, seed=1) + [
+        {"memberId": member_id, "channel": ["네이버(N)"], "faces": ["상", "중"], "faceShape": ["고양이상"],
+         "conditions": [True] * 10} for member_id in ["1", "6", "8", "12", "9001", "9002"]
+    ]
+    before = [index.candidate_positions(match_data) for match_data in match_requests]
+
+    new_snapshot, _, changes = sync.sync(header, mutate(header, [list(row) for row in rows]))
+    assert changes["reordered"] != incremental
+    patched = index.apply_changes(new_snapshot, changes)
+    fresh = MemberBitsetIndex(new_snapshot)
+
+    assert patched.size == fresh.size == len(new_snapshot)
+    for member_id in list(fresh._positions_by_id) + ["9001", "9002", "11"]:
+        assert patched.target_position(member_id) == fresh.target_position(member_id)
+    for match_data in match_requests:
+        expected = fresh.candidate_positions(match_data)
+        actual = patched.candidate_positions(match_data)
+        assert (actual is None and expected is None) or actual.tolist() == expected.tolist()
+    for actual, expected in zip(patched.match_many(match_requests), fresh.match_many(match_requests)):
+        assert (actual is None and expected is None) or actual["회원 ID"].tolist() == expected["회원 ID"].tolist()
+    # 기존 인덱스는 그대로 (이전 스냅샷을 보던 요청이 계속 같은 결과)
+    for match_data, positions in zip(match_requests, before):
+        after = index.candidate_positions(match_data)
+        assert (after is None and positions is None) or after.tolist() == positions.tolist()
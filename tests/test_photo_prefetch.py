@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+
+from photoPrefetch import PhotoPrefetcher
+
+
+def test_timed_out_photo_is_requested_again():
+    release = threading.Event()
+    calls = []
+
+    def fetch(file_id, size):
+        calls.append(file_id)
+        if len(calls) == 1:
+            release.wait(5)  # 첫 다운로드만 느림
+        return f"url-{file_id}-{size}"
+
+    prefetcher = PhotoPrefetcher(fetch, max_workers=2, timeout=0.05)
+    prefetcher.prefetch([("a", 200)])
+    with pytest.raises(TimeoutError):
+        prefetcher.result(("a", 200))
+    assert prefetcher.result(("a", 200)) == "url-a-200"  # 새 제한 시간으로 다시 요청
+    assert calls == ["a", "a"]
+    release.set()
+    prefetcher.shutdown()
+
+
+def test_shutdown_lets_requested_downloads_finish():
+    release = threading.Event()
+    prefetcher = PhotoPrefetcher(lambda file_id, size: release.wait(5) and file_id, max_workers=1, timeout=5)
+    prefetcher.prefetch([("a", 200), ("b", 200)])
+    futures = [future for future, _ in prefetcher._futures.values()]
+    prefetcher.shutdown()
+    release.set()
+    assert [future.result(timeout=5) for future in futures] == ["a", "b"]
+    with pytest.raises(RuntimeError):
+        prefetcher.prefetch([("c", 200)])
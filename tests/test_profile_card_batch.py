@@ -0,0 +1,43 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from profileCardBatch import fetch_card_photos
+
+
+def test_photos_keep_sheet_order_when_downloads_finish_out_of_order():
+    # 첫 사진이 가장 늦게 끝나도 결과는 시트 순서 그대로 (d → c → b → a 순으로 끝나도록 앞 사진이 뒤 사진을 기다림)
+    finished = []
+    done = {file_id: threading.Event() for file_id in "abcd"}
+
+    def download(file_id):
+        after = chr(ord(file_id) + 1)
+        if after in done:
+            assert done[after].wait(5)
+        finished.append(file_id)
+        done[file_id].set()
+        return file_id.encode() * 3
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = fetch_card_photos(pool, download, ["a", "b", "c", "d"])
+
+    assert finished == ["d", "c", "b", "a"]
+    assert [photo for photo, _ in results] == [b"aaa", b"bbb", b"ccc", b"ddd"]
+    assert all(error is None for _, error in results)
+
+
+def test_missing_photo_is_reported_in_place():
+    calls = []
+
+    def download(file_id):
+        calls.append(file_id)
+        if file_id == "gone":
+            raise FileNotFoundError("404 File not found")
+        return file_id.encode()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = fetch_card_photos(pool, download, ["a", "gone", "", "d"])
+
+    assert [photo for photo, _ in results] == [b"a", None, None, b"d"]
+    assert isinstance(results[1][1], FileNotFoundError)
+    assert isinstance(results[2][1], ValueError)  # 링크에서 ID 를 못 뽑은 사진은 받지 않음
+    assert sorted(calls) == ["a", "d", "gone"]
@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import sheetClientPool
+from sheetClientPool import SheetClientPool
+
+URL = "https://docs.google.com/spreadsheets/d/test/edit"
+
+
+class FakeCreds:
+    def __init__(self, expires_in):
+        self.token = "token"
+        self.expiry = datetime.utcnow() + expires_in
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.expiry = datetime.utcnow() + timedelta(hours=1)
+
+
+class FakeClient:
+    def __init__(self):
+        self.opened = []
+
+    def open_by_url(self, url):
+        self.opened.append(url)
+        spreadsheet = type("Spreadsheet", (), {})()
+        spreadsheet.worksheet = lambda title: ("worksheet", title, threading.get_ident())
+        return spreadsheet
+
+
+def make_pool(monkeypatch, expires_in=timedelta(hours=1)):
+    clients = []
+
+    def authorize(creds):
+        clients.append(FakeClient())
+        return clients[-1]
+
+    monkeypatch.setattr(sheetClientPool.gspread, "authorize", authorize)
+    monkeypatch.setattr(sheetClientPool.google.auth.transport.requests, "Request", lambda: None)
+    return SheetClientPool(FakeCreds(expires_in)), clients
+
+
+def test_handles_are_shared_across_threads(monkeypatch):
+    pool, clients = make_pool(monkeypatch)
+    start = threading.Barrier(8)
+
+    def lookup(_):
+        start.wait(5)  # 8개 스레드가 동시에 처음 요청
+        return [pool.worksheet(URL, "회원") for _ in range(5)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        handles = [handle for result in executor.map(lookup, range(8)) for handle in result]
+
+    assert len(set(handles)) == 1  # 처음 만든 스레드의 핸들을 모두가 재사용
+    assert len(clients) == 1 and clients[0].opened == [URL]
+    stats = pool.stats_snapshot()
+    assert stats["authorize"] == 1 and stats["worksheet_miss"] == 1 and stats["worksheet_hit"] == 39
+    assert stats["token_refresh"] == 0
+
+
+def test_token_is_refreshed_before_expiry(monkeypatch):
+    pool, _ = make_pool(monkeypatch, expires_in=timedelta(minutes=2))  # 갱신 여유(5분)보다 짧게 남음
+    pool.worksheet(URL, "회원")
+    pool.worksheet(URL, "회원")
+    assert pool.stats_snapshot()["token_refresh"] == 1
+
+
+def test_invalidate_reopens_only_that_spreadsheet(monkeypatch):
+    pool, clients = make_pool(monkeypatch)
+    pool.worksheet(URL, "회원")
+    pool.worksheet("other", "로그")
+    pool.invalidate(URL)
+    pool.worksheet(URL, "회원")
+    pool.worksheet("other", "로그")
+    assert clients[0].opened == [URL, "other", URL]
+
+
+def test_call_count_covers_only_the_counting_thread(monkeypatch):
+    pool, _ = make_pool(monkeypatch)
+    calls = pool.start_call_count()
+    worksheet = pool.worksheet(URL, "요청")
+    pool.record("batch_get")
+    other = threading.Thread(target=lambda: (pool.worksheet(URL, "회원"), pool.record("get_all_values")))
+    other.start()
+    other.join()
+    pool.worksheet(URL, "요청")  # 재사용 → 요청 없음
+    pool.record("batch_update")
+    pool.stop_call_count()
+    pool.record("batch_update")
+
+    assert worksheet is not None
+    assert calls == {"open_by_url": 1, "worksheet": 1, "batch_get": 1, "batch_update": 1}
@@ -0,0 +1,64 @@
+import threading
+
+from sheetLogSink import SheetLogSink
+
+
+class FakeWorksheet:
+    def __init__(self, failures=0):
+        self.calls = []
+        self.failures = failures
+        self.sent = threading.Event()
+
+    def append_rows(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("429 Too Many Requests")
+        self.calls.append(list(rows))
+        self.sent.set()
+
+
+def test_rows_are_sent_in_batches():
+    ws = FakeWorksheet()
+    sink = SheetLogSink(lambda: ws, batch_size=10, flush_interval=60)
+    for i in range(25):
+        sink.put([i])
+    sink.close()
+    assert [len(rows) for rows in ws.calls] == [10, 10, 5]
+    assert [row for rows in ws.calls for row in rows] == [[i] for i in range(25)]
+
+
+def test_close_flushes_rows_before_interval():
+    ws = FakeWorksheet()
+    sink = SheetLogSink(lambda: ws, batch_size=50, flush_interval=60)
+    sink.put(["a"])
+    sink.put(["b"])
+    assert ws.calls == []  # 배치도 안 찼고 간격도 안 지남
+    sink.close()
+    assert ws.calls == [[["a"], ["b"]]]
+    sink.put(["c"])  # 닫힌 기록기는 바로 전송
+    assert ws.calls[-1] == [["c"]]
+    assert sink.stats_snapshot()["direct_sends"] == 1
+
+
+def test_failed_rows_are_kept_and_resent():
+    ws = FakeWorksheet(failures=1)
+    sink = SheetLogSink(lambda: ws, batch_size=2, flush_interval=0.05)
+    sink.put(["a"])
+    sink.put(["b"])  # 배치가 차서 전송 → 실패
+    sink.put(["c"])
+    assert ws.sent.wait(5)  # flush_interval 뒤 재전송
+    sink.close()
+    assert [row for rows in ws.calls for row in rows] == [["a"], ["b"], ["c"]]
+    stats = sink.stats_snapshot()
+    assert stats["failures"] == 1 and stats["sent_rows"] == 3 and stats["pending_rows"] == 0
+
+
+def test_pending_rows_are_capped():
+    ws = FakeWorksheet(failures=1)
+    sink = SheetLogSink(lambda: ws, batch_size=100, flush_interval=60, max_pending=2)
+    for i in range(5):
+        sink.put([i])
+    sink.flush()  # 실패 → 최근 2행만 남김
+    sink.close()
+    assert ws.calls == [[[3], [4]]]
+    assert sink.stats_snapshot()["dropped_rows"] == 3
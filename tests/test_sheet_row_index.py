@@ -0,0 +1,119 @@
+from gspread.utils import a1_to_rowcol
+
+from sheetRowIndex import SheetRowIndex
+
+HEADER = ["", "회원 ID", "이름", "메모"]
+
+
+class FakeWorksheet:
+    """1행 제목 + 2행 헤더 + 회원 행. batch_get 은 A1 칸 / "2:2" 행 범위만 지원"""
+
+    def __init__(self, members):
+        self.grid = [["회원 목록"], list(HEADER)] + [["", member_id, name, ""] for member_id, name in members]
+        self.batch_gets = 0
+        self.writes = []
+
+    def cell(self, row, col):
+        values = self.grid[row - 1] if row <= len(self.grid) else []
+        return values[col - 1] if col <= len(values) else ""
+
+    def batch_get(self, ranges):
+        self.batch_gets += 1
+        result = []
+        for a1 in ranges:
+            if ":" in a1:
+                result.append([self.grid[int(a1.split(":")[0]) - 1]])
+            else:
+                value = self.cell(*a1_to_rowcol(a1))
+                result.append([[value]] if value != "" else [])
+        return result
+
+    def update_cell(self, row, col, value):
+        self.writes.append((row, col, value))
+        self.grid[row - 1][col - 1] = value
+
+    def batch_update(self, data, value_input_option="RAW"):
+        for item in data:
+            self.update_cell(*a1_to_rowcol(item["range"]), item["values"][0][0])
+
+    def memo(self, member_id):
+        return next(row[3] for row in self.grid[2:] if row[1] == member_id)
+
+
+def make_index(ws):
+    """live=False 는 만들 때의 시트 복사본(저장본), live=True 는 현재 시트"""
+    saved = [list(row) for row in ws.grid]
+    loads = []
+
+    def load(live):
+        loads.append(live)
+        grid = ws.grid if live else saved
+        return grid[1], [list(row) for row in grid[2:]]
+
+    return SheetRowIndex(load), loads
+
+
+def test_write_uses_index_without_rebuild():
+    ws = FakeWorksheet([("1", "가"), ("2", "나")])
+    index, loads = make_index(ws)
+    assert index.update_cell(ws, "2", "메모", "확인")
+    assert index.update_cell(ws, " 2 ", "메모", lambda current: current + "+")  # 현재 칸 값을 받아 이어 쓰기
+    assert ws.memo("2") == "확인+"
+    assert loads == [False] and ws.batch_gets == 2
+
+
+def test_inserted_row_triggers_live_rebuild():
+    ws = FakeWorksheet([("1", "가"), ("2", "나"), ("3", "다")])
+    index, loads = make_index(ws)
+    index.locate("1", "메모")
+    ws.grid.insert(2, ["", "9", "새 회원", ""])  # 색인을 만든 뒤 맨 위에 행 삽입
+
+    assert index.update_cell(ws, "2", "메모", "확인")
+    assert ws.memo("2") == "확인" and ws.memo("1") == "" and ws.memo("9") == ""
+    assert loads == [False, True]
+    assert index.stats["invalidations"] == 1 and index.stats["live_builds"] == 1
+
+
+def test_header_change_triggers_live_rebuild():
+    ws = FakeWorksheet([("1", "가")])
+    index, loads = make_index(ws)
+    index.locate("1", "메모")
+    for row in ws.grid[1:]:
+        row.insert(3, "")  # 이름 뒤에 열 추가
+    ws.grid[1][3] = "전화번호"
+
+    assert index.update_cell(ws, "1", "메모", "확인")
+    assert ws.grid[2] == ["", "1", "가", "", "확인"]
+    assert loads == [False, True]
+
+
+def test_missing_key_rebuilds_once_and_reports():
+    ws = FakeWorksheet([("1", "가")])
+    index, loads = make_index(ws)
+    assert not index.update_cell(ws, "404", "메모", "확인")
+    assert loads == [False, True] and ws.writes == []
+    assert index.stats["missing"] == 1
+
+
+def test_batch_write_after_reorder_rebuilds_once():
+    ws = FakeWorksheet([("1", "가"), ("2", "나"), ("3", "다")])
+    index, loads = make_index(ws)
+    index.locate("1", "메모")
+    ws.grid[2:] = ws.grid[2:][::-1]  # 시트 정렬
+
+    missing = index.update_cells(ws, {"1": "a", "3": "c", "404": "x"}, "메모")
+    assert missing == ["404"]
+    assert ws.memo("1") == "a" and ws.memo("2") == "" and ws.memo("3") == "c"
+    assert loads == [False, True]
+    assert index.stats["invalidations"] == 1 and index.stats["writes"] == 2 and index.stats["missing"] == 1
+
+
+def test_batch_write_with_new_key_picks_up_appended_row():
+    ws = FakeWorksheet([("1", "가")])
+    index, loads = make_index(ws)
+    index.locate("1", "메모")
+    ws.grid.append(["", "2", "나", ""])  # 색인 뒤에 추가된 회원
+
+    assert index.update_cells(ws, {"1": "a", "2": "b"}, "메모") == []
+    assert ws.memo("1") == "a" and ws.memo("2") == "b"
+    assert loads == [False, True] and index.stats["invalidations"] == 0
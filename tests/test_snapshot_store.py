@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+import pytest
+
+import snapshotStore
+from snapshotStore import SheetSnapshotStore
+
+HEADER = ["회원 ID", "이름", ""]  # 빈/중복 헤더도 그대로 보관되어야 함
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timeout")
+        time.sleep(0.01)
+
+
+def saved(store, key):
+    return lambda: store.stats["saves"] >= 1 and os.path.exists(store._path(key))
+
+
+def test_cold_start_serves_disk_copy_and_revalidates(tmp_path):
+    first = SheetSnapshotStore(str(tmp_path))
+    first.get("회원", lambda: (HEADER, [["1", "가", "x"], ["2", "나", ""]]))
+    wait_until(saved(first, "회원"))
+
+    refreshed = threading.Event()
+    release = threading.Event()
+    fetches = []
+
+    def slow_fetch():
+        fetches.append(1)
+        release.wait(5)  # 백그라운드 조회가 끝나기 전 상태를 확인하도록
+        return HEADER, [["1", "가", "x"], ["2", "나", ""], ["3", "다", "y"]]
+
+    restarted = SheetSnapshotStore(str(tmp_path), on_refresh=lambda key: refreshed.set())
+    header, rows = restarted.get("회원", slow_fetch)
+    assert header == HEADER and rows == [["1", "가", "x"], ["2", "나", ""]]
+    assert restarted.describe("회원")["source"] == "disk" and restarted.describe("회원")["refreshing"]
+    assert restarted.get("회원", slow_fetch)[1] == rows  # 갱신 중 재요청은 백그라운드 조회를 또 띄우지 않음
+
+    release.set()
+    assert refreshed.wait(5)
+    assert fetches == [1]
+    assert restarted.get("회원", slow_fetch)[1][-1] == ["3", "다", "y"]
+    wait_until(lambda: not restarted.describe("회원")["refreshing"])  # on_refresh 다음에 갱신 표시가 풀림
+    assert restarted.describe("회원")["source"] == "live"
+    assert restarted.stats["disk_hits"] == 2 and restarted.stats["background_refreshes"] == 1
+
+
+def test_failed_revalidation_keeps_disk_copy(tmp_path):
+    first = SheetSnapshotStore(str(tmp_path))
+    first.get("회원", lambda: (HEADER, [["1", "가", "x"]]))
+    wait_until(saved(first, "회원"))
+
+    def broken_fetch():
+        raise ConnectionError("503")
+
+    restarted = SheetSnapshotStore(str(tmp_path))
+    assert restarted.get("회원", broken_fetch)[1] == [["1", "가", "x"]]
+    wait_until(lambda: restarted.stats["failures"] == 1 and not restarted.describe("회원")["refreshing"])
+    assert restarted.describe("회원")["source"] == "disk"
+
+
+def test_stale_memory_is_fetched_again_in_process(tmp_path):
+    store = SheetSnapshotStore(str(tmp_path), max_age=60)
+    values = iter([(HEADER, [["1", "가", "x"]]), (HEADER, [["1", "가", "z"]])])
+    store.get("회원", lambda: next(values))
+    assert store.get("회원", lambda: next(values))[1] == [["1", "가", "x"]]  # 아직 신선함
+    store.expire()
+    assert store.get("회원", lambda: next(values))[1] == [["1", "가", "z"]]
+    assert store.stats["live_fetches"] == 2 and store.stats["disk_hits"] == 0
+
+
+def test_save_is_atomic(tmp_path, monkeypatch):
+    store = SheetSnapshotStore(str(tmp_path))
+    store._save("회원", HEADER, [["1", "가", "x"]], time.time())
+    before = open(store._path("회원"), "rb").read()
+
+    def broken_write(table, path, **kwargs):
+        with open(path, "wb") as f:
+            f.write(b"PAR1 half written")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(snapshotStore.pq, "write_table", broken_write)
+    store._save("회원", HEADER, [["1", "가", "y"]], time.time())
+
+    assert sorted(os.listdir(tmp_path)) == ["회원.parquet"]  # 임시 파일이 남지 않음
+    assert open(store._path("회원"), "rb").read() == before
+    assert SheetSnapshotStore(str(tmp_path))._load("회원")["rows"] == [["1", "가", "x"]]
+
+
+@pytest.mark.parametrize("rows", [[], [["1", "가", "x"]]])
+def test_saved_copy_round_trips_header_and_rows(tmp_path, rows):
+    store = SheetSnapshotStore(str(tmp_path))
+    store._save("회원", HEADER, rows, 123.0)
+    entry = store._load("회원")
+    assert entry == {"header": HEADER, "rows": rows, "fetched_at": 123.0, "source": "disk"}
@@ -0,0 +1,54 @@
+import random
+
+from reportlab.pdfbase import pdfmetrics
+
+import makeProfileCard  # noqa: F401  폰트 등록
+from textLayout import remove_emojis, wrap_text
+
+
+# 기존 구현 (비교 기준)
+def legacy_wrap_text(text, font_name, font_size, max_width):
+    lines = []
+    for paragraph in text.strip().split("\n"):
+        words = paragraph.strip().split(" ")
+        line = ""
+        for word in words:
+            test_line = f"{line} {word}".strip()
+            if pdfmetrics.stringWidth(test_line, font_name, font_size) <= max_width:
+                line = test_line
+            else:
+                lines.append(line)
+                line = word
+        if line:
+            lines.append(line)
+    return lines
+
+
+def sample_texts(seed=0, count=10):
+    """긴 소개/연애스타일 문단 (이모지 포함)"""
+    rng = random.Random(seed)
+    words = ["안녕하세요", "저는", "주말에는", "등산을", "좋아하고", "맛집", "탐방도", "즐겨요", "진지한", "만남을",
+             "원해요", "함께", "웃을", "수", "있는", "사람이", "좋아요😊", "여행✈️", "👍"]
+    return ["\n".join(" ".join(rng.choice(words) for _ in range(rng.randint(150, 400))) for _ in range(3))
+            for _ in range(count)]
+
+
+NO_SPACE = "띄어쓰기없이길게이어지는소개문장입니다" * 20
+
+
+def test_spaced_text_wraps_like_legacy():
+    # 기존 구현과 다른 점은 한 줄보다 긴 단어 앞에 빈 줄을 끼워 넣지 않는 것뿐
+    for text in sample_texts(count=3):
+        clean = remove_emojis(text)
+        legacy = [line for line in legacy_wrap_text(clean, "PreMedium", 13, 500) if line]
+        assert wrap_text(clean, "PreMedium", 13, 500) == legacy
+
+
+def test_long_words_are_broken_within_width():
+    lines = wrap_text("소개: " + NO_SPACE, "PreMedium", 13, 500)
+    assert "".join(lines).replace(" ", "") == ("소개: " + NO_SPACE).replace(" ", "")
+    assert max(pdfmetrics.stringWidth(line, "PreMedium", 13) for line in lines) <= 500
+
+
+def test_remove_emojis_strips_combined_sequences():
+    assert remove_emojis("좋아요😊 여행✈️ 👍🏽 가족👨‍👩‍👧 1️⃣번") == "좋아요 여행  가족 1번"
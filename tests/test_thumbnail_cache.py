@@ -0,0 +1,15 @@
+import os
+
+from thumbnailCache import StaticThumbnailStore
+
+
+def test_publish_is_content_addressed(tmp_path, photo_jpeg):
+    store = StaticThumbnailStore(str(tmp_path), "./app/static/thumbs/")
+    first, second = photo_jpeg(150, 200, quality=85), photo_jpeg(150, 200, quality=85)
+
+    url = store.publish(first)
+    assert url.startswith("./app/static/thumbs/") and "?v=" in url
+    assert store.publish(first) == url
+    assert store.publish(second) != url
+    assert len(os.listdir(tmp_path)) == 2
+    assert store.stats_snapshot()["hits"] == 1
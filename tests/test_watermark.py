@@ -0,0 +1,94 @@
+import io
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from makeProfileCard import create_pdf_from_data
+from makeWatermarkToPdf import WatermarkStampCache, add_watermark_to_pdf_bytes, create_watermark, watermark_job
+from tests.conftest import synthetic_jpeg
+
+
+UUID_PATTERN = re.compile(rb"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def card_pdf(seed=0, photos=4, size=(1200, 1600)):
+    """사진 4장짜리 프로필카드 PDF 바이트 (사진은 그라디언트 + 약한 노이즈)"""
+    rng = np.random.default_rng(seed)
+    jpegs = [synthetic_jpeg(rng, *size) for _ in range(photos)]
+    card = io.BytesIO()
+    create_pdf_from_data({"member_code": "M00001", "info_text": "안녕하세요 " * 60, "photos": jpegs}, card)
+    return card.getvalue()
+
+
+def test_concurrent_jobs_match_sequential():
+    source = card_pdf(photos=1, size=(300, 400))
+    phones = [f"010-1234-{i:04d}" for i in range(2)]
+    job_phones = [phone for phone in phones for _ in range(8)]  # 요청자 1명당 8건 동시 처리
+
+    stamps = WatermarkStampCache()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda phone: add_watermark_to_pdf_bytes(source, stamps.page(phone)), job_phones))
+    # 워터마크 PDF 에는 생성 시각이 들어가므로 같은 캐시 바이트로 순차 처리한 결과와 비교
+    # (merge_page 가 겹치는 폰트 이름 뒤에 붙이는 uuid 는 매번 달라서 지우고 비교)
+    expected = {phone: add_watermark_to_pdf_bytes(source, stamps.page(phone)) for phone in phones}
+
+    assert all(UUID_PATTERN.sub(b"", result) == UUID_PATTERN.sub(b"", expected[phone])
+               for phone, result in zip(job_phones, results))
+    assert stamps.stats["builds"] == len(phones)
+
+
+def test_concurrent_misses_build_once(monkeypatch):
+    import makeWatermarkToPdf
+
+    calls = []
+
+    def slow_create(*args):
+        calls.append(args[0])
+        time.sleep(0.2)  # 다른 스레드가 만드는 도중에 같은 키를 요청하도록
+        create_watermark(*args)
+
+    monkeypatch.setattr(makeWatermarkToPdf, "create_watermark", slow_create)
+    stamps = WatermarkStampCache()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        stamp_bytes = list(pool.map(lambda _: stamps.stamp_bytes("010-0000-0000"), range(8)))
+
+    assert calls == ["010-0000-0000"]
+    assert len(set(stamp_bytes)) == 1
+    assert stamps.stats["builds"] == 1 and stamps.stats["waits"] >= 1
+
+
+def test_jobs_run_on_workers_with_main_thread_handles():
+    # 트리거처럼 메인 스레드에서 캐시/Drive 함수를 만들어 작업 스레드에 넘김
+    source = card_pdf(photos=1, size=(300, 400))
+    main = threading.get_ident()
+    stamps = WatermarkStampCache()
+    uploaded = {}
+    lock = threading.Lock()
+
+    def download(file_id):
+        assert threading.get_ident() != main
+        if file_id == "missing":
+            raise FileNotFoundError("404 File not found")
+        return source
+
+    def upload(data):
+        with lock:
+            file_id = f"out{len(uploaded)}"
+            uploaded[file_id] = data
+        return file_id
+
+    jobs = [("010-1234-0000", "card"), ("010-1234-0001", "card"), ("010-1234-0000", "missing")]
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda job: watermark_job(job[0], job[1], stamps, download, upload), jobs))
+
+    (first, first_steps), (second, _), (failed, failed_steps) = results
+    assert first_steps == ["Download", "Create", "워터마크 pdf 생성 성공"]
+    assert UUID_PATTERN.sub(b"", uploaded[first]) == UUID_PATTERN.sub(
+        b"", add_watermark_to_pdf_bytes(source, stamps.page("010-1234-0000")))
+    assert UUID_PATTERN.sub(b"", uploaded[second]) == UUID_PATTERN.sub(
+        b"", add_watermark_to_pdf_bytes(source, stamps.page("010-1234-0001")))
+    assert failed is None and failed_steps == ["❌ 워터마크 생성 실패: 404 File not found"]
+    assert len(uploaded) == 2 and stamps.stats["builds"] == 2
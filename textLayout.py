@@ -0,0 +1,79 @@
+import re
+
+from reportlab.pdfbase import pdfmetrics
+
+# ✅ 이모지 제거용 문자 범위 (한 번만 컴파일). ZWJ / 이체 선택자 / 피부색 / 키캡 등 결합 문자도 함께 제거
+EMOJI_PATTERN = re.compile(
+    "["
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs (피부색 1F3FB-1F3FF 포함)
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F1E0-\U0001F1FF"  # flags
+    "\U0001F900-\U0001F9FF"  # supplemental symbols
+    "\U0001FA70-\U0001FAFF"  # symbols & pictographs extended-A
+    "\U00002700-\U000027BF"  # dingbats
+    "\U00002600-\U000026FF"  # misc symbols
+    "\U00002300-\U000023FF"  # misc technical
+    "\u200d\ufe0e\ufe0f\u20e3"  # ZWJ, 이체 선택자, 키캡
+    "]+"
+)
+
+_glyph_widths = {}  # (폰트, 크기) → {문자: 폭(pt)}
+
+
+def remove_emojis(text):
+    return EMOJI_PATTERN.sub("", text)
+
+
+def glyph_widths(font_name, font_size):
+    """문자별 폭 캐시. 합계는 pdfmetrics.stringWidth 와 같다 (TTF 는 커닝 없이 글리프 폭의 합)"""
+    key = (font_name, font_size)
+    if key not in _glyph_widths:
+        _glyph_widths[key] = {}
+    return _glyph_widths[key]
+
+
+def char_width(widths, char, font_name, font_size):
+    width = widths.get(char)
+    if width is None:
+        width = widths[char] = pdfmetrics.stringWidth(char, font_name, font_size)
+    return width
+
+
+def wrap_text(text, font_name, font_size, max_width):
+    """줄바꿈된 줄 목록. 단어는 가능하면 통째로 다음 줄로 넘기고,
+    한 줄보다 긴 단어(띄어쓰기 없는 한글 문장 등)는 글자 단위로 끊어 남은 폭부터 채운다.
+    폭은 글자 폭을 누적해서 계산하므로 문단 길이에 비례한다.
+    """
+    widths = glyph_widths(font_name, font_size)
+    space = char_width(widths, " ", font_name, font_size)
+    lines = []
+    for paragraph in text.strip().split("\n"):
+        line, line_width = [], 0.0
+        for word in paragraph.split(" "):
+            if not word:
+                continue
+            word_width = sum(char_width(widths, char, font_name, font_size) for char in word)
+            gap = space if line else 0.0
+            if line_width + gap + word_width <= max_width:
+                line.append(" " * bool(line) + word)
+                line_width += gap + word_width
+                continue
+            if word_width <= max_width:
+                lines.append("".join(line))
+                line, line_width = [word], word_width
+                continue
+            # 한 줄보다 긴 단어 → 현재 줄 남은 폭부터 글자 단위로 채움
+            if line:
+                line.append(" ")
+                line_width += space
+            for char in word:
+                width = char_width(widths, char, font_name, font_size)
+                if line_width + width > max_width and line:
+                    lines.append("".join(line).rstrip())
+                    line, line_width = [], 0.0
+                line.append(char)
+                line_width += width
+        if line:
+            lines.append("".join(line))
+    return lines
@@ -0,0 +1,162 @@
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+# ✅ 기본 용량 한도 (이 크기를 넘으면 오래 안 쓴 썸네일부터 삭제)
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+EVICT_TARGET_RATIO = 0.9  # 정리 시 한도의 90% 까지 비움
+STALE_TEMP_SECONDS = 3600  # 쓰다 만 임시 파일 정리 기준
+
+
+class ThumbnailDiskCache:
+    """Drive 썸네일 디스크 캐시 (모든 세션/프로세스가 같은 폴더를 공유).
+
+    파일 이름은 {파일 ID}_{크기}_{버전 해시}.jpg 이고, 버전은 Drive modifiedTime 이다.
+    파일이 수정되면 버전이 바뀌어 새로 받고, 같은 파일/크기의 이전 버전은 저장 시 지운다.
+    쓰기는 임시 파일 → os.replace 로 원자적으로, LRU 는 조회 시 파일 mtime 갱신으로 처리한다.
+    """
+
+    SUFFIXES = (".jpg",)
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "evicted_bytes": 0, "errors": 0}
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _prefix(self, file_id, size):
+        return os.path.join(self.root, f"{file_id}_{size}_")
+
+    def _path(self, file_id, version, size):
+        digest = hashlib.sha1(str(version).encode("utf-8")).hexdigest()[:16]
+        return f"{self._prefix(file_id, size)}{digest}.jpg"
+
+    def _entries(self):
+        """(경로, 크기, 마지막 사용 시각) 목록"""
+        entries = []
+        for entry in os.scandir(self.root):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # 다른 프로세스가 방금 삭제
+                continue
+            if entry.name.endswith(self.SUFFIXES):
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+            elif entry.name.endswith(".tmp") and time.time() - stat.st_mtime > STALE_TEMP_SECONDS:
+                self._remove(entry.path)
+        return entries
+
+    def _remove(self, path):
+        """삭제한 바이트 수 (이미 없으면 0)"""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def get(self, file_id, version, size):
+        """캐시된 JPEG 바이트. 없으면 None"""
+        path = self._path(file_id, version, size)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # LRU: 마지막 사용 시각 갱신
+        except FileNotFoundError:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return data
+
+    def put(self, file_id, version, size, data, path=None):
+        path = path or self._path(file_id, version, size)
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            self._remove(temp_path)
+            with self._lock:
+                self._stats["errors"] += 1
+            return
+
+        # 같은 파일/크기의 이전 버전 삭제
+        removed = 0
+        for old_path in glob.glob(glob.escape(self._prefix(file_id, size)) + "*.jpg"):
+            if old_path != path:
+                removed += self._remove(old_path)
+
+        with self._lock:
+            self._stats["writes"] += 1
+            self._total_bytes += len(data) - removed
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def invalidate(self, file_id):
+        """파일 ID 의 모든 크기/버전 삭제 (사진 교체 시)"""
+        removed = 0
+        for path in glob.glob(glob.escape(os.path.join(self.root, f"{file_id}_")) + "*.jpg"):
+            removed += self._remove(path)
+        with self._lock:
+            self._total_bytes -= removed
+
+    def evict(self):
+        """폴더 전체를 다시 세어 한도를 넘으면 오래 안 쓴 순으로 삭제 (다른 프로세스가 쓴 파일 포함)"""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * EVICT_TARGET_RATIO if total > self.max_bytes else total
+            for path, size, _ in entries:
+                if total <= target:
+                    break
+                if self._remove(path):
+                    self._stats["evictions"] += 1
+                    self._stats["evicted_bytes"] += size
+                total -= size
+            self._total_bytes = total
+
+    def stats_snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["bytes"] = self._total_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else None
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+class StaticThumbnailStore(ThumbnailDiskCache):
+    """썸네일을 내용 해시 이름으로 Streamlit static 폴더에 게시 (브라우저가 캐시할 수 있는 URL).
+
+    이름이 내용 해시라 같은 URL 은 항상 같은 바이트이고, ?v= 인자가 붙은 요청은
+    tornado StaticFileHandler 가 장기 Cache-Control 로 응답하므로 재실행마다 다시 받지 않는다.
+    용량 한도/LRU 정리는 ThumbnailDiskCache 와 같다.
+    """
+
+    SUFFIXES = (".jpg", ".webp")
+
+    def __init__(self, root, url_prefix, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(root, max_bytes)
+        self.url_prefix = url_prefix.rstrip("/")
+
+    def publish(self, data, ext="jpg"):
+        """바이트를 게시하고 URL 반환 (이미 있으면 사용 시각만 갱신)"""
+        digest = hashlib.sha256(data).hexdigest()[:20]
+        path = os.path.join(self.root, f"{digest}.{ext}")
+        if os.path.exists(path):
+            os.utime(path)
+            with self._lock:
+                self._stats["hits"] += 1
+        else:
+            with self._lock:
+                self._stats["misses"] += 1
+            self.put(digest, "", "", data, path=path)
+        return f"{self.url_prefix}/{digest}.{ext}?v={digest}"